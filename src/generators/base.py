@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import Tuple, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 import logging
 import gin
@@ -11,7 +11,9 @@ from src.verification.verify_netlogo import NetLogoVerifier
 
 
 class NLogoCode(BaseModel):
-    new_code: str
+    """NetLogo rule returned by structured-output generation."""
+    new_code: str = Field(description="The complete new NetLogo rule, code only, without markdown fences")
+    pseudocode: Optional[str] = Field(default=None, description="Short pseudocode describing the new rule")
 
 @gin.register
 class BaseCodeGenerator(ABC):
@@ -5,7 +5,7 @@ import re
 from typing import Optional, List
 from dotenv import load_dotenv
 
-from src.generators.base import BaseCodeGenerator
+from src.generators.base import BaseCodeGenerator, NLogoCode
 from src.verification.verify_netlogo import NetLogoVerifier
 from src.utils.storeprompts import prompts
 from src.utils.logging import get_logger
@@ -17,7 +17,7 @@ load_dotenv()
 class GraphProviderBase(BaseCodeGenerator):
     """Base class for graph-based code generators."""
     
-    def __init__(self, verifier: NetLogoVerifier, retry_max_attempts: int = 5, evolution_strategy: str = "simple", prompt_type: str = "groq", prompt_name: str = "prompt2", retry_prompt: str = None):
+    def __init__(self, verifier: NetLogoVerifier, retry_max_attempts: Optional[int] = None, evolution_strategy: str = "simple", prompt_type: str = "groq", prompt_name: str = "prompt2", retry_prompt: str = None):
         """Initialize with verifier instance."""
         super().__init__(verifier)
         self.model = None  # To be set by child classes
@@ -30,10 +30,37 @@ class GraphProviderBase(BaseCodeGenerator):
         
         # Retry Prompts
         self.retry_prompt = retry_prompt
+        # Overrides RetryPolicy.max_attempts for this provider when set
+        self.retry_max_attempts = retry_max_attempts
         
     @abstractmethod
     def initialize_model(self):
         """Initialize and return provider-specific model."""
         pass
 
+    def generate_candidates_from_state(self, state: dict, num_candidates: int):
+        """Yield `num_candidates` candidate codes for the same state (sequential by default)."""
+        for _ in range(num_candidates):
+            yield self.generate_code_from_state(state)
+
+    def generate_edit_from_state(self, state: dict) -> Optional[str]:
+        """Generate code as edits against the original code; None when edit mode is unavailable."""
+        return None
+
+    def generate_structured_from_state(self, state: dict) -> Optional[NLogoCode]:
+        """Generate code as an NLogoCode object; None when structured output is unavailable."""
+        return None
+
+    def generate_batch_from_states(self, states: List[dict], max_attempts: Optional[int] = None) -> List[str]:
+        """Generate code for several states (one by one unless a provider batches requests)."""
+        return [self.generate_code_from_state(state) for state in states]
+
+    def routed_model(self, attempt: int = 0):
+        """Return (provider name, chat model) for an attempt; providers with failover or tiers may pick another."""
+        return None, self.initialize_model()
+
+    def invoke_chain(self, chain, invoke_input: dict, estimated_tokens: int = 0, model_name: Optional[str] = None):
+        """Invoke a LangChain chain built on this provider's model."""
+        return chain.invoke(invoke_input)
+
     
\ No newline at end of file
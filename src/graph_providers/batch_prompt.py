@@ -0,0 +1,68 @@
+"""
+Batched prompts: several children per LLM request.
+
+Each mutation request repeats the full system and task prompt. A batched prompt sends
+the static instructions once (laid out as in prompt_layout, so the prefix is also
+cacheable) followed by one tagged section per child, and asks for one delimited answer
+per child. parse_batch_response splits the answer again so each child can be verified,
+and retried, on its own.
+"""
+import re
+from typing import Dict, List, Optional
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from src.graph_providers.prompt_layout import prefix_system_message, static_layout
+
+BATCH_INSTRUCTIONS = (
+    "The input below holds several independent tasks, each in its own <child id=\"N\"> section "
+    "with its own values for the sections referenced above. Solve every task separately. "
+    "Answer with one part per task, in order: a line `### CHILD N` followed by that task's "
+    "code in a ```netlogo block. When several tasks have the same input, give each a different answer."
+)
+
+CHILD_HEADER_PATTERN = re.compile(r"^[ \t]*#{1,6}[ \t]*CHILD[ \t]+(\d+)\b.*$", re.MULTILINE | re.IGNORECASE)
+
+
+def build_batch_messages(system_message: str, template: str, values_list: List[Dict[str, str]],
+                         model_name: str) -> List[BaseMessage]:
+    """
+    Build a [system, user] message pair asking for one answer per child.
+
+    Args:
+        system_message: Generic system instructions
+        template: Task prompt template shared by all children
+        values_list: Placeholder values per child (all with the same keys)
+        model_name: Provider key, used to decide whether cache_control markers are added
+
+    Returns:
+        Messages ready to be sent to the chat model
+    """
+    static_text, order = static_layout(template, frozenset(values_list[0]))
+    system = prefix_system_message(f"{system_message}\n\n{static_text}\n\n{BATCH_INSTRUCTIONS}", model_name)
+    sections = []
+    for number, values in enumerate(values_list, start=1):
+        body = "\n\n".join(f"<{name}>\n{values[name]}\n</{name}>" for name in order)
+        sections.append(f"<child id=\"{number}\">\n{body}\n</child>")
+    return [system, HumanMessage(content="\n\n".join(sections))]
+
+
+def parse_batch_response(response: str, count: int) -> List[Optional[str]]:
+    """
+    Split a batched response into the parts answering each child.
+
+    Args:
+        response: Raw response text
+        count: Number of children in the request
+
+    Returns:
+        One entry per child (None where the response has no part for it)
+    """
+    parts: List[Optional[str]] = [None] * count
+    headers = list(CHILD_HEADER_PATTERN.finditer(response or ""))
+    for header, following in zip(headers, headers[1:] + [None]):
+        index = int(header.group(1)) - 1
+        end = following.start() if following else len(response)
+        if 0 <= index < count and parts[index] is None:
+            parts[index] = response[header.end():end].strip()
+    return parts
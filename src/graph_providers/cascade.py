@@ -0,0 +1,122 @@
+"""
+Cost-aware model cascade: a cheap model first, stronger models only when needed.
+
+A run normally sends every attempt, retries included, to the one configured model.
+With the cascade, attempt N of a mutation goes to tier N of a configured list
+(e.g. a small groq model, then a large one, then Claude). A mutation escalates
+when its code fails verification, or when verified code looks low quality by static
+checks: unchanged from the parent, below a minimum complexity, or longer than a size
+limit. Easy mutations are then served by the cheap tier, and only hard cases pay for a
+stronger model. The last tier's verified code is always accepted.
+"""
+import threading
+from typing import List, Optional, Tuple
+
+import gin
+
+from src.utils.cost_ledger import record_event
+from src.utils.logging import get_logger
+
+# Prefix of the verifier-style message that turns a low-quality result into a retry
+LOW_QUALITY_PREFIX = "LOW QUALITY"
+
+
+@gin.configurable
+class ModelCascade:
+    """
+    Ordered model tiers with quality checks that decide when to escalate.
+    """
+
+    def __init__(self, enabled: bool = False,
+                 tiers: Optional[List[str]] = None,
+                 escalate_unchanged: bool = True,
+                 min_complexity: Optional[int] = None,
+                 max_code_chars: Optional[int] = None):
+        """
+        Args:
+            enabled: Whether attempts are routed through the tiers at all
+            tiers: "provider" or "provider:model" per tier, cheapest first
+                   (e.g. ["groq:llama-3.1-8b-instant", "groq:llama-3.3-70b-versatile", "claude"])
+            escalate_unchanged: Escalate when the verified code equals the parent rule
+            min_complexity: Escalate verified code below this CodeComplexity level (1-7)
+            max_code_chars: Escalate verified code longer than this many characters
+        """
+        self.enabled = enabled and bool(tiers)
+        self.tiers: List[Tuple[str, Optional[str]]] = [self._parse(tier) for tier in tiers or []]
+        self.escalate_unchanged = escalate_unchanged
+        self.min_complexity = min_complexity
+        self.max_code_chars = max_code_chars
+        self.lock = threading.Lock()
+        self.logger = get_logger()
+        self.stats = [{"attempts": 0, "accepted": 0, "failed": 0, "low_quality": 0} for _ in self.tiers]
+
+    @staticmethod
+    def _parse(tier: str) -> Tuple[str, Optional[str]]:
+        provider, _, model = tier.partition(":")
+        return provider, model or None
+
+    def tier_index(self, attempt: int) -> int:
+        """Tier serving the given attempt (0 for the first); later attempts stay on the last tier."""
+        return min(max(attempt, 0), len(self.tiers) - 1)
+
+    def tier(self, attempt: int) -> Tuple[str, Optional[str]]:
+        """(provider, model or None for the provider's configured model) for an attempt."""
+        return self.tiers[self.tier_index(attempt)]
+
+    def quality_issue(self, code: str, original_code: str, verifier) -> Optional[str]:
+        """Reason verified code should be escalated, or None if it is good enough."""
+        if self.escalate_unchanged and " ".join(code.split()) == " ".join((original_code or "").split()):
+            return "the code is identical to the original; make a meaningful change"
+        if self.max_code_chars is not None and len(code) > self.max_code_chars:
+            return f"the code is {len(code)} characters long (limit {self.max_code_chars}); make it shorter"
+        if self.min_complexity is not None:
+            level = verifier.measure_complexity(code).value
+            if level < self.min_complexity:
+                return f"the code is too simple (complexity {level}, minimum {self.min_complexity})"
+        return None
+
+    def review(self, attempt: int, code: str, original_code: str, is_safe: bool, verifier) -> Optional[str]:
+        """
+        Record the outcome of an attempt and decide whether to escalate verified code.
+
+        Returns:
+            An error message for verified but low-quality code below the last tier
+            (it goes to the next tier's retry prompt), otherwise None
+        """
+        index = self.tier_index(attempt)
+        issue = self.quality_issue(code, original_code, verifier) if is_safe and index < len(self.tiers) - 1 else None
+        outcome = "failed" if not is_safe else "low_quality" if issue else "accepted"
+        with self.lock:
+            self.stats[index]["attempts"] += 1
+            self.stats[index][outcome] += 1
+        if outcome != "accepted" and index < len(self.tiers) - 1:
+            record_event("escalations")
+            self.logger.info(f"Escalating from tier {index} ({self.describe(index)}) after a {outcome} result")
+        return f"{LOW_QUALITY_PREFIX}: {issue}" if issue else None
+
+    def describe(self, index: int) -> str:
+        provider, model = self.tiers[index]
+        return f"{provider}:{model}" if model else provider
+
+    def metrics(self) -> dict:
+        """Attempts and outcomes per tier, and the share of attempts escalated from each tier."""
+        with self.lock:
+            tiers = []
+            for index, stats in enumerate(self.stats):
+                escalated = stats["failed"] + stats["low_quality"] if index < len(self.stats) - 1 else 0
+                tiers.append({"tier": self.describe(index), **stats,
+                              "escalation_rate": escalated / stats["attempts"] if stats["attempts"] else 0.0})
+            return {"tiers": tiers}
+
+
+_model_cascade: Optional[ModelCascade] = None
+_model_cascade_lock = threading.Lock()
+
+
+def get_model_cascade() -> ModelCascade:
+    """Return the process-wide model cascade, creating it (from gin) on first use."""
+    global _model_cascade
+    with _model_cascade_lock:
+        if _model_cascade is None:
+            _model_cascade = ModelCascade()
+        return _model_cascade
@@ -0,0 +1,184 @@
+"""
+Per-provider circuit breakers with failover.
+
+During a provider outage every call waits for its own timeout (and retries) before the
+mutation falls back to the parent rule, so a whole generation is lost slowly. A
+CircuitBreaker opens after `failure_threshold` consecutive failures or timeouts within
+`window_seconds`. While it is open, calls are routed to the provider's configured
+fallback, or rejected at once. After `open_seconds` it lets a few trial requests through
+(half-open); a success closes it again and a failure reopens it.
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import gin
+
+from src.graph_providers.rate_limiter import is_retryable_error
+from src.utils.deadline import DeadlineExceeded
+from src.utils.logging import get_logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Exception class name fragments that indicate the provider (not the request) is at fault
+OUTAGE_ERROR_NAMES = ("Timeout", "Connection", "Unavailable", "Overloaded")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a provider's circuit is open and no fallback provider is available."""
+
+
+def is_outage_error(error: Exception) -> bool:
+    """Rate-limit, 5xx, timeout and connection errors count against a provider's circuit."""
+    if isinstance(error, DeadlineExceeded):
+        return False  # Our own mutation deadline, not the provider's fault
+    if isinstance(error, (TimeoutError, ConnectionError)) or is_retryable_error(error):
+        return True
+    return any(name in type(error).__name__ for name in OUTAGE_ERROR_NAMES)
+
+
+@gin.configurable
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit for one provider.
+    """
+
+    def __init__(self, provider_name: str,
+                 enabled: bool = False,
+                 failure_threshold: int = 5,
+                 window_seconds: float = 60.0,
+                 open_seconds: float = 30.0,
+                 half_open_probes: int = 1,
+                 fallbacks: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            provider_name: Provider key from SupportedModels (e.g. "groq")
+            enabled: Whether the circuit can open at all
+            failure_threshold: Consecutive failures within window_seconds that open the circuit
+            window_seconds: Failures older than this no longer count towards the threshold
+            open_seconds: Time the circuit stays open before trial requests are allowed
+            half_open_probes: Trial requests allowed while half-open
+            fallbacks: Per-provider fallback provider, e.g. {"groq": "claude"}
+        """
+        self.provider_name = provider_name
+        self.enabled = enabled
+        self.failure_threshold = failure_threshold
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.fallback = (fallbacks or {}).get(provider_name)
+        self.logger = get_logger()
+
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = deque()  # Times of the current run of consecutive failures
+        self.changed_at = time.monotonic()
+        self.probes = 0
+        self.transitions = deque(maxlen=50)
+        self.stats = {"successes": 0, "failures": 0, "rejected": 0, "failovers": 0, "opened": 0}
+
+    def _transition(self, state: str) -> None:
+        self.transitions.append({"time": time.time(), "from": self.state, "to": state})
+        self.logger.warning(f"Circuit for {self.provider_name}: {self.state} -> {state}")
+        self.state = state
+        self.changed_at = time.monotonic()
+        self.probes = 0
+        if state == OPEN:
+            self.stats["opened"] += 1
+
+    def allow_request(self, reserve: bool = True) -> bool:
+        """
+        Whether a request may be sent to this provider now.
+
+        Args:
+            reserve: Take one of the half-open trial slots. Routing passes False so that a
+                     slot is only used by a request that is actually sent
+        """
+        if not self.enabled:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.changed_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self.probes >= self.half_open_probes and now - self.changed_at >= self.open_seconds:
+                    # Trial requests never reported back; allow new ones
+                    self.changed_at, self.probes = now, 0
+                if self.probes < self.half_open_probes:
+                    self.probes += int(reserve)
+                    return True
+            if self.state == CLOSED:
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.stats["successes"] += 1
+            self.failures.clear()
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.stats["failures"] += 1
+            if not self.enabled:
+                return
+            now = time.monotonic()
+            self.failures.append(now)
+            while self.failures and now - self.failures[0] > self.window_seconds:
+                self.failures.popleft()
+            if self.state == HALF_OPEN or (self.state == CLOSED and len(self.failures) >= self.failure_threshold):
+                self._transition(OPEN)
+
+    def record_failover(self) -> None:
+        with self.lock:
+            self.stats["failovers"] += 1
+
+    def metrics(self) -> dict:
+        """Current state, counters and recent transitions."""
+        with self.lock:
+            return {"state": self.state, "consecutive_failures": len(self.failures),
+                    "fallback": self.fallback, **self.stats, "transitions": list(self.transitions)}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider_name: str) -> CircuitBreaker:
+    """Return the process-wide circuit breaker for a provider, creating it (from gin) on first use."""
+    with _breakers_lock:
+        if provider_name not in _breakers:
+            _breakers[provider_name] = CircuitBreaker(provider_name)
+        return _breakers[provider_name]
+
+
+def get_circuit_breaker_metrics() -> Dict[str, dict]:
+    """State, counters and transitions of every provider's circuit seen so far."""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.metrics() for name, breaker in breakers.items()}
+
+
+def route(provider_name: str) -> str:
+    """
+    Pick the provider to send a request to: the provider itself while its circuit allows
+    it, otherwise its fallback.
+
+    Raises:
+        CircuitOpenError: If both the provider's and the fallback's circuits are open
+    """
+    breaker = get_circuit_breaker(provider_name)
+    # Half-open trial slots are reserved by call_with_breaker when the request is sent
+    if breaker.allow_request(reserve=False):
+        return provider_name
+    fallback = breaker.fallback
+    if fallback and fallback != provider_name and get_circuit_breaker(fallback).allow_request(reserve=False):
+        breaker.record_failover()
+        return fallback
+    raise CircuitOpenError(f"Circuit for {provider_name} is open"
+                           + (f" and its fallback {fallback} is unavailable" if fallback else ""))
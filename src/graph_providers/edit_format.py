@@ -0,0 +1,107 @@
+"""
+Line-edit output format for long rules.
+
+For long (e.g. commented) rules the model re-emits the whole rule to change a line or
+two, and output tokens dominate latency. In edit mode the original code is sent with
+numbered lines and the model answers with a short list of edits against those numbers:
+
+    REPLACE 3: fd 2 rt 10
+    INSERT AFTER 5: if item 0 input-resource-distances > 2 [ fd 1 ]
+    DELETE 7
+
+apply_edits patches the original code locally; any malformed or conflicting edit raises
+EditFormatError so the caller can fall back to full regeneration.
+"""
+import re
+from dataclasses import dataclass
+from typing import List
+
+EDIT_INSTRUCTIONS = (
+    "EDIT FORMAT: the current code above is shown with numbered lines (`N| code`). Do not repeat "
+    "the whole code. Answer with only the edits to make, one per line, inside a ```edits block:\n"
+    "REPLACE N: <new content of line N>\n"
+    "INSERT AFTER N: <new line> (use INSERT AFTER 0 to insert at the top)\n"
+    "DELETE N\n"
+    "Line numbers always refer to the numbered code above. Leave out the `N|` prefix in new lines."
+)
+
+EDIT_LINE_PATTERN = re.compile(r"^(REPLACE|INSERT\s+AFTER|DELETE)\s+(\d+)\s*(?::\s?(.*))?$", re.IGNORECASE)
+EDITS_BLOCK_PATTERN = re.compile(r"```[ \t]*edits?[ \t]*\n(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+
+
+class EditFormatError(ValueError):
+    """The response could not be parsed as edits, or the edits do not apply."""
+
+
+@dataclass
+class Edit:
+    operation: str  # "replace", "insert" or "delete"
+    line: int       # 1-based line of the original code (0 for insert at the top)
+    content: str = ""
+
+
+def number_lines(code: str) -> str:
+    """Prefix every line of `code` with its 1-based number (`N| line`)."""
+    return "\n".join(f"{number}| {line}" for number, line in enumerate(code.splitlines(), start=1))
+
+
+def parse_edits(response: str) -> List[Edit]:
+    """
+    Parse the edit list of a response (the ```edits block, or the whole response).
+
+    Raises:
+        EditFormatError: If a non-empty line is not an edit, or there are no edits
+    """
+    match = EDITS_BLOCK_PATTERN.search(response or "")
+    body = match.group(1) if match else (response or "")
+    edits = []
+    for raw in body.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        parsed = EDIT_LINE_PATTERN.match(line)
+        if not parsed:
+            raise EditFormatError(f"Not an edit: {line[:100]}")
+        keyword, number, content = parsed.group(1).upper(), int(parsed.group(2)), parsed.group(3)
+        if keyword == "DELETE":
+            edits.append(Edit("delete", number))
+        elif content is None:
+            raise EditFormatError(f"Edit without content: {line[:100]}")
+        else:
+            edits.append(Edit("replace" if keyword == "REPLACE" else "insert", number, content))
+    if not edits:
+        raise EditFormatError("Response contains no edits")
+    return edits
+
+
+def apply_edits(code: str, edits: List[Edit]) -> str:
+    """
+    Apply edits, all numbered against the original lines of `code`.
+
+    Raises:
+        EditFormatError: If a line number is out of range or a line is replaced or deleted twice
+    """
+    lines = code.splitlines()
+    replaced = {}
+    deleted = set()
+    inserted = {}
+    for edit in edits:
+        lowest = 0 if edit.operation == "insert" else 1
+        if not lowest <= edit.line <= len(lines):
+            raise EditFormatError(f"Line {edit.line} is out of range (1-{len(lines)})")
+        if edit.operation == "insert":
+            inserted.setdefault(edit.line, []).append(edit.content)
+            continue
+        if edit.line in replaced or edit.line in deleted:
+            raise EditFormatError(f"Line {edit.line} is edited more than once")
+        if edit.operation == "replace":
+            replaced[edit.line] = edit.content
+        else:
+            deleted.add(edit.line)
+
+    patched = list(inserted.get(0, []))
+    for number, line in enumerate(lines, start=1):
+        if number not in deleted:
+            patched.append(replaced.get(number, line))
+        patched.extend(inserted.get(number, []))
+    return "\n".join(patched)
@@ -0,0 +1,134 @@
+"""
+Latency tracking and request hedging across providers.
+
+Every successful LLM call records its latency in a per-provider LatencyHistogram. When
+hedging is enabled, a request that has not returned within a percentile of the
+primary provider's recent latency is duplicated to a secondary provider, and the first
+valid answer wins. This trims the tail latency caused by occasional slow responses.
+"""
+import bisect
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+import gin
+
+# Upper bounds (seconds) of the histogram buckets reported in metrics
+LATENCY_BUCKETS = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, float("inf")]
+
+
+class LatencyHistogram:
+    """Rolling window of recent call latencies plus cumulative bucket counts."""
+
+    def __init__(self, window: int = 200):
+        """
+        Args:
+            window: Number of most recent latencies used for percentiles
+        """
+        self.recent = deque(maxlen=window)
+        self.bucket_counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self.lock:
+            self.recent.append(seconds)
+            self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.total += 1
+
+    def __len__(self) -> int:
+        return len(self.recent)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The p-th percentile (0-100) of the recent window, or None if it is empty."""
+        with self.lock:
+            samples = sorted(self.recent)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(p / 100.0 * (len(samples) - 1)))))
+        return samples[index]
+
+    def metrics(self) -> dict:
+        with self.lock:
+            buckets = {("+Inf" if bound == float("inf") else str(bound)): count
+                       for bound, count in zip(LATENCY_BUCKETS, self.bucket_counts)}
+            total = self.total
+        return {
+            "count": total,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": buckets,
+        }
+
+
+_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def get_latency_histogram(provider_name: str) -> LatencyHistogram:
+    """Return the process-wide latency histogram for a provider, creating it on first use."""
+    with _histograms_lock:
+        if provider_name not in _histograms:
+            _histograms[provider_name] = LatencyHistogram()
+        return _histograms[provider_name]
+
+
+def get_latency_metrics() -> Dict[str, dict]:
+    """Latency percentiles and bucket counts for every provider seen so far."""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {name: histogram.metrics() for name, histogram in histograms.items()}
+
+
+@gin.configurable
+class HedgingPolicy:
+    """
+    When and where to send a duplicate (hedged) request.
+    """
+
+    def __init__(self, enabled: bool = False,
+                 secondary_model_name: str = "claude",
+                 percentile: float = 95.0,
+                 min_samples: int = 20,
+                 default_delay: float = 10.0,
+                 min_delay: float = 0.5):
+        """
+        Args:
+            enabled: Whether requests are hedged at all
+            secondary_model_name: Provider from SupportedModels that receives the hedged request
+            percentile: Latency percentile of the primary after which the hedge is sent
+            min_samples: Latency samples needed before the percentile is trusted
+            default_delay: Hedge delay (seconds) used until min_samples are recorded
+            min_delay: Lower bound on the hedge delay, to avoid hedging every request
+        """
+        self.enabled = enabled
+        self.secondary_model_name = secondary_model_name
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+
+    def hedge_delay(self, histogram: LatencyHistogram) -> float:
+        """Seconds to wait for the primary before sending the hedged request."""
+        if len(histogram) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, histogram.percentile(self.percentile))
+
+
+_hedging_stats = {"requests": 0, "hedged": 0, "secondary_wins": 0}
+_hedging_stats_lock = threading.Lock()
+
+
+def record_hedge(hedged: bool, secondary_won: bool) -> None:
+    """Count one hedging-eligible request and its outcome."""
+    with _hedging_stats_lock:
+        _hedging_stats["requests"] += 1
+        _hedging_stats["hedged"] += int(hedged)
+        _hedging_stats["secondary_wins"] += int(secondary_won)
+
+
+def get_hedging_metrics() -> dict:
+    """How many requests were hedged and how often the secondary answered first."""
+    with _hedging_stats_lock:
+        return dict(_hedging_stats)
@@ -0,0 +1,259 @@
+"""
+Synthetic local stand-in for an LLM provider.
+
+The model produces plausible NetLogo movement rules from the grammar accepted by
+NetLogoVerifier, injects invalid rules, unfenced responses, latency and API errors
+at configurable rates, and needs no network access or API key. It is meant for
+load-testing the mutation pipeline (concurrency, retries, caching, timeouts).
+"""
+import json
+import math
+import random
+import re
+import time
+from typing import Any, Iterator, List, Optional
+
+import gin
+from pydantic import PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class SimulatedRateLimitError(Exception):
+    """Injected stand-in for a provider's HTTP 429 response."""
+    status_code = 429
+
+
+class SimulatedTimeoutError(TimeoutError):
+    """Injected stand-in for a request that never returned."""
+
+
+# Grammar pieces (all accepted by NetLogoVerifier)
+MOVEMENT_COMMANDS = ["fd", "rt", "lt", "bk"]
+SENSOR_VARIABLES = ["input"]
+COMPARISONS = [">", "<", "!=", "="]
+
+# Invalid variations, each mapped to the error class it should trigger
+INVALID_KINDS = ["dangerous_primitive", "unbalanced_brackets", "no_movement", "unknown_token"]
+DANGEROUS_SNIPPETS = ["ask turtles [ die ]", "hatch 1", "clear-all", "repeat 3 [ fd 1 ]"]
+
+# Closing instruction shared by every evolution strategy's pseudocode_prompt
+PSEUDOCODE_REQUEST = re.compile(r"pseudocode enclosed in triple backticks", re.IGNORECASE)
+
+
+@gin.configurable
+class LocalSimChatModel(BaseChatModel):
+    """
+    Chat model that fabricates NetLogo rules locally.
+
+    Attributes:
+        invalid_rate: Probability that a response contains an invalid rule
+        fenced_rate: Probability that the code is wrapped in a ```netlogo fence
+        rate_limit_error_rate: Probability of raising SimulatedRateLimitError
+        timeout_error_rate: Probability of raising SimulatedTimeoutError
+        latency_distribution: "constant", "uniform", "normal" or "lognormal"
+        latency_mean: Mean per-call latency in seconds
+        latency_stddev: Spread of the latency distribution in seconds
+        timeout_latency: Seconds to wait before raising an injected timeout
+        first_token_fraction: Share of the latency spent before the first streamed chunk
+        max_depth: Maximum nesting depth of generated ifelse blocks
+        seed: Optional seed for reproducible runs
+    """
+
+    invalid_rate: float = 0.2
+    fenced_rate: float = 0.85
+    rate_limit_error_rate: float = 0.02
+    timeout_error_rate: float = 0.01
+    latency_distribution: str = "lognormal"
+    latency_mean: float = 0.5
+    latency_stddev: float = 0.25
+    timeout_latency: float = 2.0
+    first_token_fraction: float = 0.3
+    max_depth: int = 2
+    seed: Optional[int] = None
+
+    _rng: random.Random = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "local-sim"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {
+            "invalid_rate": self.invalid_rate,
+            "fenced_rate": self.fenced_rate,
+            "latency_distribution": self.latency_distribution,
+            "latency_mean": self.latency_mean,
+        }
+
+    # --- Latency and error injection ---
+
+    def sample_latency(self) -> float:
+        """Draw a per-call latency (seconds) from the configured distribution."""
+        mean, stddev = self.latency_mean, self.latency_stddev
+        if self.latency_distribution == "constant" or mean <= 0:
+            return max(0.0, mean)
+        if self.latency_distribution == "uniform":
+            return self._rng.uniform(max(0.0, mean - stddev), mean + stddev)
+        if self.latency_distribution == "normal":
+            return max(0.0, self._rng.gauss(mean, stddev))
+        if self.latency_distribution == "lognormal":
+            # Parameterise so the distribution has the requested mean and stddev
+            variance_ratio = 1.0 + (stddev / mean) ** 2
+            sigma = math.sqrt(math.log(variance_ratio))
+            mu = math.log(mean) - sigma ** 2 / 2
+            return self._rng.lognormvariate(mu, sigma)
+        raise ValueError(f"Unsupported latency distribution: {self.latency_distribution}")
+
+    def _inject_errors(self) -> None:
+        roll = self._rng.random()
+        if roll < self.rate_limit_error_rate:
+            raise SimulatedRateLimitError("Error code: 429 - simulated rate limit exceeded")
+        if roll < self.rate_limit_error_rate + self.timeout_error_rate:
+            time.sleep(self.timeout_latency)
+            raise SimulatedTimeoutError("Simulated request timed out")
+
+    # --- Rule grammar ---
+
+    def _value(self) -> str:
+        roll = self._rng.random()
+        if roll < 0.4:
+            return str(self._rng.choice([0.5, 1, 2, 3, 5, 10, 15, 30, 45, 90]))
+        if roll < 0.7:
+            return f"random {self._rng.randint(2, 90)}"
+        if roll < 0.9:
+            return f"random-float {self._rng.randint(1, 10)}"
+        return f"(1 + random-float {self._rng.randint(1, 5)})"
+
+    def _commands(self) -> str:
+        count = self._rng.randint(1, 3)
+        return " ".join(f"{self._rng.choice(MOVEMENT_COMMANDS)} {self._value()}" for _ in range(count))
+
+    def _condition(self) -> str:
+        variable = self._rng.choice(SENSOR_VARIABLES)
+        index = self._rng.randint(0, 2)
+        return f"item {index} {variable} {self._rng.choice(COMPARISONS)} {self._rng.randint(0, 5)}"
+
+    def _block(self, depth: int) -> str:
+        if depth >= self.max_depth or self._rng.random() < 0.5:
+            return self._commands()
+        if self._rng.random() < 0.5:
+            return f"if {self._condition()} [ {self._block(depth + 1)} ] {self._commands()}"
+        return f"ifelse {self._condition()} [ {self._block(depth + 1)} ] [ {self._block(depth + 1)} ]"
+
+    def generate_rule(self) -> str:
+        """Generate a rule that passes NetLogoVerifier."""
+        return self._block(0)
+
+    def generate_invalid_rule(self) -> str:
+        """Generate a rule that NetLogoVerifier rejects."""
+        kind = self._rng.choice(INVALID_KINDS)
+        rule = self.generate_rule()
+        if kind == "dangerous_primitive":
+            return f"{rule} {self._rng.choice(DANGEROUS_SNIPPETS)}"
+        if kind == "unbalanced_brackets":
+            return f"ifelse {self._condition()} [ {self._commands()} [ {self._commands()} ]"
+        if kind == "no_movement":
+            return "stop"
+        return f"{rule} #"
+
+    def _rule(self) -> str:
+        """A valid rule, or an invalid one with probability invalid_rate."""
+        invalid = self._rng.random() < self.invalid_rate
+        return self.generate_invalid_rule() if invalid else self.generate_rule()
+
+    def _pseudocode(self) -> str:
+        steps = [
+            "If there is a resource ahead, move forward a small step",
+            "Otherwise turn a random angle up to 45 degrees",
+            "Move forward a random distance between 1 and 5",
+            "If a resource is to the left, turn left 15 degrees",
+        ]
+        return "\n".join(self._rng.sample(steps, self._rng.randint(2, len(steps))))
+
+    def _respond(self, prompt_text: str) -> str:
+        if PSEUDOCODE_REQUEST.search(prompt_text):
+            return f"```\n{self._pseudocode()}\n```"
+        if "EDIT FORMAT" in prompt_text:
+            # Edit mode (see edit_format.py): replace one numbered line of the original code
+            lines = re.findall(r"^\s*(\d+)\| ", prompt_text, re.MULTILINE)
+            line = self._rng.choice(lines) if lines else "1"
+            return f"```edits\nREPLACE {line}: {self._rule()}\n```"
+        if "### CHILD N" in prompt_text:
+            # Batched prompt (see batch_prompt.py): one delimited answer per child section
+            children = len(re.findall(r"<child id=", prompt_text))
+            return "\n\n".join(f"### CHILD {number}\n```netlogo\n{self._rule()}\n```"
+                                 for number in range(1, children + 1))
+
+        rule = self._rule()
+        if self._rng.random() < self.fenced_rate:
+            return f"Here is the improved rule:\n```netlogo\n{rule}\n```"
+        return rule
+
+    @staticmethod
+    def _usage(prompt_text: str, text: str) -> dict:
+        return {
+            "input_tokens": len(prompt_text) // 4,
+            "output_tokens": len(text) // 4,
+            "total_tokens": (len(prompt_text) + len(text)) // 4,
+        }
+
+    # --- BaseChatModel interface ---
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        prompt_text = "\n".join(str(message.content) for message in messages)
+        time.sleep(self.sample_latency())
+        self._inject_errors()
+
+        generations = []
+        for _ in range(kwargs.get("n", 1)):
+            if kwargs.get("tools"):
+                message = self._tool_call_message(prompt_text, kwargs["tools"][0])
+            else:
+                text = self._respond(prompt_text)
+                message = AIMessage(content=text, usage_metadata=self._usage(prompt_text, text))
+            generations.append(ChatGeneration(message=message))
+        return ChatResult(generations=generations)
+
+    def _tool_call_message(self, prompt_text: str, tool: dict) -> AIMessage:
+        """Answer a structured-output request with a tool call filling new_code (and pseudocode)."""
+        args = {"new_code": self._rule(), "pseudocode": self._pseudocode()}
+        text = json.dumps(args)
+        tool_call = {"name": tool["function"]["name"], "args": args, "id": f"call_{self._rng.getrandbits(32):08x}"}
+        return AIMessage(content="", tool_calls=[tool_call], usage_metadata=self._usage(prompt_text, text))
+
+    def bind_tools(self, tools: List[Any], tool_choice: Any = None, **kwargs: Any):
+        """Support with_structured_output: tools are passed through to _generate."""
+        from langchain_core.utils.function_calling import convert_to_openai_tool
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools], **kwargs)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        prompt_text = "\n".join(str(message.content) for message in messages)
+        latency = self.sample_latency()
+        time.sleep(latency * self.first_token_fraction)
+        self._inject_errors()
+
+        text = self._respond(prompt_text)
+        pieces = re.findall(r"\S+\s*|\s+", text)
+        per_piece = latency * (1 - self.first_token_fraction) / max(1, len(pieces))
+        for i, piece in enumerate(pieces):
+            usage = self._usage(prompt_text, text) if i == len(pieces) - 1 else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+            time.sleep(per_piece)
@@ -0,0 +1,96 @@
+"""
+Prompt layout for provider-side prefix caching.
+
+Providers cache the longest byte-identical prefix of a request (automatically for
+OpenAI and DeepSeek, via cache_control markers for Anthropic). The stored prompts
+interleave per-agent values such as {original_code} with long static instructions,
+so no two requests share a useful prefix. This module moves every variable part to
+the end: the static instructions, with placeholders replaced by references to tagged
+sections, become part of the system message, and the values follow in the user
+message.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+PLACEHOLDER_PATTERN = re.compile(r"(?<!\{)\{(\w+)\}(?!\})")
+
+# Providers that need explicit cache_control markers to cache a prefix
+CACHE_CONTROL_MODELS = {"claude"}
+
+
+@lru_cache(maxsize=256)
+def static_layout(template: str, names: FrozenSet[str]) -> Tuple[str, Tuple[str, ...]]:
+    """
+    The static part of a template and the order of its variable sections.
+
+    Cached because the same few templates are laid out for every agent.
+
+    Args:
+        template: Prompt template using str.format placeholders
+        names: Placeholders that will receive values
+
+    Returns:
+        Tuple of (static_text, placeholder names in order of first appearance)
+    """
+    order: List[str] = []
+
+    def reference(match: re.Match) -> str:
+        name = match.group(1)
+        if name not in names:
+            return match.group(0)
+        if name not in order:
+            order.append(name)
+        return f"<{name}> (provided at the end)"
+
+    static_text = PLACEHOLDER_PATTERN.sub(reference, template)
+    static_text = static_text.replace("{{", "{").replace("}}", "}")
+    return static_text, tuple(order)
+
+
+def split_template(template: str, values: Dict[str, str]) -> Tuple[str, str]:
+    """
+    Split a str.format template into a static part and a variable part.
+
+    Each placeholder is replaced by a reference to a tagged section, and the tagged
+    sections holding the actual values are collected (in order of first appearance)
+    into the variable part.
+
+    Args:
+        template: Prompt template using str.format placeholders
+        values: Values for the placeholders
+
+    Returns:
+        Tuple of (static_text, variable_text)
+    """
+    static_text, order = static_layout(template, frozenset(values))
+    variable_text = "\n\n".join(f"<{name}>\n{values[name]}\n</{name}>" for name in order)
+    return static_text, variable_text
+
+
+def build_prefix_cached_messages(system_message: str, template: str, values: Dict[str, str],
+                                 model_name: str) -> List[BaseMessage]:
+    """
+    Build a [system, user] message pair whose system message is a stable prefix.
+
+    Args:
+        system_message: Generic system instructions
+        template: Task prompt template with str.format placeholders
+        values: Per-call values for the placeholders
+        model_name: Provider key, used to decide whether cache_control markers are added
+
+    Returns:
+        Messages ready to be sent to the chat model
+    """
+    static_text, variable_text = split_template(template, values)
+    system = prefix_system_message(f"{system_message}\n\n{static_text}", model_name)
+    return [system, HumanMessage(content=variable_text or "Begin.")]
+
+
+def prefix_system_message(prefix: str, model_name: str) -> SystemMessage:
+    """System message holding a cacheable prefix, with a cache_control marker where needed."""
+    if model_name in CACHE_CONTROL_MODELS:
+        return SystemMessage(content=[{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}])
+    return SystemMessage(content=prefix)
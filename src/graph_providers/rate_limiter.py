@@ -0,0 +1,240 @@
+"""
+Provider-aware rate limiting and retry-with-backoff for LLM calls.
+
+Every provider (groq, claude, ...) gets one shared ProviderRateLimiter per process, so
+concurrent mutations draw from the same requests/min and tokens/min budgets instead of
+tripping the provider's 429s. Rate-limit and 5xx errors are retried with exponential
+backoff and jitter rather than wasting the mutation.
+"""
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional, Any
+
+import gin
+
+from src.utils.cost_ledger import record_event
+from src.utils.deadline import DeadlineExceeded, remaining
+from src.utils.logging import get_logger
+
+RETRYABLE_STATUS_CODES = {429}
+RETRYABLE_ERROR_NAMES = ("RateLimit", "InternalServer", "ServiceUnavailable", "Overloaded")
+
+
+class TokenBucket:
+    """Thread-safe token bucket that refills continuously at a fixed rate."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        """
+        Args:
+            capacity: Maximum number of tokens the bucket holds (burst size)
+            refill_per_second: Tokens added per second
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` tokens, going into debt if necessary.
+
+        Returns:
+            Seconds the caller has to wait before its reservation is covered
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+            self.updated_at = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.refill_per_second
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Return the HTTP status code attached to a provider SDK exception, if any."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Rate-limit (429) and server-side (5xx) errors are worth retrying."""
+    status = get_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or 500 <= status < 600
+    return any(name in type(error).__name__ for name in RETRYABLE_ERROR_NAMES)
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Read a Retry-After header (seconds) from the error's HTTP response, if present."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+@gin.configurable
+class ProviderRateLimiter:
+    """
+    Shared requests/min and tokens/min limiter with exponential backoff for one provider.
+    """
+
+    def __init__(self, provider_name: str,
+                 requests_per_minute: Optional[Dict[str, float]] = None,
+                 tokens_per_minute: Optional[Dict[str, float]] = None,
+                 max_retries: int = 4,
+                 base_delay: float = 1.0,
+                 max_delay: float = 30.0,
+                 jitter: float = 0.5):
+        """
+        Initialize the limiter for a provider.
+
+        Args:
+            provider_name: Provider key from SupportedModels (e.g. "groq")
+            requests_per_minute: Per-provider request budgets, e.g. {"groq": 30}
+            tokens_per_minute: Per-provider token budgets, e.g. {"groq": 30000}
+            max_retries: Retries after a rate-limit or 5xx error before giving up
+            base_delay: Backoff delay (seconds) for the first retry
+            max_delay: Upper bound (seconds) for a single backoff delay
+            jitter: Fraction of the backoff delay that is randomised
+        """
+        self.provider_name = provider_name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.logger = get_logger()
+
+        rpm = (requests_per_minute or {}).get(provider_name)
+        tpm = (tokens_per_minute or {}).get(provider_name)
+        self.request_bucket = TokenBucket(rpm, rpm / 60.0) if rpm else None
+        self.token_bucket = TokenBucket(tpm, tpm / 60.0) if tpm else None
+
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "rate_limited": 0,
+            "server_errors": 0,
+            "failures": 0,
+            "queue_delay_total": 0.0,
+            "queue_delay_max": 0.0,
+            "queue_delay_last": 0.0,
+            "backoff_delay_total": 0.0,
+        }
+
+    def acquire(self, estimated_tokens: int = 0) -> float:
+        """
+        Block until one request (and `estimated_tokens` tokens) fit in the budget.
+
+        Returns:
+            Queueing delay in seconds
+        """
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket and estimated_tokens:
+            wait = max(wait, self.token_bucket.reserve(min(estimated_tokens, self.token_bucket.capacity)))
+        if wait > 0:
+            self.logger.info(f"Rate limiter for {self.provider_name}: queueing request for {wait:.2f}s")
+            time.sleep(wait)
+
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["queue_delay_total"] += wait
+            self.stats["queue_delay_max"] = max(self.stats["queue_delay_max"], wait)
+            self.stats["queue_delay_last"] = wait
+        return wait
+
+    def backoff_delay(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """Exponential backoff with jitter, honouring Retry-After when the provider sends it."""
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay *= 1 - self.jitter + self.jitter * random.random()
+        retry_after = get_retry_after(error) if error is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def call(self, fn: Callable[[], Any], estimated_tokens: int = 0) -> Any:
+        """
+        Run `fn` inside the rate budget, retrying rate-limit and 5xx errors with backoff.
+
+        Args:
+            fn: Zero-argument callable performing the LLM request
+            estimated_tokens: Tokens the request is expected to consume (prompt + completion)
+
+        Returns:
+            Whatever `fn` returns
+
+        Raises:
+            The last error once retries are exhausted, or any non-retryable error immediately;
+            DeadlineExceeded if the mutation's deadline passes before a request is sent
+        """
+        attempt = 0
+        while True:
+            left = remaining()
+            if left is not None and left <= 0:
+                raise DeadlineExceeded(f"{self.provider_name} request not sent, mutation deadline passed")
+            self.acquire(estimated_tokens)
+            try:
+                return fn()
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= self.max_retries:
+                    with self.lock:
+                        self.stats["failures"] += 1
+                    raise
+
+                status = get_status_code(e)
+                delay = self.backoff_delay(attempt, e)
+                left = remaining()
+                if left is not None and delay >= left:
+                    # The retry could not finish before the mutation's deadline
+                    with self.lock:
+                        self.stats["failures"] += 1
+                    raise
+                with self.lock:
+                    self.stats["retries"] += 1
+                    self.stats["backoff_delay_total"] += delay
+                    if status is None or status == 429:
+                        self.stats["rate_limited"] += 1
+                    else:
+                        self.stats["server_errors"] += 1
+                record_event("provider_retries")
+                self.logger.warning(f"{self.provider_name} request failed ({type(e).__name__}: {str(e)[:100]}), "
+                                    f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def metrics(self) -> dict:
+        """Snapshot of request, retry and queueing-delay counters."""
+        with self.lock:
+            snapshot = dict(self.stats)
+        requests = snapshot["requests"]
+        snapshot["queue_delay_mean"] = snapshot["queue_delay_total"] / requests if requests else 0.0
+        return snapshot
+
+
+_rate_limiters: Dict[str, ProviderRateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider_name: str) -> ProviderRateLimiter:
+    """Return the process-wide limiter for a provider, creating it on first use."""
+    with _rate_limiters_lock:
+        if provider_name not in _rate_limiters:
+            _rate_limiters[provider_name] = ProviderRateLimiter(provider_name)
+        return _rate_limiters[provider_name]
+
+
+def get_rate_limiter_metrics() -> Dict[str, dict]:
+    """Metrics (including queueing delay) for every provider limiter created so far."""
+    with _rate_limiters_lock:
+        limiters = dict(_rate_limiters)
+    return {name: limiter.metrics() for name, limiter in limiters.items()}
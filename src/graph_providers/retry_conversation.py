@@ -0,0 +1,92 @@
+"""
+Conversational retries: send only the verifier error as a follow-up turn.
+
+A normal retry formats the retry_prompts template again with the original code, the full
+error and the pseudocode, and starts a fresh single-turn conversation. In conversational
+mode a retry instead replays the mutation's first prompt unchanged, followed by each
+failed attempt as an assistant turn and its (truncated) verifier error as a short user
+turn. The replayed prefix is byte-identical across attempts, so with prefix caching only
+the new turns are billed and processed at full cost.
+
+The first prompt is replayed as it was sent: generate_code captures its formatted messages
+(capture_prompts) and keeps them in the generation state, because the state it was built
+from changes between attempts (e.g. verify_code replaces the initial pseudocode).
+"""
+import contextvars
+import re
+from contextlib import contextmanager
+from typing import Iterator, List, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+RETRY_FOLLOWUP = (
+    "That code failed verification:\n{errors}\n\n"
+    "Fix these errors and answer with the complete corrected rule in a ```netlogo block."
+)
+
+# List collecting the prompts built while capture_prompts runs
+_prompt_sink: contextvars.ContextVar = contextvars.ContextVar("prompt_sink", default=None)
+
+# is_safe joins one "SEVERITY[ at line N]: message[\n  Code: '...']" entry per error
+ERROR_ENTRY_PATTERN = re.compile(r"\n(?=[A-Z]+(?: at line \d+)?: )")
+
+
+def truncate_errors(error_message: str, max_errors: int = 3, max_chars: int = 600) -> str:
+    """
+    Shorten a verifier message to its first few errors.
+
+    Args:
+        error_message: Message from NetLogoVerifier.is_safe (or a cascade quality issue)
+        max_errors: Errors kept; the rest are summarised as a count
+        max_chars: Hard limit on the returned text
+
+    Returns:
+        The kept errors, one per entry, with "(N more errors)" when some were dropped
+    """
+    entries = [entry.strip() for entry in ERROR_ENTRY_PATTERN.split(error_message or "") if entry.strip()]
+    text = "\n".join(entries[:max_errors])
+    if len(entries) > max_errors:
+        text += f"\n({len(entries) - max_errors} more errors)"
+    if len(text) > max_chars:
+        text = text[:max_chars].rstrip() + " ..."
+    return text
+
+
+@contextmanager
+def capture_prompts() -> Iterator[List[List[BaseMessage]]]:
+    """Collect the formatted messages of each prompt recorded (record_prompt) while the block runs."""
+    prompts: List[List[BaseMessage]] = []
+    token = _prompt_sink.set(prompts)
+    try:
+        yield prompts
+    finally:
+        _prompt_sink.reset(token)
+
+
+def record_prompt(messages: Sequence[BaseMessage]) -> None:
+    """Hand a prompt about to be sent to the enclosing capture_prompts block, if any."""
+    prompts = _prompt_sink.get()
+    if prompts is not None:
+        prompts.append(list(messages))
+
+
+def build_retry_messages(first_messages: Sequence[BaseMessage], failed_attempts: Sequence[Tuple[str, str]],
+                         max_errors: int = 3, max_chars: int = 600) -> List[BaseMessage]:
+    """
+    Extend the first attempt's messages with one assistant/user turn pair per failed attempt.
+
+    Args:
+        first_messages: The formatted prompt of the mutation's first attempt
+        failed_attempts: (code, error_message) per failed attempt, oldest first
+        max_errors: Errors kept per follow-up (see truncate_errors)
+        max_chars: Characters kept per follow-up error text
+
+    Returns:
+        Messages ready to be sent to the chat model
+    """
+    messages = list(first_messages)
+    for code, error_message in failed_attempts:
+        messages.append(AIMessage(content=f"```netlogo\n{code}\n```"))
+        messages.append(HumanMessage(content=RETRY_FOLLOWUP.format(
+            errors=truncate_errors(error_message, max_errors, max_chars))))
+    return messages
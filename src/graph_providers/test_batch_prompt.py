@@ -0,0 +1,47 @@
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.graph_providers.batch_prompt import build_batch_messages, parse_batch_response
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.netlogo_code_generator.state import initial_state
+from src.verification.verify_netlogo import NetLogoVerifier
+
+
+def state(code):
+    return initial_state([code, []], provider="local-sim")
+
+
+class TestBatchPrompt(unittest.TestCase):
+    def test_static_instructions_are_sent_once(self):
+        messages = build_batch_messages("system", "Improve:\n{original_code}",
+                                        [{"original_code": "fd 1"}, {"original_code": "rt 90"}], "groq")
+        self.assertEqual(messages[0].content.count("Improve:"), 1)
+        self.assertIn('<child id="2">\n<original_code>\nrt 90\n</original_code>\n</child>', messages[1].content)
+
+    def test_parse_batch_response(self):
+        response = ("Here you go.\n### CHILD 2\n```netlogo\nrt 5\n```\n"
+                    "### Child 1 (improved)\n```netlogo\nfd 3\n```\n### CHILD 9\nfd 1")
+        self.assertEqual(parse_batch_response(response, 3), ["```netlogo\nfd 3\n```", "```netlogo\nrt 5\n```", None])
+        self.assertEqual(parse_batch_response("no headers", 2), [None, None])
+
+
+class TestBatchedGeneration(unittest.TestCase):
+    def test_only_failed_children_are_retried(self):
+        provider = GraphUnifiedProvider("local-sim", NetLogoVerifier())
+        provider.model = FakeListChatModel(responses=[
+            "### CHILD 1\n```netlogo\nfd 2\n```\n### CHILD 2\n```netlogo\nfd 3 [\n```\n### CHILD 3\n```netlogo\nrt 4\n```",
+            "### CHILD 1\n```netlogo\nlt 7\n```",
+        ])
+        codes = provider.generate_batch_from_states([state("fd 1"), state("rt 1"), state("lt 1")], max_attempts=1)
+        self.assertEqual(codes, ["fd 2", "lt 7", "rt 4"])
+
+    def test_children_fall_back_to_parent_when_attempts_run_out(self):
+        provider = GraphUnifiedProvider("local-sim", NetLogoVerifier())
+        provider.model = FakeListChatModel(responses=["### CHILD 1\n```netlogo\nfd 2\n```"])
+        codes = provider.generate_batch_from_states([state("fd 1"), state("rt 1")], max_attempts=0)
+        self.assertEqual(codes, ["fd 2", "rt 1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
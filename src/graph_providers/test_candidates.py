@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.graph_providers.local_sim import LocalSimChatModel
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.graph_providers.usage import UsageTracker
+from src.netlogo_code_generator.nodes import generate_candidates
+from src.netlogo_code_generator.state import initial_state
+from src.verification.verify_netlogo import NetLogoVerifier
+
+
+def state(code):
+    return initial_state([code, []], provider="local-sim")
+
+
+class FixedCandidates:
+    """Provider stub yielding a fixed list of candidates."""
+
+    def __init__(self, candidates):
+        self.candidates = candidates
+        self.yielded = 0
+
+    def generate_candidates_from_state(self, state, num_candidates):
+        for code in self.candidates[:num_candidates]:
+            self.yielded += 1
+            yield code
+
+
+class TestCandidateSelection(unittest.TestCase):
+    def setUp(self):
+        self.verifier = NetLogoVerifier()
+
+    def test_first_valid_candidate_stops_iteration(self):
+        provider = FixedCandidates(["fd 1 ]", "rt 10 fd 2", "fd 1"])
+        result = generate_candidates(state("fd 1"), provider, self.verifier, 3)
+        self.assertEqual(result["current_code"], "rt 10 fd 2")
+        self.assertEqual(provider.yielded, 2)
+
+    def test_shortest_valid_candidate(self):
+        provider = FixedCandidates(["rt 10 fd 2 lt 5", "fd 3", "fd 1"])
+        result = generate_candidates(state("fd 1"), provider, self.verifier, 3, selection="shortest")
+        # The parent itself is the provider's fallback, not a candidate
+        self.assertEqual(result["current_code"], "fd 3")
+
+    def test_no_valid_candidate_keeps_the_first_for_its_error(self):
+        provider = FixedCandidates(["fd 1 ]", "fd 1"])
+        result = generate_candidates(state("fd 1"), provider, self.verifier, 2)
+        self.assertEqual(result["current_code"], "fd 1 ]")
+
+
+class TestCandidateGeneration(unittest.TestCase):
+    def setUp(self):
+        self.provider = GraphUnifiedProvider("local-sim", NetLogoVerifier(), structured_output=False)
+
+    def test_parallel_requests(self):
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nfd 2\n```"])
+        with patch("src.graph_providers.unified_provider.N_COMPLETIONS_MODELS", set()):
+            codes = list(self.provider.generate_candidates_from_state(state("fd 1"), 3))
+        self.assertEqual(codes, ["fd 2"] * 3)
+
+    def test_parallel_requests_fall_back_to_the_original_code(self):
+        with patch("src.graph_providers.unified_provider.N_COMPLETIONS_MODELS", set()), \
+                patch.object(self.provider, "invoke_chain", side_effect=RuntimeError("down")):
+            codes = list(self.provider.generate_candidates_from_state(state("fd 1"), 2))
+        self.assertEqual(codes, ["fd 1", "fd 1"])
+
+    def test_n_completions_in_one_request(self):
+        self.provider.model = LocalSimChatModel(seed=3, latency_mean=0.0, invalid_rate=0.0,
+                                                rate_limit_error_rate=0.0, timeout_error_rate=0.0)
+        codes = list(self.provider.generate_candidates_from_state(state("fd 1"), 3))
+        self.assertEqual(len(codes), 3)
+        self.assertTrue(all(self.provider.verifier.is_safe(code)[0] for code in codes))
+
+    def test_n_completions_fall_back_to_the_original_code(self):
+        with patch.object(self.provider, "call_with_breaker", side_effect=RuntimeError("down")):
+            codes = list(self.provider.generate_candidates_from_state(state("fd 1"), 3))
+        self.assertEqual(codes, ["fd 1"])
+
+
+class TestCompletionUsage(unittest.TestCase):
+    @staticmethod
+    def completions(*output_tokens):
+        return LLMResult(generations=[[ChatGeneration(message=AIMessage(content="fd 1", usage_metadata={
+            "input_tokens": 100, "output_tokens": tokens, "total_tokens": 100 + tokens}))
+            for tokens in output_tokens]])
+
+    def test_output_is_counted_per_completion(self):
+        tracker = UsageTracker("local-sim")
+        tracker.on_llm_end(self.completions(5, 7, 9))
+        metrics = tracker.metrics()
+        self.assertEqual((metrics["calls"], metrics["input_tokens"], metrics["output_tokens"]), (1, 100, 21))
+
+    def test_repeated_call_totals_are_counted_once(self):
+        tracker = UsageTracker("local-sim")
+        tracker.on_llm_end(self.completions(21, 21, 21))
+        self.assertEqual(tracker.metrics()["output_tokens"], 21)
+
+
+if __name__ == "__main__":
+    unittest.main()
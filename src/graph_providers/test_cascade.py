@@ -0,0 +1,95 @@
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel, GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from src.graph_providers import cascade as cascade_module
+from src.graph_providers.cascade import ModelCascade
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.netlogo_code_generator.graph import NetLogoCodeGenerator
+from src.utils.cost_ledger import CostLedger
+from src.verification.verify_netlogo import NetLogoVerifier
+
+PARENT = "fd 1 rt 10"
+AGENT_INFO = [PARENT, [1, 2, 3], PARENT, 0.5, 10, "move"]
+
+
+def fenced(code):
+    return f"```netlogo\n{code}\n```"
+
+
+class TestModelCascade(unittest.TestCase):
+    def setUp(self):
+        self.verifier = NetLogoVerifier()
+        self.cascade = ModelCascade(enabled=True, tiers=["groq:small", "groq:large", "claude"],
+                                    min_complexity=3, max_code_chars=40)
+
+    def test_tiers_by_attempt(self):
+        self.assertEqual(self.cascade.tier(0), ("groq", "small"))
+        self.assertEqual(self.cascade.tier(2), ("claude", None))
+        self.assertEqual(self.cascade.tier(5), ("claude", None))
+
+    def test_quality_checks(self):
+        self.assertIn("identical", self.cascade.quality_issue("fd 1  rt 10", PARENT, self.verifier))
+        self.assertIn("too simple", self.cascade.quality_issue("fd 2", PARENT, self.verifier))
+        self.assertIn("characters", self.cascade.quality_issue("fd 1 " * 10, PARENT, self.verifier))
+        self.assertIsNone(self.cascade.quality_issue("ifelse random 2 = 0 [ fd 1 ] [ rt 5 ]", PARENT, self.verifier))
+
+    def test_last_tier_is_always_accepted(self):
+        self.assertIsNotNone(self.cascade.review(0, PARENT, PARENT, True, self.verifier))
+        self.assertIsNone(self.cascade.review(2, PARENT, PARENT, True, self.verifier))
+        tiers = self.cascade.metrics()["tiers"]
+        self.assertEqual(tiers[0]["escalation_rate"], 1.0)
+        self.assertEqual(tiers[2]["accepted"], 1)
+
+
+class TestCascadeGeneration(unittest.TestCase):
+    def setUp(self):
+        cascade_module._model_cascade = ModelCascade(enabled=True, tiers=["local-sim", "groq:large"])
+        self.provider = GraphUnifiedProvider("local-sim", NetLogoVerifier())
+
+    def tearDown(self):
+        cascade_module._model_cascade = None
+
+    def test_unchanged_code_escalates_to_the_next_tier(self):
+        self.provider.model = FakeListChatModel(responses=[fenced(PARENT)])
+        self.provider.models["groq:large"] = FakeListChatModel(responses=[fenced("fd 2 lt 15")])
+        generator = NetLogoCodeGenerator(self.provider, NetLogoVerifier())
+        self.assertEqual(generator.generate_code(AGENT_INFO, "move")[0], "fd 2 lt 15")
+        tiers = cascade_module.get_model_cascade().metrics()["tiers"]
+        self.assertEqual([(tier["low_quality"], tier["accepted"]) for tier in tiers], [(1, 0), (0, 1)])
+
+    def test_each_tier_is_charged_its_own_price(self):
+        def answer(code):
+            usage = {"input_tokens": 1_000_000, "output_tokens": 100_000, "total_tokens": 1_100_000}
+            return GenericFakeChatModel(messages=iter([AIMessage(content=fenced(code), usage_metadata=usage)]))
+
+        self.provider.model = answer(PARENT)
+        self.provider.models["groq:large"] = answer("fd 2 lt 15")
+        ledger = CostLedger(prices={"local-sim": {"input": 0.1, "output": 1.0},
+                                    "groq": {"input": 2.0, "output": 10.0}})
+        generator = NetLogoCodeGenerator(self.provider, NetLogoVerifier())
+        with ledger.track_mutation("local-sim") as record:
+            self.assertEqual(generator.generate_code(AGENT_INFO, "move")[0], "fd 2 lt 15")
+        self.assertAlmostEqual(record.cost, (0.1 + 0.1) + (2.0 + 1.0))
+
+    def test_low_quality_code_is_kept_when_no_retry_follows(self):
+        cascade_module._model_cascade = ModelCascade(enabled=True, tiers=["local-sim", "groq:large"],
+                                                     max_code_chars=5)
+        self.provider.model = FakeListChatModel(responses=[fenced("fd 2 lt 15")])
+        generator = NetLogoCodeGenerator(self.provider, NetLogoVerifier())
+        with patch("src.netlogo_code_generator.graph.should_retry", return_value="end"):
+            self.assertEqual(generator.generate_code(AGENT_INFO, "move"), ("fd 2 lt 15", "move"))
+
+    def test_low_quality_code_is_kept_when_the_next_tier_fails(self):
+        self.provider.model = FakeListChatModel(responses=[fenced("fd 2 lt 15 rt 3")])
+        self.provider.models["groq:large"] = FakeListChatModel(responses=[fenced("fd 2 ]")])
+        cascade_module._model_cascade = ModelCascade(enabled=True, tiers=["local-sim", "groq:large"],
+                                                     max_code_chars=5)
+        generator = NetLogoCodeGenerator(self.provider, NetLogoVerifier())
+        self.assertEqual(generator.generate_code(AGENT_INFO, "move")[0], "fd 2 lt 15 rt 3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import time
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.runnables import RunnableLambda
+
+from src.graph_providers import circuit_breaker
+from src.graph_providers.circuit_breaker import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError,
+                                                 get_circuit_breaker_metrics, is_outage_error, route)
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.netlogo_code_generator.nodes import generate_code
+from src.netlogo_code_generator.state import initial_state
+from src.utils.deadline import DeadlineExceeded
+from src.verification.verify_netlogo import NetLogoVerifier
+
+
+def state(code):
+    return initial_state([code, []], provider="local-sim")
+
+
+def timeout(_):
+    raise TimeoutError("request timed out")
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker("groq", enabled=True, failure_threshold=3)
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.metrics()["rejected"], 1)
+
+    def test_failures_outside_the_window_do_not_count(self):
+        breaker = CircuitBreaker("groq", enabled=True, failure_threshold=2, window_seconds=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_probe_closes_or_reopens(self):
+        breaker = CircuitBreaker("groq", enabled=True, failure_threshold=1, open_seconds=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertFalse(breaker.allow_request())  # Only one probe
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        transitions = [(t["from"], t["to"]) for t in breaker.metrics()["transitions"]]
+        self.assertEqual(transitions, [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, OPEN),
+                                       (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)])
+
+    def test_checking_does_not_take_the_probe(self):
+        breaker = CircuitBreaker("groq", enabled=True, failure_threshold=1, open_seconds=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow_request(reserve=False))
+        self.assertTrue(breaker.allow_request(reserve=False))
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request(reserve=False))
+
+    def test_disabled_breaker_never_opens(self):
+        breaker = CircuitBreaker("groq", failure_threshold=1)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_outage_errors(self):
+        self.assertTrue(is_outage_error(TimeoutError()))
+        self.assertTrue(is_outage_error(ConnectionError()))
+        self.assertFalse(is_outage_error(ValueError("bad request")))
+        self.assertFalse(is_outage_error(DeadlineExceeded()))
+
+
+class TestFailover(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker("local-sim", enabled=True, failure_threshold=2, fallbacks={"local-sim": "groq"})
+        circuit_breaker._breakers["local-sim"] = self.breaker
+        self.provider = GraphUnifiedProvider("local-sim", NetLogoVerifier())
+
+    def tearDown(self):
+        circuit_breaker._breakers.pop("local-sim", None)
+        circuit_breaker._breakers.pop("groq", None)
+
+    def test_timeouts_open_the_circuit(self):
+        for _ in range(2):
+            with self.assertRaises(TimeoutError):
+                self.provider.invoke_chain(RunnableLambda(timeout), {})
+        self.assertEqual(get_circuit_breaker_metrics()["local-sim"]["state"], OPEN)
+
+    def test_open_circuit_routes_to_fallback(self):
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nfd 1\n```"])
+        self.provider.models["groq"] = FakeListChatModel(responses=["```netlogo\nfd 2\n```"])
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.provider.generate_code_from_state(state("rt 10")), "fd 2")
+        self.assertEqual(self.breaker.metrics()["failovers"], 1)
+
+    def test_open_circuit_without_fallback_returns_original_at_once(self):
+        self.breaker.fallback = None
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        with self.assertRaises(CircuitOpenError):
+            route("local-sim")
+        self.assertEqual(self.provider.generate_code_from_state(state("rt 10")), "rt 10")
+
+    def test_half_open_probe_closes_through_generation(self):
+        self.breaker.fallback = None
+        self.breaker.open_seconds = 0.01
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.02)
+        # Structured output routes first, then finds the model cannot call tools
+        self.provider.structured_output = True
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nfd 2\n```"])
+        self.assertEqual(generate_code(state("rt 10"), self.provider)["current_code"], "fd 2")
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
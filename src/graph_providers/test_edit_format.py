@@ -0,0 +1,61 @@
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.graph_providers.edit_format import Edit, EditFormatError, apply_edits, number_lines, parse_edits
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.netlogo_code_generator.state import initial_state
+from src.verification.verify_netlogo import NetLogoVerifier
+
+RULE = "\n".join([";; turn towards food", "rt 10", ";; move", "fd 1"])
+
+
+def state(code):
+    return initial_state([code, []], provider="local-sim")
+
+
+class TestEditFormat(unittest.TestCase):
+    def test_number_lines(self):
+        self.assertEqual(number_lines("fd 1\nrt 2"), "1| fd 1\n2| rt 2")
+
+    def test_parse_edits_from_block(self):
+        response = "Changes:\n```edits\nREPLACE 2: rt 20\ninsert after 0: ;; top\nDELETE 3\n```"
+        self.assertEqual(parse_edits(response), [Edit("replace", 2, "rt 20"), Edit("insert", 0, ";; top"),
+                                                 Edit("delete", 3)])
+
+    def test_parse_edits_rejects_prose(self):
+        with self.assertRaises(EditFormatError):
+            parse_edits("Here is the full rule:\nfd 1 rt 2")
+        with self.assertRaises(EditFormatError):
+            parse_edits("```edits\n```")
+
+    def test_edits_use_original_line_numbers(self):
+        edits = [Edit("delete", 1), Edit("insert", 2, "lt 5"), Edit("replace", 4, "fd 2")]
+        self.assertEqual(apply_edits(RULE, edits), "rt 10\nlt 5\n;; move\nfd 2")
+
+    def test_invalid_edits_raise(self):
+        with self.assertRaises(EditFormatError):
+            apply_edits(RULE, [Edit("replace", 5, "fd 1")])
+        with self.assertRaises(EditFormatError):
+            apply_edits(RULE, [Edit("replace", 2, "fd 1"), Edit("delete", 2)])
+
+
+class TestEditGeneration(unittest.TestCase):
+    def setUp(self):
+        self.provider = GraphUnifiedProvider("local-sim", NetLogoVerifier(), edit_format=True, edit_min_lines=4)
+
+    def test_edits_are_applied(self):
+        self.provider.model = FakeListChatModel(responses=["```edits\nREPLACE 4: fd 3\n```"])
+        self.assertEqual(self.provider.generate_edit_from_state(state(RULE)), RULE.replace("fd 1", "fd 3"))
+
+    def test_unusable_edits_fall_back(self):
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nfd 3\n```"])
+        self.assertIsNone(self.provider.generate_edit_from_state(state(RULE)))
+
+    def test_short_rules_are_regenerated_in_full(self):
+        self.provider.model = FakeListChatModel(responses=["```edits\nREPLACE 1: fd 3\n```"])
+        self.assertIsNone(self.provider.generate_edit_from_state(state("fd 1 rt 10")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.graph_providers.hedging import HedgingPolicy, LatencyHistogram, get_hedging_metrics
+from src.graph_providers.local_sim import LocalSimChatModel
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.verification.verify_netlogo import NetLogoVerifier
+
+
+def slow_model(seconds):
+    return LocalSimChatModel(seed=1, latency_distribution="constant", latency_mean=seconds, invalid_rate=0.0,
+                             fenced_rate=1.0, rate_limit_error_rate=0.0, timeout_error_rate=0.0)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(50))
+        for seconds in range(1, 101):
+            histogram.record(seconds / 100)
+        self.assertAlmostEqual(histogram.percentile(50), 0.51)
+        self.assertAlmostEqual(histogram.percentile(95), 0.95)
+        self.assertEqual(histogram.metrics()["buckets"]["0.25"], 25)
+
+    def test_window_keeps_recent_latencies(self):
+        histogram = LatencyHistogram(window=3)
+        for seconds in [9.0, 1.0, 1.0, 1.0]:
+            histogram.record(seconds)
+        self.assertEqual(histogram.percentile(100), 1.0)
+        self.assertEqual(histogram.metrics()["count"], 4)
+
+
+class TestHedgingPolicy(unittest.TestCase):
+    def test_default_delay_until_enough_samples(self):
+        policy = HedgingPolicy(enabled=True, min_samples=5, default_delay=7.0, min_delay=0.5)
+        histogram = LatencyHistogram()
+        for seconds in [1.0, 2.0, 3.0, 4.0]:
+            histogram.record(seconds)
+        self.assertEqual(policy.hedge_delay(histogram), 7.0)
+        histogram.record(5.0)
+        self.assertEqual(policy.hedge_delay(histogram), 5.0)
+
+    def test_delay_has_a_lower_bound(self):
+        policy = HedgingPolicy(enabled=True, min_samples=1, min_delay=0.5)
+        histogram = LatencyHistogram()
+        histogram.record(0.01)
+        self.assertEqual(policy.hedge_delay(histogram), 0.5)
+
+
+class TestInvokeHedged(unittest.TestCase):
+    def setUp(self):
+        self.provider = GraphUnifiedProvider("local-sim", NetLogoVerifier(), structured_output=False)
+        self.provider.hedging = HedgingPolicy(enabled=True, secondary_model_name="claude",
+                                              min_samples=10 ** 6, default_delay=0.05)
+        self.prompt, self.invoke_input, self.tokens = self.provider.build_prompt(
+            {"original_code": "fd 1", "error_message": None, "modified_pseudocode": None})
+
+    def hedged(self):
+        return self.provider.invoke_hedged(self.prompt, self.invoke_input, self.tokens, "fd 1")
+
+    def test_fast_primary_is_not_hedged(self):
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nrt 5\n```"])
+        self.provider.models["claude"] = FakeListChatModel(responses=["```netlogo\nlt 5\n```"])
+        before = get_hedging_metrics()
+        self.assertEqual(self.hedged(), "rt 5")
+        after = get_hedging_metrics()
+        self.assertEqual(after["requests"] - before["requests"], 1)
+        self.assertEqual(after["hedged"], before["hedged"])
+
+    def test_slow_primary_is_hedged_and_first_valid_answer_wins(self):
+        self.provider.model = slow_model(1.0)
+        self.provider.models["claude"] = FakeListChatModel(responses=["```netlogo\nlt 5\n```"])
+        before = get_hedging_metrics()
+        started = time.monotonic()
+        self.assertEqual(self.hedged(), "lt 5")
+        self.assertLess(time.monotonic() - started, 0.9)
+        after = get_hedging_metrics()
+        self.assertEqual(after["hedged"] - before["hedged"], 1)
+        self.assertEqual(after["secondary_wins"] - before["secondary_wins"], 1)
+        # Let the discarded primary request finish while the test's log capture is open
+        time.sleep(1.0)
+
+    def test_failed_primary_is_hedged_at_once(self):
+        self.provider.hedging.default_delay = 5.0
+        self.provider.models["claude"] = FakeListChatModel(responses=["```netlogo\nlt 5\n```"])
+        invoke_chain = self.provider.invoke_chain
+
+        def primary_fails(chain, invoke_input, estimated_tokens, model_name):
+            if model_name == "local-sim":
+                raise ValueError("bad request")
+            return invoke_chain(chain, invoke_input, estimated_tokens, model_name)
+
+        before = get_hedging_metrics()
+        started = time.monotonic()
+        with patch.object(self.provider, "invoke_chain", side_effect=primary_fails):
+            self.assertEqual(self.hedged(), "lt 5")
+        self.assertLess(time.monotonic() - started, 1.0)
+        after = get_hedging_metrics()
+        self.assertEqual(after["secondary_wins"] - before["secondary_wins"], 1)
+
+    def test_unusable_fast_answer_is_hedged_at_once(self):
+        self.provider.hedging.default_delay = 5.0
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nfd 1 ]\n```"])
+        self.provider.models["claude"] = FakeListChatModel(responses=["```netlogo\nlt 5\n```"])
+        started = time.monotonic()
+        self.assertEqual(self.hedged(), "lt 5")
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_invalid_fast_answer_waits_for_a_valid_one(self):
+        self.provider.model = slow_model(0.3)
+        self.provider.models["claude"] = FakeListChatModel(responses=["```netlogo\nfd 1 ]\n```"])
+        code = self.hedged()
+        self.assertNotEqual(code, "fd 1 ]")
+        self.assertTrue(self.provider.verifier.is_safe(code)[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
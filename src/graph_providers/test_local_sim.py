@@ -0,0 +1,76 @@
+import os
+from collections import defaultdict
+import unittest
+from unittest.mock import patch
+
+from src.graph_providers.local_sim import (
+    LocalSimChatModel,
+    SimulatedRateLimitError,
+    SimulatedTimeoutError,
+)
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.utils.config import load_config
+from src.utils.storeprompts import prompts
+from src.verification.verify_netlogo import NetLogoVerifier
+
+
+class TestLocalSimChatModel(unittest.TestCase):
+
+    def setUp(self):
+        self.verifier = NetLogoVerifier()
+        self.model = LocalSimChatModel(seed=7, latency_mean=0.0,
+                                       rate_limit_error_rate=0.0, timeout_error_rate=0.0)
+
+    def test_generated_rules_verify(self):
+        for _ in range(200):
+            is_safe, message = self.verifier.is_safe(self.model.generate_rule())
+            self.assertTrue(is_safe, message)
+
+    def test_invalid_rules_fail_verification(self):
+        for _ in range(200):
+            is_safe, _ = self.verifier.is_safe(self.model.generate_invalid_rule())
+            self.assertFalse(is_safe)
+
+    def test_unfenced_response(self):
+        model = LocalSimChatModel(seed=1, latency_mean=0.0, fenced_rate=0.0, invalid_rate=0.0,
+                                  rate_limit_error_rate=0.0, timeout_error_rate=0.0)
+        response = model.invoke("Improve this rule").content
+        self.assertNotIn("```", response)
+        self.assertTrue(self.verifier.is_safe(response)[0])
+
+    def test_pseudocode_prompts_get_pseudocode(self):
+        for strategy, templates in prompts["evolution_strategies"].items():
+            with self.subTest(strategy=strategy):
+                # Strategies name their placeholders differently
+                prompt = templates["pseudocode_prompt"].format_map(defaultdict(lambda: "Move forward"))
+                answer = self.model.invoke(prompt).content
+                self.assertTrue(answer.startswith("```\n"), answer)
+                self.assertFalse(self.verifier.is_safe(answer.strip("`\n"))[0])
+
+    def test_injected_errors(self):
+        model = LocalSimChatModel(seed=1, latency_mean=0.0, rate_limit_error_rate=1.0)
+        with self.assertRaises(SimulatedRateLimitError):
+            model.invoke("Improve this rule")
+        model = LocalSimChatModel(seed=1, latency_mean=0.0, rate_limit_error_rate=0.0,
+                                  timeout_error_rate=1.0, timeout_latency=0.0)
+        with self.assertRaises(SimulatedTimeoutError):
+            model.invoke("Improve this rule")
+
+    def test_latency_distributions(self):
+        for distribution in ["constant", "uniform", "normal", "lognormal"]:
+            model = LocalSimChatModel(seed=3, latency_distribution=distribution,
+                                      latency_mean=0.5, latency_stddev=0.1)
+            self.assertGreaterEqual(model.sample_latency(), 0.0)
+
+
+class TestLocalSimWithoutKeys(unittest.TestCase):
+    def test_no_api_keys_needed(self):
+        with patch.dict(os.environ, {}, clear=True), patch("gin.parse_config_file"):
+            self.assertIsNone(load_config()["GROQ_API_KEY"])
+            GraphUnifiedProvider("local-sim", NetLogoVerifier())
+            with self.assertRaises(ValueError):
+                GraphUnifiedProvider("groq", NetLogoVerifier())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from src.graph_providers.prompt_layout import build_prefix_cached_messages, split_template
+
+
+class TestPromptLayout(unittest.TestCase):
+    def test_split_template_moves_values_to_the_end(self):
+        template = "Fix this rule:\n{original_code}\nError: {error_message}\nAgain: {original_code}"
+        static, variable = split_template(template, {"original_code": "fd 1", "error_message": "bad"})
+        self.assertNotIn("fd 1", static)
+        self.assertIn("<original_code> (provided at the end)", static)
+        self.assertEqual(variable, "<original_code>\nfd 1\n</original_code>\n\n<error_message>\nbad\n</error_message>")
+
+    def test_split_template_unescapes_braces(self):
+        static, _ = split_template("Use {{braces}} and {x}", {"x": "1"})
+        self.assertEqual(static, "Use {braces} and <x> (provided at the end)")
+
+    def test_static_prefix_is_identical_across_values(self):
+        template = "Improve:\n{original_code}"
+        first = build_prefix_cached_messages("system", template, {"original_code": "fd 1"}, "groq")
+        second = build_prefix_cached_messages("system", template, {"original_code": "rt 90"}, "groq")
+        self.assertEqual(first[0].content, second[0].content)
+        self.assertNotEqual(first[1].content, second[1].content)
+        self.assertIsInstance(first[1], HumanMessage)
+
+    def test_claude_prefix_gets_cache_control(self):
+        messages = build_prefix_cached_messages("system", "Improve:\n{original_code}", {"original_code": "fd 1"}, "claude")
+        self.assertIsInstance(messages[0], SystemMessage)
+        self.assertEqual(messages[0].content[0]["cache_control"], {"type": "ephemeral"})
+
+
+if __name__ == "__main__":
+    unittest.main()
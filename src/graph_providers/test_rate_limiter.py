@@ -0,0 +1,68 @@
+import unittest
+
+from src.graph_providers.rate_limiter import (
+    ProviderRateLimiter,
+    TokenBucket,
+    is_retryable_error,
+)
+from src.graph_providers.local_sim import SimulatedRateLimitError
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_token_bucket_debt(self):
+        bucket = TokenBucket(capacity=2, refill_per_second=10)
+        self.assertEqual(bucket.reserve(1), 0.0)
+        self.assertEqual(bucket.reserve(1), 0.0)
+        self.assertGreater(bucket.reserve(1), 0.0)
+
+    def test_retryable_errors(self):
+        self.assertTrue(is_retryable_error(SimulatedRateLimitError()))
+        self.assertTrue(is_retryable_error(ServerError()))
+        self.assertFalse(is_retryable_error(BadRequestError()))
+        self.assertFalse(is_retryable_error(ValueError()))
+
+    def test_call_retries_then_succeeds(self):
+        limiter = ProviderRateLimiter("test", max_retries=3, base_delay=0.0)
+        outcomes = [SimulatedRateLimitError(), ServerError(), "ok"]
+
+        def fn():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        self.assertEqual(limiter.call(fn), "ok")
+        metrics = limiter.metrics()
+        self.assertEqual(metrics["retries"], 2)
+        self.assertEqual(metrics["rate_limited"], 1)
+        self.assertEqual(metrics["server_errors"], 1)
+
+    def test_call_raises_non_retryable(self):
+        limiter = ProviderRateLimiter("test", max_retries=3, base_delay=0.0)
+
+        def fn():
+            raise BadRequestError()
+
+        with self.assertRaises(BadRequestError):
+            limiter.call(fn)
+        self.assertEqual(limiter.metrics()["retries"], 0)
+
+    def test_queue_delay_recorded(self):
+        limiter = ProviderRateLimiter("test", requests_per_minute={"test": 600})
+        limiter.request_bucket.tokens = 0
+        delay = limiter.acquire()
+        self.assertGreater(delay, 0.0)
+        self.assertEqual(limiter.metrics()["queue_delay_max"], delay)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.graph_providers.retry_conversation import build_retry_messages, truncate_errors
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.netlogo_code_generator.nodes import generate_code, verify_code
+from src.netlogo_code_generator.state import initial_state
+from src.verification.verify_netlogo import NetLogoVerifier
+
+ERRORS = "\n".join([
+    "ERROR at line 1: Unknown command 'fdd'\n  Code: 'fdd 1'",
+    "ERROR at line 2: Unbalanced brackets",
+    "WARNING: Unused variable 'x'",
+    "ERROR at line 4: Unknown reporter 'foo'",
+])
+
+
+def state(code):
+    return initial_state([code, []], provider="local-sim")
+
+
+class TestTruncateErrors(unittest.TestCase):
+    def test_keeps_first_errors_and_counts_the_rest(self):
+        text = truncate_errors(ERRORS, max_errors=2)
+        self.assertEqual(text, "ERROR at line 1: Unknown command 'fdd'\n  Code: 'fdd 1'\n"
+                               "ERROR at line 2: Unbalanced brackets\n(2 more errors)")
+
+    def test_limits_characters(self):
+        text = truncate_errors("ERROR: " + "x" * 1000, max_chars=50)
+        self.assertEqual(len(text), 54)
+        self.assertTrue(text.endswith(" ..."))
+
+    def test_short_messages_are_unchanged(self):
+        self.assertEqual(truncate_errors("LOW QUALITY: the code is identical"), "LOW QUALITY: the code is identical")
+
+
+class TestRetryConversation(unittest.TestCase):
+    def setUp(self):
+        self.provider = GraphUnifiedProvider("local-sim", NetLogoVerifier(), prefix_cache_layout=True,
+                                             conversational_retry=True)
+
+    def test_turns_follow_the_first_prompt(self):
+        first = [HumanMessage(content="Improve fd 1")]
+        messages = build_retry_messages(first, [("fdd 1", ERRORS), ("fd", "ERROR: Missing input")], max_errors=1)
+        self.assertEqual([type(message) for message in messages],
+                         [HumanMessage, AIMessage, HumanMessage, AIMessage, HumanMessage])
+        self.assertEqual(messages[1].content, "```netlogo\nfdd 1\n```")
+        self.assertIn("(3 more errors)", messages[2].content)
+        self.assertIn("ERROR: Missing input", messages[4].content)
+
+    def test_retry_replays_the_first_prompt(self):
+        first_prompt, invoke_input, _ = self.provider.build_prompt(state("fd 1"))
+        first_messages = first_prompt.format_messages(**invoke_input)
+        retry = dict(state("fd 1"), error_message=ERRORS, retry_count=1, failed_attempts=[("fdd 1", ERRORS)])
+        prompt, invoke_input, _ = self.provider.build_prompt(retry)
+        messages = prompt.format_messages(**invoke_input)
+        self.assertEqual(messages[:len(first_messages)], first_messages)
+        self.assertEqual(len(messages), len(first_messages) + 2)
+        self.assertNotIn("ERROR at line 4", messages[-1].content)
+
+    def test_first_prompt_is_kept_in_the_state(self):
+        first_prompt, invoke_input, _ = self.provider.build_prompt(state("fd 1"))
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nfdd 1\n```"])
+        generated = generate_code(state("fd 1"), self.provider)
+        self.assertEqual(generated["first_messages"], first_prompt.format_messages(**invoke_input))
+        # Retries do not replace it
+        retried = generate_code(dict(generated, error_message=ERRORS, failed_attempts=[("fdd 1", ERRORS)]),
+                                self.provider)
+        self.assertIs(retried["first_messages"], generated["first_messages"])
+
+    def test_retry_replays_the_recorded_prompt(self):
+        # The state may have changed since the first attempt; the prompt actually sent is replayed
+        first_messages = [HumanMessage(content="Improve fd 1 as described: move")]
+        retry = dict(state("fd 1"), error_message=ERRORS, retry_count=1, failed_attempts=[("fdd 1", ERRORS)],
+                     initial_pseudocode="move twice", first_messages=first_messages)
+        prompt, invoke_input, _ = self.provider.build_prompt(retry)
+        messages = prompt.format_messages(**invoke_input)
+        self.assertEqual(messages[:1], first_messages)
+        self.assertEqual(len(messages), 3)
+
+    def test_edit_mode_keeps_the_retry_template(self):
+        retry = dict(state("fd 1"), error_message=ERRORS, failed_attempts=[("fdd 1", ERRORS)])
+        self.provider.edit_format = True
+        prompt, _, _ = self.provider.build_prompt(retry, edit_mode=True)
+        self.assertEqual(len(prompt.messages), 2)
+
+    def test_failed_attempts_are_recorded_and_sent(self):
+        failed = verify_code(dict(state("fd 1"), current_code="fdd 1 ]"), NetLogoVerifier())
+        self.assertEqual(failed["failed_attempts"], [("fdd 1 ]", failed["error_message"])])
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nfd 2\n```"])
+        self.assertEqual(self.provider.generate_code_from_state(failed), "fd 2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import patch
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.generators.base import NLogoCode
+from src.graph_providers.local_sim import LocalSimChatModel
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.netlogo_code_generator.nodes import generate_code
+from src.netlogo_code_generator.state import initial_state
+from src.verification.verify_netlogo import NetLogoVerifier
+
+STATE = initial_state(["fd 1", []], "move forward", True, "move forward", provider="local-sim")
+
+
+class TestStructuredOutput(unittest.TestCase):
+    def setUp(self):
+        self.verifier = NetLogoVerifier()
+        self.provider = GraphUnifiedProvider("local-sim", self.verifier, structured_output=True)
+        self.provider.model = LocalSimChatModel(seed=3, latency_mean=0.0, invalid_rate=0.0,
+                                                rate_limit_error_rate=0.0, timeout_error_rate=0.0)
+
+    def test_structured_generation_returns_schema(self):
+        result = self.provider.generate_structured_from_state(STATE)
+        self.assertIsInstance(result, NLogoCode)
+        self.assertTrue(self.verifier.is_safe(result.new_code)[0])
+        self.assertTrue(result.pseudocode)
+
+    def test_node_uses_structured_code_and_keeps_evolved_pseudocode(self):
+        state = generate_code(dict(STATE), self.provider)
+        self.assertNotEqual(state["current_code"], "fd 1")
+        self.assertEqual(state["modified_pseudocode"], "move forward")
+
+    def test_node_takes_returned_pseudocode_when_asked(self):
+        self.provider.structured_pseudocode = True
+        state = generate_code(dict(STATE), self.provider)
+        self.assertNotEqual(state["modified_pseudocode"], "move forward")
+
+    def test_falls_back_when_model_has_no_tool_calling(self):
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nrt 5 fd 2\n```"])
+        self.assertIsNone(self.provider.generate_structured_from_state(STATE))
+        self.assertIn("local-sim", self.provider.structured_unsupported)
+        state = generate_code(dict(STATE), self.provider)
+        self.assertEqual(state["current_code"], "rt 5 fd 2")
+        self.assertEqual(state["modified_pseudocode"], "move forward")
+
+    def test_outage_is_not_retried_as_free_text(self):
+        with patch.object(self.provider, "invoke_chain", side_effect=TimeoutError("timed out")) as invoke:
+            with self.assertRaises(TimeoutError):
+                self.provider.generate_structured_from_state(STATE)
+            state = generate_code(dict(STATE), self.provider)
+        self.assertEqual(invoke.call_count, 2)  # One call per attempt, none in free text
+        self.assertEqual(state["current_code"], "fd 1")
+
+    def test_schema_failure_falls_back_to_free_text(self):
+        with patch.object(self.provider, "invoke_chain", side_effect=[ValueError("bad tool call"),
+                                                                       "```netlogo\nrt 5 fd 2\n```"]):
+            state = generate_code(dict(STATE), self.provider)
+        self.assertEqual(state["current_code"], "rt 5 fd 2")
+
+    def test_disabled_by_default(self):
+        provider = GraphUnifiedProvider("local-sim", self.verifier)
+        self.assertIsNone(provider.generate_structured_from_state(STATE))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,34 @@
 import os
 from src.utils import logging
-import gin, re
-from typing import Optional, List, Any
+import gin
+from typing import Optional, List, Any, Tuple, Iterator
 from enum import Enum
+import time
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 
-from langchain_anthropic import ChatAnthropic
-from langchain_deepseek import ChatDeepSeek
-from langchain_groq import ChatGroq
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
+from src.generators.base import NLogoCode
 from src.graph_providers.base import GraphProviderBase
+from src.graph_providers.circuit_breaker import CLOSED, CircuitOpenError, get_circuit_breaker, is_outage_error, route
+from src.graph_providers.local_sim import LocalSimChatModel
+from src.graph_providers.rate_limiter import get_rate_limiter
+from src.graph_providers.hedging import HedgingPolicy, get_latency_histogram, record_hedge
+from src.graph_providers.cascade import get_model_cascade
+from src.graph_providers.batch_prompt import build_batch_messages, parse_batch_response
+from src.graph_providers.edit_format import EDIT_INSTRUCTIONS, EditFormatError, apply_edits, number_lines, parse_edits
+from src.graph_providers.prompt_layout import build_prefix_cached_messages
+from src.graph_providers.retry_conversation import build_retry_messages, record_prompt
+from src.graph_providers.usage import get_usage_tracker
+from src.verification.stream_checker import IncrementalCodeChecker
 from src.verification.verify_netlogo import NetLogoVerifier
-from src.utils.storeprompts import prompts
+from src.utils.code_extraction import FENCED_SOURCES, extract_code_candidates, select_code
+from src.utils.cost_ledger import record_event
+from src.utils.retry import get_retry_policy
+from src.utils.storeprompts import CompiledPrompt, prompts
+from src.utils.tracing import SPAN_KIND_CLIENT, current_span, get_tracer
 
 # Define supported models
 class SupportedModels(Enum):
@@ -21,6 +36,21 @@ class SupportedModels(Enum):
     DEEPSEEK = "deepseek"
     GROQ = "groq"
     OPENAI = "openai"
+    LOCAL_SIM = "local-sim"
+
+# Providers whose chat API returns several completions for one request (`n` parameter)
+N_COMPLETIONS_MODELS = {SupportedModels.OPENAI.value, SupportedModels.LOCAL_SIM.value}
+
+# Templates used when the configured prompt is missing from the registry
+DEFAULT_PSEUDOCODE_PROMPT = CompiledPrompt("Generate NetLogo code based on this pseudocode:\n{pseudocode}\n\nOriginal code for context:\n```netlogo\n{original_code}\n```")
+DEFAULT_CODE_ONLY_PROMPT = CompiledPrompt("Evolve or generate code based on the following NetLogo code:\n```netlogo\n{original_code}\n```")
+
+API_KEY_ENV_VARS = {
+    SupportedModels.CLAUDE.value: "ANTHROPIC_API_KEY",
+    SupportedModels.DEEPSEEK.value: "DEEPSEEK_API_KEY",
+    SupportedModels.GROQ.value: "GROQ_API_KEY",
+    SupportedModels.OPENAI.value: "OPENAI_API_KEY",
+}
 
 @gin.configurable
 class GraphUnifiedProvider(GraphProviderBase):
@@ -36,7 +66,18 @@ class GraphUnifiedProvider(GraphProviderBase):
                  claude_model_name: str = "claude-3-5-sonnet-20240229",
                  deepseek_model_name: str = "deepseek-chat",
                  groq_model_name: str = "llama-3.3-70b-versatile",
-                 openai_model_name: str = "gpt-4o"):
+                 openai_model_name: str = "gpt-4o",
+                 stream_generation: bool = False,
+                 stream_later_block_chars: int = 400,
+                 prefix_cache_layout: bool = False,
+                 structured_output: bool = False,
+                 structured_pseudocode: bool = False,
+                 batch_size: int = 1,
+                 edit_format: bool = False,
+                 edit_min_lines: int = 8,
+                 conversational_retry: bool = False,
+                 retry_max_errors: int = 3,
+                 retry_error_chars: int = 600):
         """
         Initialize with model name and verifier instance.
         
@@ -51,6 +92,24 @@ class GraphUnifiedProvider(GraphProviderBase):
             deepseek_model_name: Model name for DeepSeek
             groq_model_name: Model name for Groq
             openai_model_name: Model name for OpenAI
+            stream_generation: Stream responses and abort as soon as the code is provably invalid
+            stream_later_block_chars: Characters after an invalid code block within which a later
+                                      block may still open before a streamed response is aborted
+            prefix_cache_layout: Put the static prompt text first and the per-agent values last
+                                 so providers can cache the shared prefix
+            structured_output: Request code as an NLogoCode tool call / JSON schema instead of
+                               free text, falling back to text when the model does not support it
+            structured_pseudocode: With text evolution, replace the evolved pseudocode with the
+                                   pseudocode the structured answer describes its code with
+            batch_size: Children generated per request by batch mutation (1 sends one request per child)
+            edit_format: Ask for line edits against the numbered original code instead of the
+                         full rule, falling back to full regeneration when the edits do not apply
+            edit_min_lines: Shortest original code (in lines) for which edits are requested
+            conversational_retry: Retry by replaying the first prompt and the failed attempts, with
+                                  each verifier error as a short follow-up turn, instead of a fresh
+                                  retry prompt
+            retry_max_errors: Verifier errors kept per follow-up turn in conversational retries
+            retry_error_chars: Characters of error text kept per follow-up turn
         """
         super().__init__(verifier)
         self.model_name = model_name
@@ -63,69 +122,469 @@ class GraphUnifiedProvider(GraphProviderBase):
         self.deepseek_model_name = deepseek_model_name
         self.groq_model_name = groq_model_name
         self.openai_model_name = openai_model_name
+        self.stream_generation = stream_generation
+        self.stream_later_block_chars = stream_later_block_chars
+        self.prefix_cache_layout = prefix_cache_layout
+        self.structured_output = structured_output
+        self.structured_pseudocode = structured_pseudocode
+        self.batch_size = max(1, batch_size)
+        self.edit_format = edit_format
+        self.edit_min_lines = edit_min_lines
+        self.conversational_retry = conversational_retry
+        self.retry_max_errors = retry_max_errors
+        self.retry_error_chars = retry_error_chars
+        # Providers whose chat model raised NotImplementedError for with_structured_output
+        self.structured_unsupported = set()
         # Store prompt config explicitly
         self.prompt_type = prompt_type
         self.prompt_name = prompt_name
+        # Shared per-provider request/token budget with backoff on 429/5xx
+        self.rate_limiter = get_rate_limiter(model_name)
 
         # Set API key based on model name
-        if self.model_name == SupportedModels.CLAUDE.value:
-            self.api_key = os.getenv('ANTHROPIC_API_KEY')
-            if not self.api_key:
-                raise ValueError("ANTHROPIC_API_KEY environment variable is required")
-        elif self.model_name == SupportedModels.DEEPSEEK.value:
-            self.api_key = os.getenv('DEEPSEEK_API_KEY')
-            if not self.api_key:
-                raise ValueError("DEEPSEEK_API_KEY environment variable is required")
-        elif self.model_name == SupportedModels.GROQ.value:
-            self.api_key = os.getenv('GROQ_API_KEY')
-            if not self.api_key:
-                raise ValueError("GROQ_API_KEY environment variable is required")
-        elif self.model_name == SupportedModels.OPENAI.value:
-            self.api_key = os.getenv('OPENAI_API_KEY')
-            if not self.api_key:
-                raise ValueError("OPENAI_API_KEY environment variable is required")
-        else:
-            raise ValueError(f"Unsupported model name: {self.model_name}")
-            
-    def initialize_model(self):
-        """Initialize and return provider-specific model based on model name."""
+        self.api_key = self.get_api_key(self.model_name)
+
+        # Optional duplicate request to a second provider when the primary is slow
+        self.hedging = HedgingPolicy()
+        self.models = {}
+        # Optional cheap-to-strong model tiers, one per attempt
+        self.cascade = get_model_cascade()
+
+    @staticmethod
+    def get_api_key(model_name: str) -> Optional[str]:
+        """
+        Look up the API key for a provider.
+
+        Raises:
+            ValueError: If the provider is unsupported or its key is not set
+        """
+        if model_name == SupportedModels.LOCAL_SIM.value:
+            # Synthetic local model, no API key needed
+            return None
+        if model_name not in API_KEY_ENV_VARS:
+            raise ValueError(f"Unsupported model name: {model_name}")
+        api_key = os.getenv(API_KEY_ENV_VARS[model_name])
+        if not api_key:
+            raise ValueError(f"{API_KEY_ENV_VARS[model_name]} environment variable is required")
+        return api_key
+
+    def initialize_model(self, model_name: Optional[str] = None, model_id: Optional[str] = None):
+        """
+        Initialize and return provider-specific model based on model name.
+        Provider SDKs are imported here, so only the selected provider's SDK is loaded.
+
+        Args:
+            model_name: Provider to build a model for (defaults to this provider's model_name)
+            model_id: Provider model to use instead of the configured one (e.g. a cascade tier)
+        """
+        model_name = model_name or self.model_name
+        api_key = self.api_key if model_name == self.model_name else self.get_api_key(model_name)
         try:
-            if self.model_name == SupportedModels.CLAUDE.value:
+            if model_name == SupportedModels.CLAUDE.value:
+                from langchain_anthropic import ChatAnthropic
                 model = ChatAnthropic(
-                    model=self.claude_model_name,
-                    anthropic_api_key=self.api_key,
+                    model=model_id or self.claude_model_name,
+                    anthropic_api_key=api_key,
                     temperature=self.temperature,
                     max_tokens=self.max_tokens
                 )
-            elif self.model_name == SupportedModels.DEEPSEEK.value:
+            elif model_name == SupportedModels.DEEPSEEK.value:
+                from langchain_deepseek import ChatDeepSeek
                 model = ChatDeepSeek(
-                    model_name=self.deepseek_model_name,
-                    api_key=self.api_key,
+                    model_name=model_id or self.deepseek_model_name,
+                    api_key=api_key,
                     temperature=self.temperature,
                     max_tokens=self.max_tokens
                 )
-            elif self.model_name == SupportedModels.GROQ.value:
+            elif model_name == SupportedModels.GROQ.value:
+                from langchain_groq import ChatGroq
                 model = ChatGroq(
-                    model_name=self.groq_model_name,
-                    groq_api_key=self.api_key,
+                    model_name=model_id or self.groq_model_name,
+                    groq_api_key=api_key,
                     temperature=self.temperature,
                     max_tokens=self.max_tokens
                 )
-            elif self.model_name == SupportedModels.OPENAI.value:
+            elif model_name == SupportedModels.OPENAI.value:
+                from langchain_openai import ChatOpenAI
                 model = ChatOpenAI(
-                    model=self.openai_model_name,
-                    openai_api_key=self.api_key,
+                    model=model_id or self.openai_model_name,
+                    openai_api_key=api_key,
                     temperature=self.temperature,
                     max_tokens=self.max_tokens
                 )
+            elif model_name == SupportedModels.LOCAL_SIM.value:
+                # Latency, error and validity profile is configured on LocalSimChatModel via gin
+                model = LocalSimChatModel()
             else:
-                raise ValueError(f"Unsupported model name: {self.model_name}")
+                raise ValueError(f"Unsupported model name: {model_name}")
             return model
 
         except Exception as e:
-            self.logger.error(f"Failed to initialize model for {self.model_name}: {str(e)}")
+            self.logger.error(f"Failed to initialize model for {model_name}: {str(e)}")
             raise
 
+    def get_model(self, model_name: str, model_id: Optional[str] = None):
+        """Return the (cached) chat model for a provider, initializing it on first use."""
+        if model_name == self.model_name and model_id is None:
+            if not self.model:
+                self.model = self.initialize_model()
+            return self.model
+        key = f"{model_name}:{model_id}" if model_id else model_name
+        if key not in self.models:
+            self.models[key] = self.initialize_model(model_name, model_id)
+        return self.models[key]
+
+    def routed_model(self, attempt: int = 0) -> Tuple[str, Any]:
+        """
+        Provider for the next request and its chat model. With the model cascade enabled,
+        attempt N goes to tier N; otherwise to this provider. While the chosen provider's
+        circuit is open, its configured fallback is used instead.
+
+        Args:
+            attempt: 0 for the first attempt of a mutation, N for its Nth retry
+
+        Raises:
+            CircuitOpenError: If neither the provider nor its fallback accepts requests
+        """
+        provider_name, model_id = self.cascade.tier(attempt) if self.cascade.enabled else (self.model_name, None)
+        model_name = route(provider_name)
+        if model_name != provider_name:
+            self.logger.warning(f"Circuit for {provider_name} is open, failing over to {model_name}")
+            model_id = None
+        return model_name, self.get_model(model_name, model_id)
+
+    def call_with_breaker(self, model_name: str, fn, estimated_tokens: int):
+        """
+        Run `fn` through the provider's rate limiter and report the outcome to its circuit
+        breaker; outage errors (after the rate limiter's retries) count as failures.
+
+        Raises:
+            CircuitOpenError: If the circuit no longer admits a request (e.g. another
+                              request took the half-open trial slot since routing)
+        """
+        rate_limiter = self.rate_limiter if model_name == self.model_name else get_rate_limiter(model_name)
+        breaker = get_circuit_breaker(model_name)
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"Circuit for {model_name} is open")
+        try:
+            result = rate_limiter.call(fn, estimated_tokens=estimated_tokens)
+        except Exception as e:
+            if is_outage_error(e):
+                breaker.record_failure()
+            raise
+        breaker.record_success()
+        return result
+
+    def invoke_chain(self, chain, invoke_input: dict, estimated_tokens: int = 0,
+                     model_name: Optional[str] = None):
+        """
+        Invoke a chain within the provider's rate budget, retrying rate-limit and 5xx errors.
+        The latency of each successful call is recorded in the provider's histogram, and the
+        outcome in its circuit breaker.
+
+        Args:
+            chain: Runnable built on the provider's model
+            invoke_input: Input dictionary for the chain
+            estimated_tokens: Expected prompt tokens; max_tokens is added for the completion
+            model_name: Provider the chain runs on (defaults to this provider's model_name)
+
+        Returns:
+            The chain's output
+        """
+        model_name = model_name or self.model_name
+        histogram = get_latency_histogram(model_name)
+        config = {"callbacks": [get_usage_tracker(model_name)]}
+        attempts = []
+
+        def timed_invoke():
+            with get_tracer().span("llm.invoke", SPAN_KIND_CLIENT, **{
+                    "gen_ai.system": model_name, "lear.attempt": len(attempts),
+                    "gen_ai.usage.estimated_input_tokens": estimated_tokens}) as span:
+                attempts.append(None)
+                start = time.monotonic()
+                result = chain.invoke(invoke_input, config=config)
+                histogram.record(time.monotonic() - start)
+                span.set_attribute("lear.response_chars", len(result) if isinstance(result, str) else None)
+                return result
+
+        return self.call_with_breaker(model_name, timed_invoke, estimated_tokens + self.max_tokens)
+
+    def invoke_hedged(self, prompt: ChatPromptTemplate, invoke_input: dict,
+                      estimated_tokens: int, original_code: str) -> str:
+        """
+        Send the prompt to the primary provider and, if it is slower than the hedging
+        threshold, also to the secondary provider. The first valid answer wins. A primary
+        that fails or gives no verified answer before the threshold is hedged at once.
+
+        Args:
+            prompt: Prompt to send to both providers
+            invoke_input: Input dictionary for the prompt
+            estimated_tokens: Expected prompt tokens
+            original_code: Code to fall back to when no answer is usable
+
+        Returns:
+            Extracted code from the winning answer
+        """
+        secondary = self.hedging.secondary_model_name
+        delay = self.hedging.hedge_delay(get_latency_histogram(self.model_name))
+
+        def call(model_name):
+            chain = prompt | self.get_model(model_name) | StrOutputParser()
+            return self.invoke_chain(chain, invoke_input, estimated_tokens, model_name)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        calls = {executor.submit(contextvars.copy_context().run, call, self.model_name): self.model_name}
+
+        def hedge() -> Future:
+            future = executor.submit(contextvars.copy_context().run, call, secondary)
+            calls[future] = secondary
+            return future
+
+        done, _ = wait(calls, timeout=delay)
+        if not done:
+            self.logger.info(f"{self.model_name} has not answered after {delay:.2f}s, hedging to {secondary}")
+            hedge()
+
+        fallback_code = None
+        pending = set(calls)
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        code = self.extract_code(future.result(), original_code)
+                    except Exception as e:
+                        self.logger.warning(f"Hedged request to {calls[future]} failed: {str(e)}")
+                        continue
+                    if self.verifier.is_safe(code)[0] and code != original_code:
+                        self.logger.info(f"Using answer from {calls[future]}")
+                        record_hedge(len(calls) > 1, calls[future] != self.model_name)
+                        return code
+                    fallback_code = fallback_code or code
+                if len(calls) == 1:
+                    # The primary finished before the hedging threshold without a usable answer
+                    self.logger.info(f"{self.model_name} gave no verified answer, hedging to {secondary}")
+                    pending.add(hedge())
+        finally:
+            # The losing request cannot be interrupted mid-flight; its result is discarded
+            for future in calls:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        record_hedge(len(calls) > 1, False)
+        if fallback_code is None:
+            raise RuntimeError("All hedged requests failed")
+        return fallback_code
+
+    def stream_chain(self, chain, invoke_input: dict, estimated_tokens: int = 0,
+                     model_name: Optional[str] = None) -> IncrementalCodeChecker:
+        """
+        Stream a chain's output through an IncrementalCodeChecker, cancelling the request
+        once its code blocks are invalid and no later block has started.
+
+        Args:
+            chain: Runnable built on this provider's model, ending in a string parser
+            invoke_input: Input dictionary for the chain
+            estimated_tokens: Expected prompt tokens; max_tokens is added for the completion
+            model_name: Provider the chain runs on (defaults to this provider's model_name)
+
+        Returns:
+            The checker holding the (possibly partial) response, code and abort error
+        """
+        model_name = model_name or self.model_name
+        # select_code may still use a later block, so an invalid one alone does not abort
+        checker = IncrementalCodeChecker(self.verifier, later_block_chars=self.stream_later_block_chars)
+        histogram = get_latency_histogram(model_name)
+        config = {"callbacks": [get_usage_tracker(model_name)]}
+
+        def consume():
+            with get_tracer().span("llm.stream", SPAN_KIND_CLIENT, **{
+                    "gen_ai.system": model_name,
+                    "gen_ai.usage.estimated_input_tokens": estimated_tokens}) as span:
+                checker.reset()
+                start = time.monotonic()
+                for chunk in chain.stream(invoke_input, config=config):
+                    if checker.feed(chunk):
+                        break  # Closing the stream cancels the underlying HTTP request
+                if not checker.aborted:
+                    histogram.record(time.monotonic() - start)
+                span.set_attributes({"lear.response_chars": len(checker.response), "lear.aborted": checker.aborted})
+                return checker
+
+        return self.call_with_breaker(model_name, consume, estimated_tokens + self.max_tokens)
+
+    def select_prompt(self, state: dict) -> Tuple[str, CompiledPrompt, dict, dict]:
+        """
+        Select the code-generation prompt template for the current generation state.
+
+        Args:
+            state: The current generation state dictionary
+
+        Returns:
+            Tuple of (system_message, prompt_template, template_values, invoke_input)
+        """
+        # Extract relevant info from state
+        original_code = state.get("original_code", "")
+        error_message = state.get("error_message", None)
+        modified_pseudocode = state.get("modified_pseudocode", None)
+        initial_pseudocode = state.get("initial_pseudocode", "") # Fallback if no modified
+
+        # --- Determine Prompt and Input ---
+
+        system_message = prompts.get("langchain", {}).get("cot_system", "You are a NetLogo programming assistant.")
+        invoke_input = {} # Initialize empty invoke input
+
+        if error_message and modified_pseudocode:
+            self.logger.info(f"Using retry prompt '{self.retry_prompt}' with pseudocode due to error: {error_message[:100]}...")
+            
+            prompt_template = (prompts.compiled("retry_prompts", self.retry_prompt)
+                               or prompts.compiled("retry_prompts", "generate_code_with_pseudocode_and_error"))
+            
+            # Values for all required fields
+            template_values = {
+                "original_code": original_code, # Match prompt variable name
+                "error_message": error_message, # Match prompt variable name
+                "pseudocode": modified_pseudocode
+            }
+            # Update invoke_input for the chain
+            invoke_input["original_code"] = original_code
+            invoke_input["error"] = error_message
+            invoke_input["pseudocode"] = modified_pseudocode
+
+        elif error_message:
+            # Case 2: Only Error is present - Use error-only retry prompt
+            self.logger.info(f"Using retry prompt '{self.retry_prompt}' without pseudocode due to error: {error_message[:100]}...")
+            
+            prompt_template = (prompts.compiled("retry_prompts", self.retry_prompt)
+                               or prompts.compiled("retry_prompts", "generate_code_with_error"))
+            
+            template_values = {"original_code": original_code, "error_message": error_message}
+            
+            # Update invoke_input
+            #invoke_input["original_code"] = original_code
+            invoke_input["error_message"] = error_message
+
+        elif modified_pseudocode:
+            # Use code generation prompt with modified pseudocode
+            self.logger.info(f"Using {self.evolution_strategy} for Code Generation with modified pseudocode.")
+            prompt_template = (prompts.compiled("evolution_strategies", self.evolution_strategy, "code_prompt")
+                               or DEFAULT_PSEUDOCODE_PROMPT)
+            template_values = {"pseudocode": modified_pseudocode, "original_code": original_code}
+            
+            # Add necessary inputs for the prompt template
+            invoke_input["initial_pseudocode"] = modified_pseudocode
+
+        else:
+            self.logger.info(f"Using code generation/evolution prompt '{self.prompt_type}/{self.prompt_name}' with original code only.")
+            prompt_template = prompts.compiled(self.prompt_type, self.prompt_name) or DEFAULT_CODE_ONLY_PROMPT
+            template_values = {"original_code": original_code}
+            
+            invoke_input = {"original_code": original_code}
+
+        return system_message, prompt_template, template_values, invoke_input
+
+    def build_prompt(self, state: dict, edit_mode: bool = False,
+                     model_name: Optional[str] = None) -> Tuple[ChatPromptTemplate, dict, int]:
+        """
+        Select and format the code-generation prompt for the current generation state.
+
+        Args:
+            state: The current generation state dictionary
+            edit_mode: Number the lines of the original code and ask for edits (see edit_format.py)
+            model_name: Provider the prompt is sent to (defaults to this provider's model_name)
+
+        Returns:
+            Tuple of (prompt, invoke_input, estimated_tokens) where estimated_tokens is a
+            rough count of prompt tokens used for rate limiting
+
+        Raises:
+            EditFormatError: In edit mode, if the selected prompt does not show the original code
+        """
+        if self.conversational_retry and not edit_mode and state.get("error_message") and state.get("failed_attempts"):
+            return self.build_retry_conversation(state, model_name)
+        system_message, prompt_template, template_values, invoke_input = self.select_prompt(state)
+        if edit_mode:
+            if "original_code" not in prompt_template.fields:
+                raise EditFormatError("Prompt does not include the original code")
+            template_values = dict(template_values, original_code=number_lines(template_values["original_code"]))
+            prompt_template = CompiledPrompt(f"{prompt_template.template}\n\n{EDIT_INSTRUCTIONS}")
+
+        # --- Construct Prompt ---
+        if self.prefix_cache_layout:
+            # Static instructions form a stable prefix; per-agent values come last.
+            # Messages are passed as objects so their braces are not re-parsed as variables.
+            messages = build_prefix_cached_messages(system_message, prompt_template.template, template_values,
+                                                    model_name or self.model_name)
+            prompt = ChatPromptTemplate.from_messages(messages)
+            user_content = messages[-1].content
+            prompt_length = sum(len(str(message.content)) for message in messages)
+        else:
+            user_content = prompt_template.format(**template_values)
+            prompt = ChatPromptTemplate.from_messages([
+                ("system", system_message),
+                ("user", user_content)
+            ])
+            prompt_length = len(system_message) + len(user_content)
+        self.logger.info(f"Final prompt created. User content: {user_content}")
+        if self.conversational_retry and not edit_mode:
+            # Kept in the state by generate_code and replayed by conversational retries
+            record_prompt(prompt.format_messages(**invoke_input))
+
+        estimated_tokens = prompt_length // 4
+        current = current_span()
+        if current is not None:
+            current.set_attribute("lear.prompt_chars", prompt_length)
+        return prompt, invoke_input, estimated_tokens
+
+    def build_retry_conversation(self, state: dict,
+                                 model_name: Optional[str] = None) -> Tuple[ChatPromptTemplate, dict, int]:
+        """
+        Build a retry as a continuation of the mutation's first prompt (see retry_conversation.py).
+
+        Returns:
+            Tuple of (prompt, invoke_input, estimated_tokens) like build_prompt
+        """
+        first_messages = state.get("first_messages")
+        if not first_messages:
+            # No prompt was recorded (e.g. the first attempt was a line edit or a cached
+            # translation): rebuild the first prompt from the state
+            first_prompt, invoke_input, _ = self.build_prompt({**state, "error_message": None}, model_name=model_name)
+            first_messages = first_prompt.format_messages(**invoke_input)
+        messages = build_retry_messages(first_messages, state["failed_attempts"],
+                                        self.retry_max_errors, self.retry_error_chars)
+        self.logger.info(f"Retrying as turn {len(state['failed_attempts']) + 1} of the mutation's conversation")
+        prompt_length = sum(len(str(message.content)) for message in messages)
+        current = current_span()
+        if current is not None:
+            current.set_attribute("lear.prompt_chars", prompt_length)
+        # Messages are passed as objects so their braces are not re-parsed as variables
+        return ChatPromptTemplate.from_messages(messages), {}, prompt_length // 4
+
+    def extract_code(self, response: str, original_code: str) -> str:
+        """
+        Extract the NetLogo code from an LLM response.
+
+        All fenced blocks and unfenced code regions are ranked and verified; the first
+        candidate that passes is used. If none passes, the best fenced block is returned
+        so verify_code can report its error.
+
+        Args:
+            response: Raw response text
+            original_code: Code to fall back to when no usable code is found
+
+        Returns:
+            The extracted code, or original_code if extraction failed
+        """
+        result = select_code(response, self.verifier)
+        if result.is_safe:
+            self.logger.info(f"Code extracted successfully ({len(result.candidates)} candidates). Code: {result.code}")
+            return result.code
+        if result.candidates and result.candidates[0].source in FENCED_SOURCES:
+            self.logger.info(f"No candidate passed verification, using best code block. Code: {result.code}")
+            return result.code
+        self.logger.warning(f"Could not extract NetLogo code block from response: {response[:500]}... Falling back.")
+        return original_code # Fallback
+
     def generate_code_from_state(self, state: dict) -> str:
         """
         Generate new NetLogo code based on the full generation state provided by the graph.
@@ -141,103 +600,251 @@ class GraphUnifiedProvider(GraphProviderBase):
         """
         self.logger.info(f"Generating code from state using {self.model_name} provider")
         try:
-            # Ensure model is initialized
-            if not self.model:
-                self.model = self.initialize_model()
+            # Ensure model is initialized (the cascade tier for this attempt, or the fallback
+            # provider while the chosen provider's circuit is open)
+            model_name, model = self.routed_model(state.get("retry_count", 0))
 
-            # Extract relevant info from state
-            original_code = state.get("original_code", "")
-            error_message = state.get("error_message", None)
-            modified_pseudocode = state.get("modified_pseudocode", None)
-            initial_pseudocode = state.get("initial_pseudocode", "") # Fallback if no modified
-
-            # --- Determine Prompt and Input ---
-            user_content = ""
-
-            system_message = prompts.get("langchain", {}).get("cot_system", "You are a NetLogo programming assistant.")
-            invoke_input = {} # Initialize empty invoke input
-
-            if error_message and modified_pseudocode:
-                self.logger.info(f"Using retry prompt '{self.retry_prompt}' with pseudocode due to error: {error_message[:100]}...")
-                
-                prompt_template = prompts.get("retry_prompts", {}).get(self.retry_prompt, "")
-                if not prompt_template:
-                    prompt_template = prompts.get("retry_prompts", {}).get("generate_code_with_pseudocode_and_error")
-                
-                # Format the prompt with all required fields
-                user_content = prompt_template.format(
-                    original_code=original_code, # Match prompt variable name
-                    error_message=error_message, # Match prompt variable name
-                    pseudocode=modified_pseudocode
-                )
-                # Update invoke_input for the chain
-                invoke_input["original_code"] = original_code
-                invoke_input["error"] = error_message
-                invoke_input["pseudocode"] = modified_pseudocode
-
-            elif error_message:
-                # Case 2: Only Error is present - Use error-only retry prompt
-                self.logger.info(f"Using retry prompt '{self.retry_prompt}' without pseudocode due to error: {error_message[:100]}...")
-                
-                prompt_template = prompts.get("retry_prompts", {}).get(self.retry_prompt, "")
-                if not prompt_template:
-                    prompt_template = prompts.get("retry_prompts", {}).get("generate_code_with_error")
-                
-                user_content = prompt_template.format(original_code=original_code, error_message=error_message)
-                
-                # Update invoke_input
-                #invoke_input["original_code"] = original_code
-                invoke_input["error_message"] = error_message
-
-            elif modified_pseudocode:
-                # Use code generation prompt with modified pseudocode
-                self.logger.info(f"Using {self.evolution_strategy} for Code Generation with modified pseudocode.")
-                prompt_template = prompts.get("evolution_strategies", {}).get(self.evolution_strategy, "Generate NetLogo code based on this pseudocode:\n{pseudocode}\n\nOriginal code for context:\n```netlogo\n{original_code}\n```").get("code_prompt") # Default template
-                user_content = prompt_template.format(pseudocode=modified_pseudocode)
-                
-                # Add necessary inputs for the prompt template
-                invoke_input["initial_pseudocode"] = modified_pseudocode
-
-            else:
-                self.logger.info(f"Using code generation/evolution prompt '{self.prompt_type}/{self.prompt_name}' with original code only.")
-                default_code_only_template = "Evolve or generate code based on the following NetLogo code:\n```netlogo\n{original_code}\n```"
-                prompt_template = prompts.get(self.prompt_type, {}).get(self.prompt_name, default_code_only_template) 
-                user_content = prompt_template.format(original_code=original_code)
-                
-                invoke_input = {"original_code": original_code}
-
-            # --- Construct Prompt & Chain ---
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", system_message),
-                ("user", user_content)
-            ])
-            self.logger.info(f"Final prompt created. User content: {user_content}")
-
-            chain = prompt | self.model | StrOutputParser()
+            prompt, invoke_input, estimated_tokens = self.build_prompt(state, model_name=model_name)
+            chain = prompt | model | StrOutputParser()
 
             # --- Invoke LLM ---
             self.logger.info(f"Invoking LLM chain with input keys: {list(invoke_input.keys())}")
-            response = chain.invoke(invoke_input) # Pass the dictionary matching prompt variables
+            if self.stream_generation:
+                checker = self.stream_chain(chain, invoke_input, estimated_tokens, model_name)
+                if checker.aborted:
+                    # Hand the partial code to verify_code so the retry prompt gets its error
+                    self.logger.warning(f"Aborted streamed generation early: {checker.error}")
+                    return checker.code
+                response = checker.response
+            elif model is self.model and self.hedging.enabled and self.hedging.secondary_model_name != self.model_name:
+                return self.invoke_hedged(prompt, invoke_input, estimated_tokens, state.get("original_code", ""))
+            else:
+                response = self.invoke_chain(chain, invoke_input, estimated_tokens, model_name) # Pass the dictionary matching prompt variables
             self.logger.info("LLM chain invocation complete.")
 
             # --- Extract Code ---
-            match = re.search(r"```(?:netlogo)?\s*(.*?)\s*```", response, re.DOTALL | re.IGNORECASE)
-            if match:
-                code = match.group(1).strip()
-                if code:
-                    self.logger.info(f"Code extracted successfully. Code: {code}")
-                    return code
-                else:
-                    self.logger.warning("Extracted code block was empty. Falling back.")
-                    return original_code
-            else:
-                 self.logger.warning(f"Could not extract NetLogo code block from response: {response[:500]}... Falling back.")
-                 return original_code # Fallback
+            with get_tracer().span("extract_code", **{"lear.response_chars": len(response)}):
+                return self.extract_code(response, state.get("original_code", ""))
 
+        except CircuitOpenError as e:
+            self.logger.warning(f"Skipping generation: {str(e)}")
+            return state.get("original_code", "") # Fallback
         except Exception as e:
             self.logger.error(f"Error during code generation from state: {str(e)}", exc_info=True)
             return state.get("original_code", "") # Fallback
 
+    def generate_edit_from_state(self, state: dict) -> Optional[str]:
+        """
+        Generate code as line edits against the numbered original code and apply them locally.
+
+        Args:
+            state: The current generation state dictionary
+
+        Returns:
+            The patched code (verified later by verify_code like any other code), or None if
+            edit mode is disabled, the original code is too short, or the edits do not
+            parse or apply; the caller then regenerates the full rule
+        """
+        original_code = state.get("original_code", "")
+        if not self.edit_format or len(original_code.splitlines()) < self.edit_min_lines:
+            return None
+        try:
+            model_name, model = self.routed_model(state.get("retry_count", 0))
+            prompt, invoke_input, estimated_tokens = self.build_prompt(state, edit_mode=True, model_name=model_name)
+            chain = prompt | model | StrOutputParser()
+            self.logger.info(f"Requesting line edits for a {len(original_code.splitlines())}-line rule")
+            response = self.invoke_chain(chain, invoke_input, estimated_tokens, model_name)
+            with get_tracer().span("apply_edits", **{"lear.response_chars": len(response)}) as span:
+                edits = parse_edits(response)
+                span.set_attribute("lear.edits", len(edits))
+                code = apply_edits(original_code, edits)
+            self.logger.info(f"Applied {len(edits)} edits. Code: {code}")
+            return code
+        except EditFormatError as e:
+            self.logger.warning(f"Edits did not apply, regenerating the full rule: {str(e)}")
+            return None
+        except Exception as e:
+            self.logger.warning(f"Edit generation failed, regenerating the full rule: {str(e)}")
+            return None
+
+    def generate_structured_from_state(self, state: dict) -> Optional[NLogoCode]:
+        """
+        Generate code through the model's structured output (tool calling or JSON schema)
+        using the NLogoCode schema, so no code has to be extracted from prose.
+
+        Args:
+            state: The current generation state dictionary
+
+        Returns:
+            NLogoCode with the new code (and pseudocode if the model gave one), or None if
+            structured output is disabled, unsupported by the model, or its answer did not
+            fit the schema; the caller then falls back to generate_code_from_state
+
+        Raises:
+            CircuitOpenError: If the provider's circuit is open
+            Exception: Provider outages (see is_outage_error), which a free-text request to
+                       the same provider would only repeat
+        """
+        if not self.structured_output:
+            return None
+        try:
+            model_name, model = self.routed_model(state.get("retry_count", 0))
+            if model_name in self.structured_unsupported:
+                return None
+            try:
+                structured_model = model.with_structured_output(NLogoCode)
+            except NotImplementedError:
+                self.logger.info(f"{model_name} does not support structured output, using free-text generation")
+                self.structured_unsupported.add(model_name)
+                return None
+
+            prompt, invoke_input, estimated_tokens = self.build_prompt(state, model_name=model_name)
+            self.logger.info(f"Invoking {model_name} with structured output")
+            result = self.invoke_chain(prompt | structured_model, invoke_input, estimated_tokens, model_name)
+            if not isinstance(result, NLogoCode) or not result.new_code.strip():
+                self.logger.warning(f"Structured output returned no code: {result!r}")
+                return None
+
+            # Some models still wrap the field in a markdown fence
+            code = extract_code_candidates(result.new_code)[0].code
+            self.logger.info(f"Structured output returned code: {code}")
+            return result.model_copy(update={"new_code": code})
+
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if is_outage_error(e):
+                raise
+            self.logger.warning(f"Structured output failed, falling back to free-text generation: {str(e)}")
+            return None
+
+    def generate_candidates_from_state(self, state: dict, num_candidates: int) -> Iterator[str]:
+        """
+        Generate several candidate codes for the same state, yielded in arrival order.
+
+        Providers that accept an `n` parameter return all candidates from a single request;
+        for the others `num_candidates` requests are sent in parallel. Stopping iteration
+        early cancels requests that have not started yet.
+
+        Args:
+            state: The current generation state dictionary
+            num_candidates: Number of candidates to request
+
+        Yields:
+            Candidate NetLogo code strings (falling back to the original code on failure)
+        """
+        if (self.model_name in N_COMPLETIONS_MODELS and not self.cascade.enabled
+                and get_circuit_breaker(self.model_name).state == CLOSED):
+            yield from self._generate_n_from_state(state, num_candidates)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=num_candidates)
+        futures = [executor.submit(contextvars.copy_context().run, self.generate_code_from_state, state)
+                   for _ in range(num_candidates)]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Requests that have not started are dropped (cancel_futures needs Python 3.9)
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def generate_batch_from_states(self, states: List[dict], max_attempts: Optional[int] = None) -> List[str]:
+        """
+        Generate code for several children with batched requests, verifying each child on
+        its own and re-sending only the children that failed, with their errors.
+
+        Children whose states select the same prompt template share one request.
+
+        Args:
+            states: Generation state per child
+            max_attempts: Retry rounds for failed children after the first request (defaults to the provider's
+                          retry_max_attempts, then RetryPolicy.max_attempts)
+
+        Returns:
+            Verified code per child, or the child's original code where every attempt failed
+        """
+        if max_attempts is None:
+            max_attempts = self.retry_max_attempts if self.retry_max_attempts is not None else get_retry_policy().max_attempts
+        states = [dict(state, error_message=None) for state in states]
+        codes: List[Optional[str]] = [None] * len(states)
+        pending = list(range(len(states)))
+
+        for attempt in range(max_attempts + 1):
+            if attempt:
+                self.logger.info(f"Retrying {len(pending)} of {len(states)} batched children")
+                record_event("retries", len(pending))
+            groups = {}
+            for index in pending:
+                system_message, template, values, _ = self.select_prompt(states[index])
+                groups.setdefault((system_message, template.template, frozenset(values)), []).append((index, values))
+
+            failed = []
+            for (system_message, template, _), members in groups.items():
+                failed.extend(self._generate_batch_group(system_message, template, members, states, codes, attempt))
+            pending = failed
+            if not pending:
+                break
+
+        for index in pending:
+            record_event("failures")
+        return [code if code is not None else state.get("original_code", "")
+                for code, state in zip(codes, states)]
+
+    def _generate_batch_group(self, system_message: str, template: str, members: List[Tuple[int, dict]],
+                              states: List[dict], codes: List[Optional[str]], attempt: int = 0) -> List[int]:
+        """Send one batched request; store verified codes and return the indices that failed."""
+        try:
+            model_name, model = self.routed_model(attempt)
+            messages = build_batch_messages(system_message, template, [values for _, values in members], model_name)
+            estimated_tokens = sum(len(str(message.content)) for message in messages) // 4
+            # Room for one answer per child
+            chain = ChatPromptTemplate.from_messages(messages) | model.bind(max_tokens=self.max_tokens * len(members)) | StrOutputParser()
+            with get_tracer().span("llm.batch", **{"lear.batch_size": len(members)}):
+                response = self.invoke_chain(chain, {}, estimated_tokens + self.max_tokens * (len(members) - 1), model_name)
+        except Exception as e:
+            self.logger.error(f"Batched request for {len(members)} children failed: {str(e)}")
+            for index, _ in members:
+                states[index]["error_message"] = f"Request failed: {str(e)[:200]}"
+            return [index for index, _ in members]
+
+        failed = []
+        for (index, _), part in zip(members, parse_batch_response(response, len(members))):
+            result = select_code(part, self.verifier) if part else None
+            if result is not None and result.is_safe:
+                codes[index] = result.code
+                continue
+            # The error goes into the child's next prompt, which then selects a retry template
+            states[index]["error_message"] = result.message if result is not None else "No answer was given for this child"
+            states[index]["current_code"] = result.code if result is not None and result.code else states[index]["current_code"]
+            failed.append(index)
+        return failed
+
+    def _generate_n_from_state(self, state: dict, num_candidates: int) -> List[str]:
+        """Request `num_candidates` completions in one call using the provider's `n` parameter."""
+        original_code = state.get("original_code", "")
+        try:
+            self.get_model(self.model_name)
+
+            prompt, invoke_input, estimated_tokens = self.build_prompt(state)
+            messages = prompt.format_messages(**invoke_input)
+            self.logger.info(f"Requesting {num_candidates} completions in one {self.model_name} call")
+            def generate_n():
+                with get_tracer().span("llm.generate", SPAN_KIND_CLIENT, **{
+                        "gen_ai.system": self.model_name, "lear.num_candidates": num_candidates,
+                        "gen_ai.usage.estimated_input_tokens": estimated_tokens}):
+                    return self.model.generate([messages], n=num_candidates,
+                                               callbacks=[get_usage_tracker(self.model_name)])
+
+            result = self.call_with_breaker(self.model_name, generate_n,
+                                            estimated_tokens + self.max_tokens * num_candidates)
+            return [self.extract_code(generation.text, original_code) for generation in result.generations[0]]
+
+        except Exception as e:
+            self.logger.error(f"Error during multi-candidate generation: {str(e)}", exc_info=True)
+            return [original_code]
+
 
 @gin.configurable
 def create_graph_provider(model_name: str = "groq", verifier: NetLogoVerifier = None,
@@ -247,7 +854,7 @@ def create_graph_provider(model_name: str = "groq", verifier: NetLogoVerifier =
     Factory method to create a graph provider based on model name.
 
     Args:
-        model_name: Type of model to use ("groq", "claude", "openai", or "deepseek")
+        model_name: Type of model to use ("groq", "claude", "openai", "deepseek", or "local-sim")
         verifier: NetLogoVerifier instance for code validation
         prompt_type: Type of prompt to use for code generation (configured by Gin)
         prompt_name: Name of prompt to use for code generation (configured by Gin)
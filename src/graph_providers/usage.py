@@ -0,0 +1,112 @@
+"""
+Token usage tracking for LLM calls.
+
+UsageTracker is a LangChain callback handler that reads the usage_metadata attached to
+chat model responses, including prompt-cache reads reported by Anthropic and OpenAI,
+so cached and uncached input tokens can be reported per call and in aggregate.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from src.utils.cost_ledger import record_usage
+from src.utils.logging import get_logger
+
+
+def extract_usage(message: Any) -> Optional[Dict[str, int]]:
+    """
+    Normalise a message's usage_metadata.
+
+    Returns:
+        Dict with input, cached_input, uncached_input, cache_creation and output token
+        counts, or None when the provider did not report usage
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    details = usage.get("input_token_details") or {}
+    input_tokens = usage.get("input_tokens", 0)
+    cached = details.get("cache_read", 0) or 0
+    return {
+        "input_tokens": input_tokens,
+        "cached_input_tokens": cached,
+        "uncached_input_tokens": max(0, input_tokens - cached),
+        "cache_creation_tokens": details.get("cache_creation", 0) or 0,
+        "output_tokens": usage.get("output_tokens", 0),
+    }
+
+
+def response_model(message: Any) -> Optional[str]:
+    """Model that served a response, as reported in its response_metadata (if at all)."""
+    metadata = getattr(message, "response_metadata", None) or {}
+    return metadata.get("model_name") or metadata.get("model")
+
+
+class UsageTracker(BaseCallbackHandler):
+    """Accumulates token usage across the LLM calls it is attached to."""
+
+    def __init__(self, model_name: str = ""):
+        super().__init__()
+        self.model_name = model_name
+        self.logger = get_logger()
+        self.lock = threading.Lock()
+        self.totals = {
+            "calls": 0,
+            "input_tokens": 0,
+            "cached_input_tokens": 0,
+            "uncached_input_tokens": 0,
+            "cache_creation_tokens": 0,
+            "output_tokens": 0,
+        }
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            messages = [getattr(generation, "message", None) for generation in generations]
+            usages = [usage for usage in map(extract_usage, messages) if usage is not None]
+            if not usages:
+                continue
+            # Completions requested with n>1 share one prompt, so count the call and its input
+            # once. Output is per completion when each generation reports its own usage;
+            # identical usage on every generation is the call's total, repeated.
+            usage = dict(usages[0])
+            if any(other != usages[0] for other in usages[1:]):
+                usage["output_tokens"] = sum(other["output_tokens"] for other in usages)
+            self.record(usage, response_model(messages[0]))
+
+    def record(self, usage: Dict[str, int], model: Optional[str] = None) -> None:
+        with self.lock:
+            self.totals["calls"] += 1
+            for key, value in usage.items():
+                self.totals[key] += value
+        # Priced at the rates of this tracker's provider, which may differ from the mutation's
+        record_usage(usage, self.model_name, model)
+        self.logger.info(
+            f"{self.model_name} token usage: input {usage['input_tokens']} "
+            f"(cached {usage['cached_input_tokens']}, uncached {usage['uncached_input_tokens']}), "
+            f"output {usage['output_tokens']}"
+        )
+
+    def metrics(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.totals)
+
+
+_trackers: Dict[str, UsageTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_usage_tracker(provider_name: str) -> UsageTracker:
+    """Return the process-wide usage tracker for a provider, creating it on first use."""
+    with _trackers_lock:
+        if provider_name not in _trackers:
+            _trackers[provider_name] = UsageTracker(provider_name)
+        return _trackers[provider_name]
+
+
+def get_usage_metrics() -> Dict[str, Dict[str, int]]:
+    """Token totals, split into cached and uncached input, for every provider seen so far."""
+    with _trackers_lock:
+        trackers = dict(_trackers)
+    return {name: tracker.metrics() for name, tracker in trackers.items()}
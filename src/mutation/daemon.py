@@ -0,0 +1,202 @@
+"""
+Shared mutation daemon for many concurrent NetLogo runs.
+
+Every NetLogo instance (BehaviorSpace threads, several headless runs) starts its own Python
+interpreter through `py:setup`, with its own caches and its own view of the provider rate
+limits. The daemon is one long-lived process serving mutations to all of them over
+localhost HTTP, so the verifier, the mutation memo, the translation cache, the rate
+limiters and the circuit breakers are shared. Identical requests that arrive while one is
+still running are coalesced: they wait for the running mutation and get its result.
+With MutationMemo enabled they are not, since every pick of a parent must get a distinct
+child.
+
+The daemon does not close generations. Each reply carries the cost ledger records of the
+mutations it ran ("ledger"), and the client adds them to its own ledger, so
+cost_ledger.json is still written by the client's NetLogoLogger. A coalesced request
+returns no records, since its mutation is paid for by the request that ran it. Memo
+prefetches run in the background after a reply; their records are sent with the next
+reply for the same parent (and are lost if that parent is never picked again).
+
+Start it with `python -m src.mutation.serve [--host HOST] [--port PORT]` and use
+src.mutation.daemon_client from NetLogo.
+
+Endpoints (JSON bodies):
+    POST /mutate        {"agent_info": [...], "model_type": "groq", "use_text_evolution": false}
+                        -> {"rule": "...", "text": "...", "ledger": [records]}
+    POST /mutate_batch  {"agent_infos": [[...], ...], "model_type": ..., "use_text_evolution": ...}
+                        -> {"results": [["rule", "text"], ...], "ledger": [records]}
+    GET  /metrics       daemon, rate limiter, circuit breaker and cache metrics
+    GET  /health        {"status": "ok"}
+"""
+import json
+import threading
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+import gin
+
+from src.utils.cost_ledger import get_cost_ledger
+from src.utils.logging import get_logger
+
+
+class RequestCoalescer:
+    """Runs identical concurrent requests once and hands every caller the same result."""
+
+    def __init__(self):
+        self.inflight: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "coalesced": 0}
+
+    def call(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            self.stats["requests"] += 1
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not owner:
+            return future.result()
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "inflight": len(self.inflight)}
+
+
+@gin.configurable
+class MutationDaemon:
+    """
+    Localhost HTTP server running mutations for several NetLogo clients.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, coalesce: bool = True,
+                 mutate: Optional[Callable[..., tuple]] = None,
+                 mutate_batch: Optional[Callable[..., list]] = None):
+        """
+        Args:
+            host: Interface to listen on (keep it on localhost; there is no authentication)
+            port: TCP port (0 picks a free one)
+            coalesce: Share the result of identical requests that are in flight at the same time
+                      (ignored with MutationMemo enabled)
+            mutate: Single-mutation function (defaults to mutate_code.mutate_code)
+            mutate_batch: Batch function (defaults to mutate_code.mutate_batch)
+        """
+        if mutate is None or mutate_batch is None:
+            from src.mutation import mutate_code as local
+            mutate = mutate or local.mutate_code
+            mutate_batch = mutate_batch or local.mutate_batch
+        self.mutate = mutate
+        self.mutate_batch = mutate_batch
+        self.coalesce = coalesce
+        self.coalescer = RequestCoalescer()
+        self.logger = get_logger()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                daemon.logger.debug(f"Daemon {self.address_string()}: {format % args}")
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._reply(200, {"status": "ok"})
+                elif self.path == "/metrics":
+                    self._reply(200, daemon.metrics())
+                else:
+                    self._reply(404, {"error": f"Unknown path {self.path}"})
+
+            def do_POST(self):
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    self._reply(200, daemon.handle(self.path, body))
+                except (KeyError, TypeError, ValueError) as e:
+                    self._reply(400, {"error": f"Bad request: {str(e)}"})
+                except Exception as e:
+                    daemon.logger.error(f"Daemon request {self.path} failed: {str(e)}")
+                    self._reply(500, {"error": str(e)})
+
+            def _reply(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def handle(self, path: str, body: dict) -> dict:
+        """
+        Run one request.
+
+        Raises:
+            KeyError: If the path is unknown or a required field is missing
+        """
+        model_type = body.get("model_type", "groq")
+        use_text_evolution = bool(body.get("use_text_evolution", False))
+        with get_cost_ledger().capture() as records:
+            if path == "/mutate":
+                run = lambda: self.mutate(body["agent_info"], model_type, use_text_evolution)
+                rule, text = self._run(path, body, run)
+                reply = {"rule": rule, "text": text}
+            elif path == "/mutate_batch":
+                run = lambda: self.mutate_batch(body["agent_infos"], model_type, use_text_evolution)
+                reply = {"results": [list(result) for result in self._run(path, body, run)]}
+            else:
+                raise KeyError(f"Unknown path {path}")
+        return {**reply, "ledger": records}
+
+    def _run(self, path: str, body: dict, run: Callable[[], Any]) -> Any:
+        from src.mutation.memo import get_mutation_memo
+        if not self.coalesce or get_mutation_memo().enabled:
+            return run()
+        return self.coalescer.call(json.dumps([path, body], sort_keys=True), run)
+
+    def metrics(self) -> dict:
+        from src.graph_providers.circuit_breaker import get_circuit_breaker_metrics
+        from src.graph_providers.rate_limiter import get_rate_limiter_metrics
+        from src.mutation.memo import get_mutation_memo
+        from src.mutation.translation_cache import get_translation_cache
+        return {"daemon": self.coalescer.metrics(),
+                "rate_limiters": get_rate_limiter_metrics(),
+                "circuit_breakers": get_circuit_breaker_metrics(),
+                "memo": get_mutation_memo().metrics(),
+                "translation_cache": get_translation_cache().metrics()}
+
+    def serve_forever(self) -> None:
+        self.logger.info(f"Mutation daemon listening on {self.address}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def start(self) -> threading.Thread:
+        """Serve in a background thread (for tests and embedding)."""
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,80 @@
+"""
+Thin NetLogo-side client for the shared mutation daemon (see daemon.py).
+
+Drop-in replacement for the functions in mutate_code, with the same signatures:
+
+    py:run "from src.mutation.daemon_client import mutate_code"
+
+Importing it loads nothing but the standard library. The daemon address comes from the
+LEAR_MUTATION_DAEMON environment variable (default http://127.0.0.1:8765). If the daemon
+cannot be reached, the mutation runs in this interpreter instead. The cost ledger records
+the daemon sends back are added to this interpreter's ledger, so NetLogoLogger writes
+cost_ledger.json as it does for local mutations.
+"""
+import json
+import os
+import urllib.error
+import urllib.request
+from typing import Optional
+
+DAEMON_URL_ENV = "LEAR_MUTATION_DAEMON"
+DEFAULT_DAEMON_URL = "http://127.0.0.1:8765"
+# Generous: the daemon enforces the mutation deadlines itself
+REQUEST_TIMEOUT = 600.0
+
+
+def daemon_url() -> str:
+    return os.getenv(DAEMON_URL_ENV, DEFAULT_DAEMON_URL).rstrip("/")
+
+
+def _post(path: str, payload: dict, timeout: Optional[float] = None) -> Optional[dict]:
+    """POST to the daemon; None if it is not running."""
+    request = urllib.request.Request(daemon_url() + path, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout or REQUEST_TIMEOUT) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"Mutation daemon error {e.code}: {e.read().decode('utf-8', 'replace')}") from e
+    except (urllib.error.URLError, ConnectionError) as e:
+        from src.utils.logging import get_logger
+        get_logger().warning(f"Mutation daemon at {daemon_url()} unreachable ({e}), mutating locally")
+        return None
+
+
+def _record_costs(reply: dict) -> None:
+    if reply.get("ledger"):
+        from src.utils.cost_ledger import get_cost_ledger
+        get_cost_ledger().add_records(reply["ledger"])
+
+
+def mutate_code(agent_info: list, model_type: str = "groq", use_text_evolution: bool = False) -> tuple:
+    """
+    Mutate one rule through the daemon.
+
+    Returns:
+        tuple: (new_rule, text)
+    """
+    reply = _post("/mutate", {"agent_info": agent_info, "model_type": model_type,
+                              "use_text_evolution": use_text_evolution})
+    if reply is None:
+        from src.mutation import mutate_code as local
+        return local.mutate_code(agent_info, model_type, use_text_evolution)
+    _record_costs(reply)
+    return (reply["rule"], reply["text"])
+
+
+def mutate_batch(agent_infos: list, model_type: str = "groq", use_text_evolution: bool = False) -> list:
+    """
+    Mutate a batch of parents through the daemon.
+
+    Returns:
+        list: (new_rule, text) per parent, in input order
+    """
+    reply = _post("/mutate_batch", {"agent_infos": agent_infos, "model_type": model_type,
+                                    "use_text_evolution": use_text_evolution})
+    if reply is None:
+        from src.mutation import mutate_code as local
+        return local.mutate_batch(agent_infos, model_type, use_text_evolution)
+    _record_costs(reply)
+    return [tuple(result) for result in reply["results"]]
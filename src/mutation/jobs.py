@@ -0,0 +1,146 @@
+"""
+Non-blocking mutation jobs for the NetLogo bridge.
+
+`mutate-rule` blocks inside `py:runresult` until the LLM answers, so the simulation stands
+still while mutations are in flight. With jobs, an environment submits mutations (for
+example during the last ticks of a generation), keeps simulating, and collects the
+children at the generation boundary:
+
+    py:run "from src.mutation.jobs import submit_mutation, poll, collect"
+    let job py:runresult "submit_mutation(agent_info, llm_type, text_based_evolution)"
+    ...
+    let results py:runresult "collect(job_ids)"
+
+Jobs run mutate_code on a pool of background threads, so everything that applies to
+mutate_code (memo, deadlines, cost ledger) applies to them too.
+"""
+import contextvars
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Union
+
+import gin
+
+from src.utils.logging import get_logger
+
+# NetLogo passes numbers as floats
+JobIds = Union[int, float, List[int]]
+
+
+@gin.configurable
+class MutationJobs:
+    """
+    Background executor for submitted mutations, addressed by job id.
+    """
+
+    def __init__(self, workers: int = 4, mutate: Optional[Callable[..., tuple]] = None):
+        """
+        Args:
+            workers: Mutations run concurrently; further jobs wait in a queue
+            mutate: Mutation function (defaults to mutate_code.mutate_code)
+        """
+        if mutate is None:
+            from src.mutation.mutate_code import mutate_code as mutate
+        self.mutate = mutate
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="mutation-job")
+        self.jobs: Dict[int, Future] = {}
+        self.fallbacks: Dict[int, tuple] = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.logger = get_logger()
+        self.stats = {"submitted": 0, "collected": 0, "failed": 0}
+
+    def submit(self, agent_info: list, model_type: str = "groq", use_text_evolution: bool = False) -> int:
+        """Start a mutation in the background and return its job id."""
+        future = self.executor.submit(contextvars.copy_context().run, self.mutate,
+                                      agent_info, model_type, use_text_evolution)
+        with self.lock:
+            job_id = next(self.ids)
+            self.jobs[job_id] = future
+            self.fallbacks[job_id] = (agent_info[0], agent_info[5] if len(agent_info) > 5 else "")
+            self.stats["submitted"] += 1
+        return job_id
+
+    def _futures(self, job_ids: List[int]) -> List[Future]:
+        with self.lock:
+            missing = [job_id for job_id in job_ids if job_id not in self.jobs]
+            if missing:
+                raise KeyError(f"Unknown or already collected mutation jobs: {missing}")
+            return [self.jobs[job_id] for job_id in job_ids]
+
+    def poll(self, job_ids: JobIds) -> Union[bool, List[bool]]:
+        """Whether each job has finished (a single bool for a single id)."""
+        if not isinstance(job_ids, (list, tuple)):
+            return self.poll([job_ids])[0]
+        return [future.done() for future in self._futures(job_ids)]
+
+    def collect(self, job_ids: JobIds, timeout: Optional[float] = None) -> Union[list, List[list]]:
+        """
+        Wait for jobs and return their results, forgetting the jobs.
+
+        Args:
+            job_ids: A job id or a list of them
+            timeout: Most seconds to wait; jobs still running then return their parent
+
+        Returns:
+            [new_rule, text] per job (a single pair for a single id); a failed or unfinished
+            job returns its parent's rule and text
+        """
+        if not isinstance(job_ids, (list, tuple)):
+            return self.collect([job_ids], timeout)[0]
+        futures = self._futures(job_ids)
+        wait(futures, timeout=timeout)
+        results = []
+        with self.lock:
+            for job_id, future in zip(job_ids, futures):
+                fallback = self.fallbacks.pop(job_id)
+                del self.jobs[job_id]
+                self.stats["collected"] += 1
+                if not future.done():
+                    future.cancel()
+                    self.logger.warning(f"Mutation job {job_id} still running at collection, keeping the parent")
+                    self.stats["failed"] += 1
+                    results.append(list(fallback))
+                elif future.exception() is not None:
+                    self.logger.error(f"Mutation job {job_id} failed: {str(future.exception())}")
+                    self.stats["failed"] += 1
+                    results.append(list(fallback))
+                else:
+                    results.append(list(future.result()))
+        return results
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "pending": sum(not future.done() for future in self.jobs.values()),
+                    "uncollected": len(self.jobs)}
+
+
+_mutation_jobs: Optional[MutationJobs] = None
+_mutation_jobs_lock = threading.Lock()
+
+
+def get_mutation_jobs() -> MutationJobs:
+    """Return the process-wide job executor, creating it (from gin) on first use."""
+    global _mutation_jobs
+    with _mutation_jobs_lock:
+        if _mutation_jobs is None:
+            from src.mutation.mutate_code import get_config
+            get_config()  # The worker count comes from gin
+            _mutation_jobs = MutationJobs()
+        return _mutation_jobs
+
+
+def submit_mutation(agent_info: list, model_type: str = "groq", use_text_evolution: bool = False) -> int:
+    """Start mutating a rule in the background; returns a job id for poll and collect."""
+    return get_mutation_jobs().submit(agent_info, model_type, use_text_evolution)
+
+
+def poll(job_ids: JobIds) -> Union[bool, List[bool]]:
+    """Whether the given jobs have finished, without waiting."""
+    return get_mutation_jobs().poll(job_ids)
+
+
+def collect(job_ids: JobIds, timeout: Optional[float] = None) -> Union[list, List[list]]:
+    """Wait for the given jobs and return [new_rule, text] per job, in order."""
+    return get_mutation_jobs().collect(job_ids, timeout)
@@ -0,0 +1,229 @@
+"""
+Per-run memo of verified children for repeatedly selected parents.
+
+Tournament and fitness-proportional selection often pick the same parent several times,
+within a generation and across generations. Each pick would run the full pseudocode and
+code-generation pipeline on identical inputs. MutationMemo keeps, per
+(canonical parent rule, pseudocode, text evolution, provider, prompt config), a small
+pool of distinct verified children. Repeated picks are served from the pool, and no child
+is handed out twice, so offspring stay diverse. Once a parent has been picked twice, its
+pool is topped up in the background.
+
+NetLogo starts a fresh Python process on every setup (`py:setup`), so a module-level
+memo lives exactly as long as one run.
+"""
+import contextvars
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Hashable, List, Optional, Tuple
+
+import gin
+
+from src.utils.cost_ledger import get_cost_ledger, record_event
+from src.utils.deadline import get_deadline_policy
+from src.utils.logging import get_logger
+
+Child = Tuple[str, str]  # (rule, pseudocode)
+
+
+def canonical_rule(rule: str) -> str:
+    """Normalise whitespace and bracket spacing so equivalent rules share a memo key."""
+    rule = re.sub(r"\s*([\[\]()])\s*", r" \1 ", rule or "")
+    return " ".join(rule.split())
+
+
+class _Entry:
+    """Pool and bookkeeping for one memo key."""
+
+    def __init__(self):
+        self.pool: List[Child] = []
+        self.served = set()
+        self.requests = 0
+        self.pending: Optional[Future] = None
+        # Ledger records of prefetches run for a daemon request, sent with the next request for this key
+        self.records: List[dict] = []
+
+
+@gin.configurable
+class MutationMemo:
+    """
+    Memo of verified, distinct children per parent.
+    """
+
+    def __init__(self, enabled: bool = False, pool_size: int = 3, max_keys: int = 1000,
+                 prefetch_workers: int = 2):
+        """
+        Args:
+            enabled: Whether mutations are memoised at all
+            pool_size: Distinct children kept ready for a repeatedly selected parent
+            max_keys: Parents remembered before the least recently used is dropped
+            prefetch_workers: Background threads that top up pools
+        """
+        self.enabled = enabled
+        self.pool_size = pool_size
+        self.max_keys = max_keys
+        self.entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=prefetch_workers) if enabled else None
+        self.logger = get_logger()
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "prefetched": 0}
+
+    @staticmethod
+    def make_key(parent_rule: str, pseudocode: str, use_text_evolution: bool, model_type: str,
+                 prompt_config: Tuple = ()) -> Hashable:
+        return (canonical_rule(parent_rule), pseudocode or "", bool(use_text_evolution), model_type, prompt_config)
+
+    def _entry(self, key: Hashable) -> _Entry:
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = _Entry()
+            while len(self.entries) > self.max_keys:
+                self.entries.popitem(last=False)
+        self.entries.move_to_end(key)
+        return entry
+
+    def _take(self, entry: _Entry) -> Optional[Child]:
+        while entry.pool:
+            child = entry.pool.pop(0)
+            if canonical_rule(child[0]) not in entry.served:
+                entry.served.add(canonical_rule(child[0]))
+                return child
+        return None
+
+    def _add(self, entry: _Entry, parent_rule: str, child: Child) -> bool:
+        """Keep a child if it is a real mutation not yet served or pooled."""
+        rule = canonical_rule(child[0])
+        if rule == canonical_rule(parent_rule) or rule in entry.served:
+            return False
+        if any(canonical_rule(pooled[0]) == rule for pooled in entry.pool):
+            return False
+        entry.pool.append(child)
+        return True
+
+    def get(self, key: Hashable, parent_rule: str, generate: Callable[[], Child], provider: str = "") -> Child:
+        """
+        Return a child for `key`, from the pool if possible, otherwise by calling `generate`.
+
+        Args:
+            key: Key from make_key
+            parent_rule: Parent rule (children equal to it are failed mutations and not kept)
+            generate: Runs the mutation pipeline and returns (rule, pseudocode)
+            provider: Provider name, used to attribute prefetch cost in the ledger
+
+        Returns:
+            (rule, pseudocode) of the child
+        """
+        child = self.take(key, parent_rule)
+        if child is None:
+            child = generate()
+        self.served(key, parent_rule, child, generate, provider)
+        return child
+
+    def take(self, key: Hashable, parent_rule: str, wait: bool = True) -> Optional[Child]:
+        """
+        Serve a pooled child for `key`, or None on a miss. The caller then generates the
+        child itself and reports it with served().
+
+        Args:
+            key: Key from make_key
+            parent_rule: Parent rule, for logging
+            wait: Wait (up to the mutation's deadline) for a running prefetch of this parent
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            entry = self._entry(key)
+            entry.requests += 1
+            child = self._take(entry)
+            pending = entry.pending if child is None and wait else None
+            prefetch_records, entry.records = entry.records, []
+        if prefetch_records:
+            get_cost_ledger().add_records(prefetch_records)
+
+        if child is None and pending is not None:
+            # A prefetch for this parent is running; waiting is cheaper than a duplicate call,
+            # but not past the mutation's deadline
+            deadline = get_deadline_policy().deadline()
+            try:
+                pending.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                pass
+            with self.lock:
+                child = self._take(entry)
+
+        with self.lock:
+            self.stats["hits" if child is not None else "misses"] += 1
+        if child is not None:
+            record_event("memo_hits")
+            self.logger.info(f"Mutation memo hit for parent {parent_rule[:80]}")
+        return child
+
+    def served(self, key: Hashable, parent_rule: str, child: Child, generate: Callable[[], Child],
+               provider: str = "") -> None:
+        """
+        Note that `child` was handed out for `key`, so it is never pooled again, and top
+        up the pool of a repeatedly selected parent with `generate`.
+        """
+        with self.lock:
+            entry = self._entry(key)
+            if canonical_rule(child[0]) != canonical_rule(parent_rule):
+                entry.served.add(canonical_rule(child[0]))
+        self._schedule_prefetch(entry, parent_rule, generate, provider)
+
+    def _schedule_prefetch(self, entry: _Entry, parent_rule: str, generate: Callable[[], Child],
+                           provider: str) -> None:
+        with self.lock:
+            if entry.requests < 2 or entry.pending is not None or len(entry.pool) >= self.pool_size:
+                return
+            missing = self.pool_size - len(entry.pool)
+            ledger = get_cost_ledger()
+            # The mutation daemon captures each request's records for its reply, and nothing
+            # closes its own generations: keep prefetch records for the next request for this
+            # key instead of queueing them in the daemon's ledger
+            deferred = ledger.capturing()
+
+            def refill():
+                try:
+                    for _ in range(missing):
+                        records: List[dict] = []
+                        try:
+                            with ledger.capture() as records:
+                                # Attribute the prefetch to its own ledger record, not to the request that triggered it
+                                with ledger.track_mutation(provider) as record:
+                                    record.outcome = "prefetch"
+                                    child = generate()
+                        finally:
+                            if deferred:
+                                with self.lock:
+                                    entry.records.extend(records)
+                            else:
+                                ledger.add_records(records)
+                        with self.lock:
+                            if self._add(entry, parent_rule, child):
+                                self.stats["prefetched"] += 1
+                except Exception as e:
+                    self.logger.warning(f"Mutation memo prefetch failed: {str(e)}")
+                finally:
+                    with self.lock:
+                        entry.pending = None
+
+            entry.pending = self.executor.submit(contextvars.Context().run, refill)
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return dict(self.stats, keys=len(self.entries))
+
+
+_memo: Optional[MutationMemo] = None
+_memo_lock = threading.Lock()
+
+
+def get_mutation_memo() -> MutationMemo:
+    """Return the process-wide (per-run) memo, creating it (from gin) on first use."""
+    global _memo
+    with _memo_lock:
+        if _memo is None:
+            _memo = MutationMemo()
+        return _memo
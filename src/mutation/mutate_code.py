@@ -1,35 +1,80 @@
-from typing import Union
-import os
-from pathlib import Path
-# Ensure the script is run from the correct directory
-
-# Add parent directory to path
-import sys
-import os
+import json
 import sys
+import threading
 from pathlib import Path
+from typing import Optional
 
 # Add project root directory to path
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(PROJECT_ROOT))
 
-print("Current working directory:", os.getcwd())
-
-from src.utils.config import load_config
-from src.verification.verify_netlogo import NetLogoVerifier
 from src.utils import logging
-from src.netlogo_code_generator.graph import NetLogoCodeGenerator
-from src.graph_providers.unified_provider import create_graph_provider
+from src.utils.cost_ledger import get_cost_ledger
+from src.mutation.memo import get_mutation_memo
+from src.utils.deadline import get_deadline_policy
 
-config = load_config()
 logger = logging.get_logger()
-logger.info("Loading NetLogoVerifier...")
-verifier = NetLogoVerifier()
-logger.info("NetLogoVerifier loaded.")
+
+# Created on first use so that `py:run "from src.mutation.mutate_code import mutate_code"`
+# in NetLogo's setup does not pay for gin parsing, LangGraph or the verifier.
+_config = None
+_verifier = None
+_init_lock = threading.Lock()
+
+
+def get_config() -> dict:
+    """Load the environment and gin configuration once, on first use."""
+    global _config
+    with _init_lock:
+        if _config is None:
+            from src.utils.config import load_config
+            _config = load_config()
+    return _config
+
+
+def get_verifier():
+    """Return the shared NetLogoVerifier, creating it on first use."""
+    global _verifier
+    get_config()
+    with _init_lock:
+        if _verifier is None:
+            from src.verification.verify_netlogo import NetLogoVerifier
+            logger.info("Loading NetLogoVerifier...")
+            _verifier = NetLogoVerifier()
+            logger.info("NetLogoVerifier loaded.")
+    return _verifier
+
+
+def __getattr__(name: str):
+    # Keep the old module-level `config` and `verifier` attributes available
+    if name == "config":
+        return get_config()
+    if name == "verifier":
+        return get_verifier()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def get_graph_provider(model_type: str):
     """Get the appropriate Graph provider based on model type."""
-    return create_graph_provider(model_type, verifier)
+    from src.graph_providers.unified_provider import create_graph_provider
+    return create_graph_provider(model_type, get_verifier())
+
+
+def memo_key(provider, agent_info: list, current_text: str, use_text_evolution: bool, model_type: str):
+    """MutationMemo key of a parent under the provider's prompt configuration."""
+    prompt_config = (provider.prompt_type, provider.prompt_name, provider.evolution_strategy,
+                     getattr(provider, "temperature", None))
+    return get_mutation_memo().make_key(agent_info[0], current_text, use_text_evolution, model_type, prompt_config)
+
+
+def generate_child(graph_generator, agent_info: list, current_text: str, use_text_evolution: bool) -> tuple:
+    """Run the whole graph for one parent and return (new_rule, text)."""
+    result = graph_generator.generate_code(agent_info, current_text, use_text_evolution)
+    # Check if result is a tuple (new_rule, modified_pseudocode)
+    if isinstance(result, tuple) and len(result) == 2:
+        return result
+    return result, current_text
+
 
 def mutate_code(agent_info: list, model_type: str = "groq", use_text_evolution: bool = False) -> tuple:
     """
@@ -46,23 +91,157 @@ def mutate_code(agent_info: list, model_type: str = "groq", use_text_evolution:
     if len(agent_info) > 5:
         current_text = agent_info[5]
     
-    provider = get_graph_provider(model_type)
-    graph_generator = NetLogoCodeGenerator(provider, verifier)
-    result = graph_generator.generate_code(agent_info, current_text, use_text_evolution)
-    
-    # Check if result is a tuple (new_rule, modified_pseudocode)
-    if isinstance(result, tuple) and len(result) == 2:
-        new_rule, text = result
-    else:
-        new_rule = result
-        text = current_text
-    
+    from src.netlogo_code_generator.graph import NetLogoCodeGenerator
+
+    # Tokens, retries and wall time of this mutation go to the run's cost ledger
+    with get_cost_ledger().track_mutation(model_type):
+        provider = get_graph_provider(model_type)
+        graph_generator = NetLogoCodeGenerator(provider, get_verifier())
+
+        def generate() -> tuple:
+            # On timeout the best verified code so far, or the parent, is returned
+            return get_deadline_policy().run(
+                lambda: generate_child(graph_generator, agent_info, current_text, use_text_evolution),
+                fallback=(agent_info[0], current_text))
+
+        memo = get_mutation_memo()
+        if memo.enabled:
+            # Parents picked repeatedly by selection are served distinct children from a pool
+            key = memo_key(provider, agent_info, current_text, use_text_evolution, model_type)
+            new_rule, text = memo.get(key, agent_info[0], generate, provider=model_type)
+        else:
+            new_rule, text = generate()
+
     logger.info(f"Graph-based code generation complete. Result code: {new_rule}")
     logger.info(f"Text: {text}")
     
     return (new_rule, text)
 
 
+def mutate_batch(agent_infos: list, model_type: str = "groq", use_text_evolution: bool = False) -> list:
+    """
+    Mutate a batch of parents, pipelining pseudocode evolution and code generation.
+
+    With MutationMemo enabled, parents with pooled children are served from the memo and
+    only the rest go through the pipeline. A running prefetch is not waited for, since
+    the batch would generate the child anyway.
+
+    Returns:
+        list: (new_rule, text) per parent, in input order
+    """
+    from src.mutation.pipeline import SKIP_EVOLUTION, MutationPipeline
+    from src.mutation.text_based_evolution import TextBasedEvolution
+    from src.netlogo_code_generator.graph import NetLogoCodeGenerator
+
+    logger.info(f"Starting batch of {len(agent_infos)} mutations with model type: {model_type}, "
+                f"use_text_evolution: {use_text_evolution}")
+    pipeline = MutationPipeline()
+    deadlines = get_deadline_policy()
+    # The whole batch is one generation for the generation time budget
+    deadlines.start_generation()
+    provider = get_graph_provider(model_type)
+    graph_generator = NetLogoCodeGenerator(provider, get_verifier())
+
+    evolve = None
+    if use_text_evolution:
+        text_evolution = TextBasedEvolution(get_graph_provider(pipeline.pseudocode_model_type or model_type))
+
+        def evolve(agent_info: list) -> str:
+            current_text = agent_info[5] if len(agent_info) > 5 else ""
+            return deadlines.run(lambda: text_evolution.generate_pseudocode(agent_info, current_text, agent_info[0]),
+                                 fallback=None)
+
+    def generate(agent_info: list, pseudocode) -> tuple:
+        current_text = agent_info[5] if len(agent_info) > 5 else ""
+
+        def run_graph() -> tuple:
+            # A failed stage 1 is not repeated inside the graph, outside the pipeline's limits
+            skip_evolution = pseudocode is SKIP_EVOLUTION
+            result = graph_generator.generate_code(agent_info, current_text, use_text_evolution,
+                                                   None if skip_evolution else pseudocode, skip_evolution)
+            if isinstance(result, tuple) and len(result) == 2:
+                return result
+            return result, current_text
+
+        return deadlines.run(run_graph, fallback=(agent_info[0], current_text))
+
+    def generate_batch(batch_infos: list, pseudocodes: list) -> list:
+        current_texts = [agent_info[5] if len(agent_info) > 5 else "" for agent_info in batch_infos]
+        # Batched generation never evolves pseudocode itself
+        pseudocodes = [None if pseudocode is SKIP_EVOLUTION else pseudocode for pseudocode in pseudocodes]
+        return deadlines.run(
+            lambda: graph_generator.generate_code_batch(batch_infos, current_texts, use_text_evolution, pseudocodes),
+            fallback=[(agent_info[0], text) for agent_info, text in zip(batch_infos, current_texts)])
+
+    memo = get_mutation_memo()
+    current_texts = [agent_info[5] if len(agent_info) > 5 else "" for agent_info in agent_infos]
+    keys = [memo_key(provider, agent_info, text, use_text_evolution, model_type) if memo.enabled else None
+            for agent_info, text in zip(agent_infos, current_texts)]
+    results = [None] * len(agent_infos)
+    if memo.enabled:
+        ledger = get_cost_ledger()
+        for index, agent_info in enumerate(agent_infos):
+            # A memo hit is a mutation of its own in the cost ledger, as in mutate_code;
+            # a miss is recorded by the pipeline
+            record = ledger.begin_mutation(model_type)
+            with ledger.attribute(record):
+                results[index] = memo.take(keys[index], agent_info[0], wait=False)
+            if results[index] is not None:
+                ledger.end_mutation(record)
+    misses = [index for index, result in enumerate(results) if result is None]
+
+    # Several children per request when the provider batches prompts
+    batch_size = getattr(provider, "batch_size", 1)
+    try:
+        generated = pipeline.run([agent_infos[index] for index in misses], evolve, generate, provider=model_type,
+                                 generate_batch=generate_batch if batch_size > 1 else None, batch_size=batch_size)
+    finally:
+        deadlines.close_generation()
+    for index, result in zip(misses, generated):
+        results[index] = result
+
+    if memo.enabled:
+        for agent_info, text, key, result in zip(agent_infos, current_texts, keys, results):
+            # Prefetches take the per-mutation path (pseudocode evolution inside the graph)
+            def prefetch(agent_info=agent_info, text=text) -> tuple:
+                return deadlines.run(lambda: generate_child(graph_generator, agent_info, text, use_text_evolution),
+                                     fallback=(agent_info[0], text))
+            memo.served(key, agent_info[0], result, prefetch, provider=model_type)
+    return results
+
+
+def mutate_generation(parents: list, child_ids: Optional[list] = None, model_type: str = "groq",
+                      use_text_evolution: bool = False, log_data: Optional[list] = None) -> list:
+    """
+    Mutate a whole generation and log it in one call from NetLogo.
+
+    Args:
+        parents: agent_info list per child to mutate (rule, input, parent rule, fitness,
+                 ticks, pseudocode), as mutate_code takes them
+        child_ids: NetLogo `who` of each child, in the order of `parents`
+        model_type: Provider to use
+        use_text_evolution: Whether to use text-based evolution
+        log_data: [metrics, agent tables (JSON)] of the generation, or empty to skip logging.
+                  The children's entries under "new agents" still hold their parents'
+                  rules and are filled in with the mutated ones before logging.
+
+    Returns:
+        list: [new_rule, text] per child, in input order
+    """
+    results = mutate_batch(parents, model_type, use_text_evolution)
+    if log_data:
+        metrics, agent_tables = log_data
+        if isinstance(agent_tables, str):
+            agent_tables = json.loads(agent_tables)
+        new_agents = agent_tables.get("new agents", {})
+        for child_id, (rule, text) in zip(child_ids or [], results):
+            entry = new_agents.get(f"agent {int(child_id)}")
+            if entry is not None:
+                entry["rule"], entry["pseudocode"] = rule, text
+        from src.utils.sim_logger import get_logger as get_sim_logger
+        get_sim_logger().log_generation([dict(metrics), agent_tables])
+    return [list(result) for result in results]
+
 
 if __name__ == "__main__":
     # Example usage
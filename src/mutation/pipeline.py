@@ -0,0 +1,178 @@
+"""
+Pipelined two-stage mutation of a batch of parents.
+
+With text evolution, each mutation has two dependent stages: evolving the pseudocode
+and then generating and verifying code from it. Run back to back, a batch takes the sum
+of both stages for every parent. MutationPipeline runs them as a pipeline: stage 1
+workers evolve pseudocode in input order and hand it to stage 2 workers through a bounded
+queue, so pseudocode for parent i+1 is generated while code for parent i is generated and
+verified. When stage 2 falls behind, the full queue blocks stage 1 instead of piling up
+pseudocode. Each stage has its own concurrency limit, and stage 1 may use a different
+(e.g. cheaper) provider. With a batch size above 1, a stage 2 worker takes every parent
+already waiting (up to the batch size) and generates their children in one request.
+"""
+import contextvars
+import queue
+import threading
+import time
+from typing import Callable, List, Optional
+
+import gin
+
+from src.utils.cost_ledger import get_cost_ledger
+from src.utils.logging import get_logger
+
+_DONE = object()
+# Handed to stage 2 instead of pseudocode when stage 1 failed, so stage 2 does not evolve again
+SKIP_EVOLUTION = object()
+
+
+@gin.configurable
+class MutationPipeline:
+    """
+    Two-stage (pseudocode, then code) executor for a batch of mutations.
+    """
+
+    def __init__(self, pseudocode_workers: int = 2, code_workers: int = 2, queue_size: int = 4,
+                 pseudocode_model_type: Optional[str] = None):
+        """
+        Args:
+            pseudocode_workers: Concurrent pseudocode generations (stage 1)
+            code_workers: Concurrent code generations with verification (stage 2)
+            queue_size: Evolved pseudocode waiting for stage 2 before stage 1 blocks
+            pseudocode_model_type: Provider for stage 1; None uses the batch's model type
+        """
+        self.pseudocode_workers = max(1, pseudocode_workers)
+        self.code_workers = max(1, code_workers)
+        self.queue_size = max(1, queue_size)
+        self.pseudocode_model_type = pseudocode_model_type
+        self.logger = get_logger()
+
+    def run(self, agent_infos: List[list], evolve: Optional[Callable[[list], Optional[str]]],
+            generate: Callable[[list, Optional[str]], tuple], provider: str = "",
+            generate_batch: Optional[Callable[[List[list], List[Optional[str]]], List[tuple]]] = None,
+            batch_size: int = 1) -> List[tuple]:
+        """
+        Mutate every parent of a batch.
+
+        Args:
+            agent_infos: One agent_info list per parent, as passed to mutate_code
+            evolve: Stage 1, returns evolved pseudocode for a parent (None if it failed);
+                    None runs stage 2 only
+            generate: Stage 2, takes a parent and its evolved pseudocode (None without
+                      stage 1, SKIP_EVOLUTION if stage 1 failed) and returns (new_rule, text)
+            provider: Provider name the mutations are recorded under in the cost ledger
+            generate_batch: Stage 2 for several parents at once (one LLM request for many
+                            children); used instead of `generate` when batch_size > 1
+            batch_size: Most parents a stage 2 worker takes from the queue at once
+
+        Returns:
+            (new_rule, text) per parent, in input order; a parent whose mutation raised
+            gets its own rule and pseudocode back
+        """
+        start = time.monotonic()
+        ledger = get_cost_ledger()
+        results: List[Optional[tuple]] = [None] * len(agent_infos)
+        todo: "queue.Queue" = queue.Queue()
+        batch_size = batch_size if generate_batch else 1
+        evolved: "queue.Queue" = queue.Queue(maxsize=max(self.queue_size, batch_size))
+        for index in range(len(agent_infos)):
+            todo.put(index)
+
+        def fallback(index: int) -> tuple:
+            agent_info = agent_infos[index]
+            return agent_info[0], agent_info[5] if len(agent_info) > 5 else ""
+
+        def pseudocode_stage():
+            while True:
+                try:
+                    index = todo.get_nowait()
+                except queue.Empty:
+                    return
+                # One ledger record per mutation, shared by both stages
+                record = ledger.begin_mutation(provider)
+                pseudocode = None
+                try:
+                    with ledger.attribute(record):
+                        pseudocode = evolve(agent_infos[index]) if evolve else None
+                except Exception as e:
+                    self.logger.error(f"Pseudocode stage failed for parent {index}: {str(e)}")
+                if evolve and pseudocode is None:
+                    pseudocode = SKIP_EVOLUTION
+                evolved.put((index, pseudocode, record))
+
+        def code_stage():
+            while True:
+                item = evolved.get()
+                if item is _DONE:
+                    return
+                if batch_size > 1:
+                    done = code_batch(take_batch(item))
+                    if done:
+                        return
+                    continue
+                index, pseudocode, record = item
+                try:
+                    with ledger.attribute(record):
+                        results[index] = generate(agent_infos[index], pseudocode)
+                except Exception as e:
+                    self.logger.error(f"Code stage failed for parent {index}: {str(e)}")
+                    record.outcome = "error"
+                    results[index] = fallback(index)
+                finally:
+                    ledger.end_mutation(record)
+
+        def take_batch(first) -> list:
+            """The given item plus whatever else is already waiting, up to batch_size."""
+            items = [first]
+            while len(items) < batch_size:
+                try:
+                    items.append(evolved.get_nowait())
+                except queue.Empty:
+                    break
+                if items[-1] is _DONE:
+                    break
+            return items
+
+        def code_batch(items: list) -> bool:
+            """Run stage 2 for several parents; returns whether the worker's stop marker was taken."""
+            done = items[-1] is _DONE
+            items = [item for item in items if item is not _DONE]
+            indices = [index for index, _, _ in items]
+            # The shared request is recorded once and split evenly across its mutations
+            shared = ledger.begin_mutation(provider)
+            try:
+                with ledger.attribute(shared):
+                    batch_results = generate_batch([agent_infos[i] for i in indices],
+                                                   [pseudocode for _, pseudocode, _ in items])
+                for index, result in zip(indices, batch_results):
+                    results[index] = result
+            except Exception as e:
+                self.logger.error(f"Code stage failed for parents {indices}: {str(e)}")
+                for _, _, record in items:
+                    record.outcome = "error"
+            finally:
+                for _, _, record in items:
+                    for key, value in shared.counts.items():
+                        record.add(key, value / len(items))
+                    record.add_cost(shared.cost / len(items))
+                    ledger.end_mutation(record)
+            return done
+
+        # Workers run in copies of the caller's context so they stay inside its trace
+        producers = [threading.Thread(target=contextvars.copy_context().run, args=(pseudocode_stage,), daemon=True)
+                     for _ in range(self.pseudocode_workers if evolve else 1)]
+        consumers = [threading.Thread(target=contextvars.copy_context().run, args=(code_stage,), daemon=True)
+                     for _ in range(self.code_workers)]
+        for thread in producers + consumers:
+            thread.start()
+        for thread in producers:
+            thread.join()
+        for _ in consumers:
+            evolved.put(_DONE)
+        for thread in consumers:
+            thread.join()
+
+        self.logger.info(f"Pipelined {len(agent_infos)} mutations in {time.monotonic() - start:.2f}s "
+                         f"({self.pseudocode_workers if evolve else 0} pseudocode, {self.code_workers} code workers)")
+        return [result if result is not None else fallback(i) for i, result in enumerate(results)]
@@ -0,0 +1,39 @@
+"""
+Command-line entry point of the shared mutation daemon (see daemon.py).
+
+    python -m src.mutation.serve [--host HOST] [--port PORT]
+
+Kept separate from daemon.py so MutationDaemon is registered with gin only once, under
+its module name, even when the daemon is started as a script.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Allow `python src/mutation/serve.py` as well as `python -m src.mutation.serve`
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.mutation.daemon import MutationDaemon
+from src.mutation.mutate_code import get_config, get_verifier
+from src.utils.deadline import get_deadline_policy
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Serve LLM mutations to several NetLogo runs")
+    parser.add_argument("--host", default=None, help="Interface to listen on (default from gin)")
+    parser.add_argument("--port", type=int, default=None, help="Port to listen on (default from gin)")
+    args = parser.parse_args(argv)
+
+    get_config()
+    get_verifier()  # Load once up front instead of on the first request
+    # Clients end their generations independently, so one shared generation budget means nothing here
+    get_deadline_policy().generation_seconds = None
+
+    overrides = {key: value for key, value in (("host", args.host), ("port", args.port)) if value is not None}
+    MutationDaemon(**overrides).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
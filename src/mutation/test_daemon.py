@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from src.mutation import daemon_client
+from src.mutation.daemon import MutationDaemon, RequestCoalescer
+from src.mutation.memo import MutationMemo
+from src.utils.cost_ledger import get_cost_ledger, record_event
+
+
+class SlowMutation:
+    """Counts calls and holds each one until released."""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+
+    def __call__(self, agent_info, model_type, use_text_evolution):
+        with self.lock:
+            self.calls += 1
+        with get_cost_ledger().track_mutation(model_type):
+            record_event("llm_calls")
+            self.release.wait(5)
+        return agent_info[0] + " fd 1", f"{model_type} text"
+
+
+class TestRequestCoalescer(unittest.TestCase):
+    def test_errors_reach_every_waiter(self):
+        coalescer = RequestCoalescer()
+        with self.assertRaises(ValueError):
+            coalescer.call("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        self.assertEqual(coalescer.metrics()["inflight"], 0)
+
+
+class TestMutationDaemon(unittest.TestCase):
+    def setUp(self):
+        self.mutation = SlowMutation()
+        self.daemon = MutationDaemon(port=0, mutate=self.mutation,
+                                     mutate_batch=lambda infos, model, text: [(info[0], "") for info in infos])
+        self.daemon.start()
+        self.env = mock.patch.dict("os.environ", {daemon_client.DAEMON_URL_ENV: self.daemon.address})
+        self.env.start()
+
+    def tearDown(self):
+        self.mutation.release.set()
+        self.env.stop()
+        self.daemon.shutdown()
+
+    def test_client_round_trip(self):
+        self.mutation.release.set()
+        self.assertEqual(daemon_client.mutate_code(["rt 10", []], "local-sim"), ("rt 10 fd 1", "local-sim text"))
+        self.assertEqual(daemon_client.mutate_batch([["rt 1"], ["rt 2"]], "local-sim"), [("rt 1", ""), ("rt 2", "")])
+
+    def test_identical_inflight_requests_are_coalesced(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(daemon_client.mutate_code, ["rt 10", []], "local-sim") for _ in range(3)]
+            futures.append(executor.submit(daemon_client.mutate_code, ["rt 20", []], "local-sim"))
+            while self.daemon.coalescer.metrics()["requests"] < 4:
+                time.sleep(0.01)
+            self.mutation.release.set()
+            results = [future.result() for future in futures]
+        self.assertEqual(results[:3], [("rt 10 fd 1", "local-sim text")] * 3)
+        self.assertEqual(self.mutation.calls, 2)
+        self.assertEqual(self.daemon.metrics()["daemon"]["coalesced"], 2)
+
+    def test_no_coalescing_with_the_memo(self):
+        # Each pick of a parent must get its own child from the memo
+        with mock.patch("src.mutation.memo.get_mutation_memo", return_value=MutationMemo(enabled=True)), \
+                ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(daemon_client.mutate_code, ["rt 10", []], "local-sim") for _ in range(2)]
+            deadline = time.monotonic() + 5
+            while self.mutation.calls < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.mutation.release.set()
+            [future.result() for future in futures]
+        self.assertEqual(self.mutation.calls, 2)
+        self.assertEqual(self.daemon.metrics()["daemon"]["coalesced"], 0)
+
+    def test_ledger_records_reach_the_client(self):
+        ledger = get_cost_ledger()
+        ledger.reset()
+        self.mutation.release.set()
+        daemon_client.mutate_code(["rt 10", []], "local-sim")
+        # The daemon and the client share this process's ledger: the record is added once, by the client
+        self.assertEqual([(record["provider"], record["llm_calls"]) for record in ledger.pending],
+                         [("local-sim", 1)])
+        ledger.reset()
+
+    def test_bad_request_is_reported(self):
+        with self.assertRaises(RuntimeError):
+            daemon_client._post("/mutate", {"model_type": "groq"})
+
+
+if __name__ == "__main__":
+    unittest.main()
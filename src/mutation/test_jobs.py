@@ -0,0 +1,43 @@
+import threading
+import unittest
+
+from src.mutation.jobs import MutationJobs
+
+
+class GatedMutation:
+    """Appends " fd 1" to the rule once released; fails for the rule "fail"."""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def __call__(self, agent_info, model_type, use_text_evolution):
+        self.release.wait(5)
+        if agent_info[0] == "fail":
+            raise RuntimeError("provider down")
+        return agent_info[0] + " fd 1", "new text"
+
+
+class TestMutationJobs(unittest.TestCase):
+    def setUp(self):
+        self.mutation = GatedMutation()
+        self.jobs = MutationJobs(workers=2, mutate=self.mutation)
+
+    def tearDown(self):
+        self.mutation.release.set()
+
+    def test_submit_poll_collect(self):
+        ids = [self.jobs.submit(["rt 1", [], "", 0, 0, "a"]), self.jobs.submit(["fail", [], "", 0, 0, "b"])]
+        self.assertEqual(self.jobs.poll(ids), [False, False])
+        self.mutation.release.set()
+        self.assertEqual(self.jobs.collect(ids), [["rt 1 fd 1", "new text"], ["fail", "b"]])
+        self.assertEqual(self.jobs.metrics()["failed"], 1)
+        with self.assertRaises(KeyError):
+            self.jobs.poll(ids)
+
+    def test_collect_timeout_keeps_the_parent(self):
+        job = self.jobs.submit(["rt 1", [], "", 0, 0, "a"])
+        self.assertEqual(self.jobs.collect(job, timeout=0.01), ["rt 1", "a"])
+
+
+if __name__ == "__main__":
+    unittest.main()
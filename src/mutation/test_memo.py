@@ -0,0 +1,100 @@
+import itertools
+import threading
+import unittest
+
+from src.mutation.memo import MutationMemo, canonical_rule
+from src.utils.cost_ledger import get_cost_ledger
+
+PARENT = "fd 1 rt 10"
+
+
+class ChildGenerator:
+    """Returns a new child on every call, optionally repeating or failing."""
+
+    def __init__(self, children=None):
+        self.children = iter(children) if children is not None else (f"fd {i}" for i in itertools.count(2))
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            return next(self.children), "pseudocode"
+
+
+class TestMutationMemo(unittest.TestCase):
+    def setUp(self):
+        self.memo = MutationMemo(enabled=True, pool_size=2)
+        self.key = MutationMemo.make_key(PARENT, "pseudocode", False, "groq")
+
+    def drain(self):
+        for entry in self.memo.entries.values():
+            if entry.pending is not None:
+                entry.pending.result()
+
+    def test_canonical_rule_ignores_whitespace(self):
+        self.assertEqual(canonical_rule("if  x [fd 1]\n rt 2"), canonical_rule("if x [ fd 1 ] rt 2"))
+        self.assertEqual(MutationMemo.make_key("fd 1  rt 10", "pseudocode", False, "groq"), self.key)
+
+    def test_repeated_parent_is_served_from_pool_without_repeats(self):
+        generate = ChildGenerator()
+        children = [self.memo.get(self.key, PARENT, generate)[0]]
+        children.append(self.memo.get(self.key, PARENT, generate)[0])  # Miss; starts the prefetch
+        self.drain()
+        children.append(self.memo.get(self.key, PARENT, generate)[0])
+        children.append(self.memo.get(self.key, PARENT, generate)[0])
+        self.assertEqual(self.memo.metrics()["hits"], 2)
+        self.assertEqual(len(set(children)), len(children))
+
+    def test_failed_and_duplicate_children_are_not_pooled(self):
+        # Served "fd 5" first; the prefetch then returns the parent (a failed mutation) and "fd  5"
+        generate = ChildGenerator([PARENT, "fd 5", PARENT, "fd  5"])
+        self.memo.get(self.key, PARENT, generate)
+        self.memo.get(self.key, PARENT, generate)
+        self.drain()
+        self.assertEqual(self.memo.entries[self.key].pool, [])
+        self.assertEqual(self.memo.metrics()["prefetched"], 0)
+
+    def test_prefetch_is_recorded_separately_in_the_ledger(self):
+        ledger = get_cost_ledger()
+        ledger.reset()
+        generate = ChildGenerator()
+        with ledger.track_mutation("groq"):
+            self.memo.get(self.key, PARENT, generate)
+        with ledger.track_mutation("groq"):
+            self.memo.get(self.key, PARENT, generate)
+        self.drain()
+        with ledger.track_mutation("groq") as record:
+            self.memo.get(self.key, PARENT, generate)
+        self.assertEqual(record.counts["memo_hits"], 1)
+        outcomes = [r["outcome"] for r in ledger.pending]
+        self.assertEqual(outcomes.count("prefetch"), 2)
+
+    def test_captured_prefetch_records_go_with_the_next_request(self):
+        # As in the mutation daemon, which captures each request's records for its reply
+        ledger = get_cost_ledger()
+        ledger.reset()
+        generate = ChildGenerator()
+        with ledger.capture() as first:
+            self.memo.get(self.key, PARENT, generate)
+            self.memo.get(self.key, PARENT, generate)
+        self.drain()
+        with ledger.capture() as second:
+            self.memo.get(self.key, PARENT, generate)
+        self.assertEqual(first, [])
+        self.assertEqual([r["outcome"] for r in second], ["prefetch", "prefetch"])
+        self.assertEqual(ledger.pending, [])
+
+    def test_distinct_keys_do_not_share_children(self):
+        other = MutationMemo.make_key(PARENT, "other pseudocode", False, "groq")
+        generate = ChildGenerator()
+        self.memo.get(self.key, PARENT, generate)
+        self.memo.get(self.key, PARENT, generate)
+        self.drain()
+        calls = generate.calls
+        self.memo.get(other, PARENT, generate)
+        self.assertEqual(generate.calls, calls + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
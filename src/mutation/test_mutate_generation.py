@@ -0,0 +1,51 @@
+import json
+import unittest
+from unittest import mock
+
+from src.mutation import mutate_code
+from src.mutation.memo import MutationMemo
+from src.mutation.pipeline import MutationPipeline
+
+
+class TestMutateGeneration(unittest.TestCase):
+    def test_children_are_mutated_and_logged_in_one_call(self):
+        parents = [["fd 1", [], "fd 1", 2.0, 100, "move"], ["rt 5", [], "rt 5", 1.0, 100, "turn"]]
+        tables = {"mutated agents": {}, "killed agents": {},
+                  "new agents": {"agent 7": {"id": 7, "rule": "fd 1"}, "agent 8": {"id": 8, "rule": "rt 5"}}}
+        sim_logger = mock.Mock()
+        with mock.patch.object(mutate_code, "mutate_batch", return_value=[("fd 2", "move more"), ("rt 5", "turn")]), \
+                mock.patch("src.utils.sim_logger.get_logger", return_value=sim_logger):
+            results = mutate_code.mutate_generation(parents, [7.0, 8.0], "local-sim", False,
+                                                    [[["generation", 1]], json.dumps(tables)])
+
+        self.assertEqual(results, [["fd 2", "move more"], ["rt 5", "turn"]])
+        (logged,), _ = sim_logger.log_generation.call_args
+        self.assertEqual(logged[0], {"generation": 1})
+        self.assertEqual(logged[1]["new agents"]["agent 7"], {"id": 7, "rule": "fd 2", "pseudocode": "move more"})
+
+    def test_logging_is_skipped_without_log_data(self):
+        with mock.patch.object(mutate_code, "mutate_batch", return_value=[("fd 2", "")]), \
+                mock.patch("src.utils.sim_logger.get_logger") as get_sim_logger:
+            self.assertEqual(mutate_code.mutate_generation([["fd 1", []]], [3], "local-sim", False, []), [["fd 2", ""]])
+        get_sim_logger.assert_not_called()
+
+
+class TestBatchMemo(unittest.TestCase):
+    def test_pooled_parents_skip_the_pipeline(self):
+        memo = MutationMemo(enabled=True)
+        provider = mutate_code.get_graph_provider("local-sim")
+        parents = [["fd 1", [], "fd 1", 2.0, 100, "move"], ["rt 5", [], "rt 5", 1.0, 100, "turn"]]
+        with mock.patch.object(mutate_code, "get_mutation_memo", return_value=memo):
+            key = mutate_code.memo_key(provider, parents[0], "move", False, "local-sim")
+            memo._entry(key).pool.append(("fd 3", "move"))
+            run = lambda pipeline, infos, *args, **kwargs: [(info[0] + " lt 1", info[5]) for info in infos]
+            with mock.patch.object(MutationPipeline, "run", autospec=True, side_effect=run) as pipeline_run:
+                results = mutate_code.mutate_batch(parents, "local-sim", False)
+
+        self.assertEqual(results, [("fd 3", "move"), ("rt 5 lt 1", "turn")])
+        self.assertEqual(pipeline_run.call_args[0][1], [parents[1]])
+        self.assertEqual(memo.metrics()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from src.mutation.pipeline import SKIP_EVOLUTION, MutationPipeline
+from src.utils.cost_ledger import get_cost_ledger, record_event
+
+STAGE_SECONDS = 0.05
+
+
+def parents(n):
+    return [[f"fd {i}", "", "", None, 0, f"pseudocode {i}"] for i in range(n)]
+
+
+class TestMutationPipeline(unittest.TestCase):
+    def setUp(self):
+        get_cost_ledger().reset()
+
+    def test_results_keep_input_order(self):
+        def evolve(agent_info):
+            time.sleep(STAGE_SECONDS * (int(agent_info[0].split()[1]) % 3) / 3)
+            return agent_info[5] + " evolved"
+
+        results = MutationPipeline(pseudocode_workers=3, code_workers=3).run(
+            parents(6), evolve, lambda agent_info, pseudocode: (agent_info[0] + " rt 1", pseudocode))
+        self.assertEqual(results, [(f"fd {i} rt 1", f"pseudocode {i} evolved") for i in range(6)])
+
+    def test_stages_overlap(self):
+        def evolve(agent_info):
+            time.sleep(STAGE_SECONDS)
+            return agent_info[5]
+
+        def generate(agent_info, pseudocode):
+            time.sleep(STAGE_SECONDS)
+            return agent_info[0], pseudocode
+
+        start = time.monotonic()
+        MutationPipeline(pseudocode_workers=1, code_workers=1).run(parents(6), evolve, generate)
+        # Sequential would take 12 stage durations; pipelined takes about 7
+        self.assertLess(time.monotonic() - start, 10 * STAGE_SECONDS)
+
+    def test_bounded_queue_limits_work_ahead(self):
+        evolved, in_flight = [], []
+        lock = threading.Lock()
+
+        def evolve(agent_info):
+            with lock:
+                evolved.append(agent_info[0])
+            return agent_info[5]
+
+        def generate(agent_info, pseudocode):
+            time.sleep(STAGE_SECONDS / 5)
+            with lock:
+                in_flight.append(len(evolved) - len(in_flight))
+            return agent_info[0], pseudocode
+
+        MutationPipeline(pseudocode_workers=1, code_workers=1, queue_size=2).run(parents(8), evolve, generate)
+        # Queue, the item being evolved and the item being generated
+        self.assertLessEqual(max(in_flight), 2 + 2)
+
+    def test_failed_stage_one_is_marked_for_stage_two(self):
+        def evolve(agent_info):
+            if agent_info[0] == "fd 1":
+                raise RuntimeError("provider down")
+            return None if agent_info[0] == "fd 2" else agent_info[5]
+
+        received = {}
+
+        def generate(agent_info, pseudocode):
+            received[agent_info[0]] = pseudocode
+            return agent_info[0], agent_info[5]
+
+        MutationPipeline(pseudocode_workers=1, code_workers=1).run(parents(3), evolve, generate)
+        self.assertEqual(received, {"fd 0": "pseudocode 0", "fd 1": SKIP_EVOLUTION, "fd 2": SKIP_EVOLUTION})
+        received.clear()
+        MutationPipeline().run(parents(2), None, generate)
+        self.assertEqual(received, {"fd 0": None, "fd 1": None})
+
+    def test_graph_does_not_evolve_again_after_a_failed_stage_one(self):
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        from src.graph_providers.unified_provider import GraphUnifiedProvider
+        from src.netlogo_code_generator.graph import NetLogoCodeGenerator
+        from src.verification.verify_netlogo import NetLogoVerifier
+
+        provider = GraphUnifiedProvider("local-sim", NetLogoVerifier())
+        provider.model = FakeListChatModel(responses=["```netlogo\nfd 2\n```"])
+        generator = NetLogoCodeGenerator(provider, NetLogoVerifier())
+        with mock.patch("src.netlogo_code_generator.nodes.TextBasedEvolution") as evolution:
+            code, _ = generator.generate_code(["fd 1", []], "move", True, None, skip_evolution=True)
+        self.assertEqual(code, "fd 2")
+        evolution.assert_not_called()
+
+    def test_failures_return_parent_and_each_mutation_is_one_ledger_record(self):
+        def evolve(agent_info):
+            record_event("llm_calls")
+            if agent_info[0] == "fd 1":
+                raise RuntimeError("pseudocode failed")
+            return agent_info[5]
+
+        def generate(agent_info, pseudocode):
+            record_event("llm_calls")
+            if agent_info[0] == "fd 2":
+                raise RuntimeError("code failed")
+            return agent_info[0] + " rt 1", pseudocode
+
+        results = MutationPipeline().run(parents(3), evolve, generate, provider="groq")
+        self.assertEqual(results, [("fd 0 rt 1", "pseudocode 0"), ("fd 1 rt 1", SKIP_EVOLUTION),
+                                   ("fd 2", "pseudocode 2")])
+        records = get_cost_ledger().pending
+        self.assertEqual(len(records), 3)
+        self.assertEqual(sum(r["llm_calls"] for r in records), 6)
+        self.assertEqual([r["outcome"] for r in records].count("error"), 1)
+
+    def test_without_pseudocode_stage(self):
+        results = MutationPipeline().run(parents(2), None, lambda agent_info, pseudocode: (agent_info[0], pseudocode))
+        self.assertEqual(results, [("fd 0", None), ("fd 1", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.mutation import translation_cache
+from src.mutation.translation_cache import TranslationCache
+from src.netlogo_code_generator.nodes import generate_code, verify_code
+from src.netlogo_code_generator.state import initial_state
+from src.verification.verify_netlogo import NetLogoVerifier
+
+PSEUDOCODE = "Move forward one step,\nthen turn right."
+
+
+def state(pseudocode, code="rt 10"):
+    return dict(initial_state(["rt 10", []], use_text_evolution=True, modified_pseudocode=pseudocode,
+                              provider="local-sim"), current_code=code)
+
+
+class TestTranslationCache(unittest.TestCase):
+    def test_normalised_pseudocode_hits(self):
+        cache = TranslationCache(enabled=True)
+        cache.put(PSEUDOCODE, "simple", "fd 1 rt 90")
+        self.assertEqual(cache.get("move forward one step, then  turn right.", "simple"), "fd 1 rt 90")
+        self.assertIsNone(cache.get(PSEUDOCODE, "complex"))
+        self.assertEqual(cache.metrics()["hits"], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TranslationCache(enabled=True, max_entries=2)
+        cache.put("a", "simple", "fd 1")
+        cache.put("b", "simple", "fd 2")
+        cache.get("a", "simple")
+        cache.put("c", "simple", "fd 3")
+        self.assertIsNone(cache.get("b", "simple"))
+        self.assertEqual(cache.get("a", "simple"), "fd 1")
+        self.assertEqual(cache.metrics()["evicted"], 1)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = TranslationCache()
+        cache.put(PSEUDOCODE, "simple", "fd 1")
+        self.assertIsNone(cache.get(PSEUDOCODE, "simple"))
+
+
+class TestTranslationCacheNodes(unittest.TestCase):
+    def setUp(self):
+        translation_cache._translation_cache = TranslationCache(enabled=True)
+        self.provider = GraphUnifiedProvider("local-sim", NetLogoVerifier())
+
+    def tearDown(self):
+        translation_cache._translation_cache = None
+
+    def test_verified_translation_skips_the_second_call(self):
+        verified = verify_code(state(PSEUDOCODE, "fd 1 rt 90"), NetLogoVerifier(), self.provider.evolution_strategy)
+        self.assertIsNone(verified["error_message"])
+
+        self.provider.model = FakeListChatModel(responses=["```netlogo\nfd 5\n```"])
+        self.assertEqual(generate_code(state(PSEUDOCODE), self.provider)["current_code"], "fd 1 rt 90")
+        self.assertEqual(generate_code(state("Turn left."), self.provider)["current_code"], "fd 5")
+
+    def test_failed_verification_is_not_cached(self):
+        verify_code(state(PSEUDOCODE, "fd [ 1"), NetLogoVerifier(), self.provider.evolution_strategy)
+        self.assertIsNone(translation_cache.get_translation_cache().get(PSEUDOCODE, self.provider.evolution_strategy))
+
+
+if __name__ == "__main__":
+    unittest.main()
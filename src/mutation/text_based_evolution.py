@@ -4,11 +4,11 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 import logging
-import re
 import gin
 
 from src.utils.storeprompts import prompts
 from src.graph_providers.base import GraphProviderBase
+from src.utils.code_extraction import extract_text_block
 
 
 # Removed unused EnvironmentContext dataclass
@@ -73,15 +73,14 @@ class TextBasedEvolution:
                 ("user", user_prompt)
             ])
                         
-            chain = prompt | self.provider.initialize_model() | StrOutputParser()
-            pseudocode_response = chain.invoke({"input": ""})
+            model_name, model = self.provider.routed_model()
+            chain = prompt | model | StrOutputParser()
+            pseudocode_response = self.provider.invoke_chain(chain, {"input": ""}, len(user_prompt) // 4, model_name)
             
             if pseudocode_response:
-                # Parse the response to extract the pseudocode
-                match = re.search(r'```(.*?)```', pseudocode_response, re.DOTALL)
-                if match:
-                    pseudocode_response = match.group(1).strip()
-                else:
+                # Parse the response to extract the pseudocode (last fenced block, or the unfenced text)
+                pseudocode_response = extract_text_block(pseudocode_response)
+                if not pseudocode_response:
                     self.logger.warning("No pseudocode found in response, using current text.")
                     return current_text
             
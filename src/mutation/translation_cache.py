@@ -0,0 +1,90 @@
+"""
+Cache of verified pseudocode-to-code translations for text-based evolution.
+
+With text evolution the second LLM call only translates the evolved pseudocode into
+NetLogo (`evolution_strategies.<strategy>.code_prompt`). The same pseudocode comes back
+often: retries keep it unchanged, verify_code copies it into initial_pseudocode, and
+repeatedly selected parents carry the same text. TranslationCache maps (normalised
+pseudocode, evolution strategy) to the last verified code for it, so the translation
+request is skipped once a pseudocode has been translated successfully.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import gin
+
+from src.utils.cost_ledger import record_event
+from src.utils.logging import get_logger
+
+
+def normalize_pseudocode(pseudocode: str) -> str:
+    """Collapse whitespace and case so trivially different texts share an entry."""
+    return " ".join((pseudocode or "").split()).lower()
+
+
+@gin.configurable
+class TranslationCache:
+    """
+    LRU cache from (pseudocode, evolution strategy) to verified NetLogo code.
+    """
+
+    def __init__(self, enabled: bool = False, max_entries: int = 500):
+        """
+        Args:
+            enabled: Whether translations are cached at all
+            max_entries: Translations kept before the least recently used is evicted
+        """
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.logger = get_logger()
+        self.stats = {"lookups": 0, "hits": 0, "stored": 0, "evicted": 0}
+
+    def get(self, pseudocode: str, evolution_strategy: str) -> Optional[str]:
+        """Return verified code for the pseudocode, or None if it was never translated."""
+        if not self.enabled or not pseudocode:
+            return None
+        key = (normalize_pseudocode(pseudocode), evolution_strategy)
+        with self.lock:
+            self.stats["lookups"] += 1
+            code = self.entries.get(key)
+            if code is None:
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+        record_event("translation_hits")
+        self.logger.info("Reusing the cached translation of this pseudocode")
+        return code
+
+    def put(self, pseudocode: str, evolution_strategy: str, code: str) -> None:
+        """Remember verified code as the translation of the pseudocode."""
+        if not self.enabled or not pseudocode or not code:
+            return
+        key = (normalize_pseudocode(pseudocode), evolution_strategy)
+        with self.lock:
+            if self.entries.get(key) != code:
+                self.stats["stored"] += 1
+            self.entries[key] = code
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evicted"] += 1
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {**self.stats, "entries": len(self.entries)}
+
+
+_translation_cache: Optional[TranslationCache] = None
+_translation_cache_lock = threading.Lock()
+
+
+def get_translation_cache() -> TranslationCache:
+    """Return the process-wide translation cache, creating it (from gin) on first use."""
+    global _translation_cache
+    with _translation_cache_lock:
+        if _translation_cache is None:
+            _translation_cache = TranslationCache()
+        return _translation_cache
@@ -2,59 +2,85 @@
 Main graph implementation for NetLogo code generation.
 """
 
-from typing import List
-from langgraph.graph import StateGraph, END, START
+from typing import List, Optional, TYPE_CHECKING
+import gin
 
 from src.generators.base import BaseCodeGenerator
 from src.verification.verify_netlogo import NetLogoVerifier
 from src.utils.logging import get_logger
+from src.utils.tracing import get_tracer, traced_node
+from src.utils.cost_ledger import record_event
 from src.graph_providers.base import GraphProviderBase
-from src.netlogo_code_generator.state import GenerationState
+from src.mutation.translation_cache import get_translation_cache
+from src.netlogo_code_generator.state import GenerationState, initial_state
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
 from src.netlogo_code_generator.nodes import (
     evolve_pseudocode,
     generate_code,
+    generate_candidates,
     verify_code,
     should_retry)
 
+@gin.configurable
 class NetLogoCodeGenerator(BaseCodeGenerator):
     """
     NetLogo code generator using LangGraph for structured generation flow.
     """
     
-    def __init__(self, provider: GraphProviderBase, verifier: NetLogoVerifier):
+    def __init__(self, provider: GraphProviderBase, verifier: NetLogoVerifier,
+                 num_candidates: int = 1, candidate_selection: str = "first"):
         """
         Initialize with graph provider and verifier.
         
         Args:
             provider: GraphProviderBase implementation
             verifier: NetLogoVerifier instance for code validation
+            num_candidates: Candidates generated per attempt; above 1 they are requested
+                            in parallel and the best valid one is kept
+            candidate_selection: Rule for picking among valid candidates
+                                 ("first", "shortest" or "complexity")
         """
         super().__init__(verifier)
         self.provider = provider
+        self.num_candidates = num_candidates
+        self.candidate_selection = candidate_selection
         self.logger = get_logger()
         
-    def _build_graph(self) -> StateGraph:
+    def _build_graph(self) -> "StateGraph":
         """
         Build and return the LangGraph for code generation.
         
         Returns:
             Compiled StateGraph for code generation
         """
+        # LangGraph is imported here so importing this module stays cheap
+        from langgraph.graph import StateGraph, END
+
         # Create the graph
         workflow = StateGraph(GenerationState)
         
         # Add nodes with bound parameters
         workflow.add_node(
             "evolve_pseudocode", 
-            lambda state: evolve_pseudocode(state, self.provider)
-        )
-        workflow.add_node(
-            "generate_code", 
-            lambda state: generate_code(state, self.provider)
+            traced_node("evolve_pseudocode", lambda state: evolve_pseudocode(state, self.provider))
         )
+        if self.num_candidates > 1:
+            workflow.add_node(
+                "generate_code",
+                traced_node("generate_candidates",
+                            lambda state: generate_candidates(state, self.provider, self.verifier,
+                                                              self.num_candidates, self.candidate_selection))
+            )
+        else:
+            workflow.add_node(
+                "generate_code", 
+                traced_node("generate_code", lambda state: generate_code(state, self.provider))
+            )
         workflow.add_node(
             "verify_code", 
-            lambda state: verify_code(state, self.verifier)
+            traced_node("verify_code", lambda state: verify_code(state, self.verifier,
+                                                                 getattr(self.provider, "evolution_strategy", None)))
         )
         
         # Define edges
@@ -62,14 +88,66 @@ class NetLogoCodeGenerator(BaseCodeGenerator):
         workflow.add_edge("evolve_pseudocode", "generate_code")
         workflow.add_edge("generate_code", "verify_code")
         
-        workflow.add_conditional_edges("verify_code", should_retry, {"retry": "generate_code", "end": END})
+        max_attempts = getattr(self.provider, "retry_max_attempts", None)
+        workflow.add_conditional_edges("verify_code", lambda state: should_retry(state, max_attempts),
+                                       {"retry": "generate_code", "end": END})
                 
         workflow.set_entry_point("evolve_pseudocode")
         
         self.logger.info("Compiling the graph...")
         return workflow.compile()
         
-    def generate_code(self, agent_info: List, initial_pseudocode: str, use_text_evolution: bool = False) -> tuple:
+    def _initial_state(self, agent_info: List, initial_pseudocode: str, use_text_evolution: bool,
+                       modified_pseudocode: Optional[str], skip_evolution: bool = False) -> dict:
+        return initial_state(agent_info, initial_pseudocode, use_text_evolution, modified_pseudocode,
+                             skip_evolution, getattr(self.provider, "model_name", "default"))
+
+    def generate_code_batch(self, agent_infos: List[List], initial_pseudocodes: List[str],
+                            use_text_evolution: bool = False,
+                            modified_pseudocodes: Optional[List[Optional[str]]] = None) -> List[tuple]:
+        """
+        Generate code for several parents with batched requests (several children per
+        request), bypassing the per-mutation graph. Each child is verified and retried on
+        its own by the provider.
+
+        Args:
+            agent_infos: agent_info list per parent
+            initial_pseudocodes: Current pseudocode per parent
+            use_text_evolution: Whether text-based evolution is used
+            modified_pseudocodes: Pseudocode already evolved per parent, if any
+
+        Returns:
+            (generated_code, text) per parent; a failed child returns its parent's code and text
+        """
+        modified_pseudocodes = modified_pseudocodes or [None] * len(agent_infos)
+        results = [(agent_info[0], text) for agent_info, text in zip(agent_infos, initial_pseudocodes)]
+        valid = [i for i, agent_info in enumerate(agent_infos) if self.validate_input(agent_info)[0]]
+        states = [self._initial_state(agent_infos[i], initial_pseudocodes[i], use_text_evolution,
+                                      modified_pseudocodes[i]) for i in valid]
+        if not states:
+            return results
+
+        # Children whose pseudocode was translated before need no request
+        cache = get_translation_cache()
+        strategy = getattr(self.provider, "evolution_strategy", None)
+        codes = [cache.get(state["modified_pseudocode"], strategy) if use_text_evolution else None for state in states]
+        requested = [j for j, code in enumerate(codes) if code is None]
+        if requested:
+            with get_tracer().span("mutation.batch", **{"lear.provider": getattr(self.provider, "model_name", ""),
+                                                        "lear.batch_size": len(requested)}):
+                generated = self.provider.generate_batch_from_states([states[j] for j in requested],
+                                                                     getattr(self.provider, "retry_max_attempts", None))
+            for j, code in zip(requested, generated):
+                codes[j] = code
+                if use_text_evolution and code != states[j]["original_code"]:
+                    cache.put(states[j]["modified_pseudocode"], strategy, code)
+        for i, state, code in zip(valid, states, codes):
+            if code != state["original_code"]:
+                results[i] = (code, state["modified_pseudocode"] or state["initial_pseudocode"])
+        return results
+
+    def generate_code(self, agent_info: List, initial_pseudocode: str, use_text_evolution: bool = False,
+                      modified_pseudocode: Optional[str] = None, skip_evolution: bool = False) -> tuple:
         """
         Generate code using LangGraph with the same interface as existing generators.
 
@@ -77,6 +155,10 @@ class NetLogoCodeGenerator(BaseCodeGenerator):
             agent_info: List containing agent state and environment information
             initial_pseudocode: Initial pseudocode or text to guide the code generation
             use_text_evolution: Whether to use text-based evolution approach
+            modified_pseudocode: Pseudocode already evolved by an earlier stage (see
+                                 MutationPipeline); evolve_pseudocode is then skipped
+            skip_evolution: Skip evolve_pseudocode without evolved pseudocode (an earlier
+                            stage already tried and failed); code is generated from the rule
 
         Returns:
             Tuple of (generated_code, text) where generated_code is the NetLogo code
@@ -98,16 +180,8 @@ class NetLogoCodeGenerator(BaseCodeGenerator):
 
         # Initial state
         self.logger.info("Creating initial state")
-        initial_state = {
-            "original_code": agent_info[0],
-            "current_code": agent_info[0],
-            "agent_info": agent_info,
-            "error_message": None,
-            "retry_count": 0,
-            "use_text_evolution": use_text_evolution,
-            "modified_pseudocode": None,
-            "initial_pseudocode": initial_pseudocode
-        }
+        initial_state = self._initial_state(agent_info, initial_pseudocode, use_text_evolution, modified_pseudocode,
+                                            skip_evolution)
 
         # Build and compile the graph
         self.logger.info("Building and compiling the graph")
@@ -115,8 +189,14 @@ class NetLogoCodeGenerator(BaseCodeGenerator):
 
         # Run the graph
         self.logger.info("Invoking the graph with initial state")
-        final_state = app.invoke(initial_state)
+        with get_tracer().span("mutation", **{"lear.provider": getattr(self.provider, "model_name", ""),
+                                              "lear.use_text_evolution": use_text_evolution,
+                                              "lear.original_code_chars": len(agent_info[0])}) as span:
+            final_state = app.invoke(initial_state)
+            span.set_attributes({"lear.retries": final_state["retry_count"],
+                                 "lear.outcome": "error" if final_state["error_message"] else "ok"})
         self.logger.info(f"Graph execution complete, error_message: {final_state['error_message']}, retry_count: {final_state['retry_count']}")
+        record_event("retries", final_state["retry_count"])
 
         # Return the result or original code if failed
         if final_state["error_message"] is None:
@@ -124,6 +204,11 @@ class NetLogoCodeGenerator(BaseCodeGenerator):
             # Get the final text - either the modified pseudocode or the initial one if no modification was done
             final_text = final_state.get("modified_pseudocode", initial_pseudocode) or initial_pseudocode
             return (final_state["current_code"], final_text)
+        elif final_state.get("best_verified"):
+            # The retries ended without improving on verified code a cheaper cascade tier produced
+            self.logger.info("Higher cascade tiers did not verify, returning the best verified code")
+            return final_state["best_verified"]
         else:
             self.logger.error(f"Code generation failed with error: {final_state['error_message']}, returning original code and text")
+            record_event("failures")
             return (agent_info[0], initial_pseudocode)
@@ -3,13 +3,21 @@ Node implementations for the NetLogo code generation graph.
 """
 
 import logging
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 
 from src.netlogo_code_generator.state import GenerationState
 from src.mutation.text_based_evolution import TextBasedEvolution
 from src.graph_providers.base import GraphProviderBase
 from src.verification.verify_netlogo import NetLogoVerifier
 from src.utils.logging import get_logger
+from src.utils.tracing import current_span
+from src.utils.retry import RetryPolicy, classify_error, get_retry_policy
+from src.graph_providers.hedging import get_latency_histogram
+from src.utils.deadline import expired, record_verified
+from src.mutation.translation_cache import get_translation_cache
+from src.graph_providers.cascade import get_model_cascade
+from src.graph_providers.retry_conversation import capture_prompts
 
 # Get the global logger instance
 logger = get_logger()
@@ -44,6 +52,14 @@ def evolve_pseudocode(
         logger.info("Text evolution disabled, skipping pseudocode generation")
         return state
 
+    if state.get("modified_pseudocode"):
+        logger.info("Pseudocode already evolved by an earlier pipeline stage, skipping pseudocode generation")
+        return state
+
+    if state.get("skip_evolution"):
+        logger.info("Pseudocode evolution failed in an earlier pipeline stage, generating code from the rule")
+        return state
+
     logger.info("Text evolution enabled, generating pseudocode")
     text_evolution = TextBasedEvolution(provider)
     modified_pseudocode = text_evolution.generate_pseudocode( 
@@ -76,6 +92,7 @@ def generate_code(
     retry_count = state.get('retry_count', 0)
     error_msg = state.get('error_message', None)
     logger.info(f"NODE: generate_code - retry_count: {retry_count}, error_message: {error_msg}")
+    updates = {}
     
     try:
         # Check if we have both modified_pseudocode and error_message for retry scenario
@@ -88,8 +105,31 @@ def generate_code(
         else:
              logger.info("Generating code based on initial state (no pseudocode modification or error)")
 
-        # Call the provider using the new state-based interface
-        new_code = provider.generate_code_from_state(state)
+        # A pseudocode that was translated and verified before needs no new translation
+        cached = None
+        if state.get("use_text_evolution") and state.get("modified_pseudocode"):
+            cached = get_translation_cache().get(state["modified_pseudocode"], provider.evolution_strategy)
+
+        # Line edits for long rules, then structured output (no extraction needed), then free text
+        with capture_prompts() as sent:
+            edited = provider.generate_edit_from_state(state) if cached is None else None
+            structured = provider.generate_structured_from_state(state) if cached is None and edited is None else None
+            if cached is not None:
+                new_code = cached
+            elif edited is not None:
+                new_code = edited
+            elif structured is not None:
+                new_code = structured.new_code
+                # Opt-in: keep the agent's text in step with the code the model actually wrote
+                if (structured.pseudocode and state.get("use_text_evolution")
+                        and getattr(provider, "structured_pseudocode", False)):
+                    updates["modified_pseudocode"] = structured.pseudocode
+            else:
+                # Call the provider using the new state-based interface
+                new_code = provider.generate_code_from_state(state)
+        if sent and not state.get("error_message"):
+            # The first attempt's prompt, replayed as is by conversational retries
+            updates["first_messages"] = sent[-1]
 
     except Exception as e:
         logger.error(f"Error generating code: {str(e)}")
@@ -97,11 +137,68 @@ def generate_code(
     
     code_sample = new_code
     logger.info(f"Generated new code (sample): {code_sample}")
+    return {**state, **updates, "current_code": new_code}
+
+def generate_candidates(
+    state: GenerationState,
+    provider: GraphProviderBase,
+    verifier: NetLogoVerifier,
+    num_candidates: int,
+    selection: str = "first"
+) -> GenerationState:
+    """
+    Generate several candidates for the same state and keep the best valid one.
+
+    Args:
+        state: Current generation state
+        provider: Model provider for code generation
+        verifier: NetLogo verifier used to screen the candidates
+        num_candidates: Number of candidates to request
+        selection: Rule for choosing among valid candidates: "first" (first to arrive),
+                   "shortest" or "complexity" (lowest measured complexity)
+
+    Returns:
+        Updated generation state with the selected code
+    """
+    retry_count = state.get('retry_count', 0)
+    logger.info(f"NODE: generate_candidates - retry_count: {retry_count}, num_candidates: {num_candidates}, selection: {selection}")
+
+    original_code = state["original_code"].strip()
+    candidates = []
+    valid = []
+    try:
+        for code in provider.generate_candidates_from_state(state, num_candidates):
+            candidates.append(code)
+            is_safe, _ = verifier.is_safe(code)
+            # A candidate equal to the parent is the provider's fallback, not a mutation
+            if is_safe and code.strip() != original_code:
+                valid.append(code)
+                if selection == "first":
+                    break
+    except Exception as e:
+        logger.error(f"Error generating candidates: {str(e)}")
+
+    logger.info(f"Received {len(candidates)} candidates, {len(valid)} valid")
+    if valid:
+        if selection == "shortest":
+            new_code = min(valid, key=len)
+        elif selection == "complexity":
+            new_code = min(valid, key=lambda code: verifier.measure_complexity(code).value)
+        else:
+            new_code = valid[0]
+    elif candidates:
+        # Let verify_code report the first candidate's error so the retry prompt can use it
+        new_code = candidates[0]
+    else:
+        new_code = state["current_code"]
+
+    logger.info(f"Selected candidate: {new_code}")
     return {**state, "current_code": new_code}
 
 def verify_code(
     state: GenerationState, 
-    verifier: NetLogoVerifier
+    verifier: NetLogoVerifier,
+    evolution_strategy: Optional[str] = None
 ) -> GenerationState:
     """
     Verify the generated code.
@@ -109,6 +206,8 @@ def verify_code(
     Args:
         state: Current generation state
         verifier: NetLogo verifier for code validation
+        evolution_strategy: Text evolution strategy of the provider; verified translations
+                            of the modified pseudocode are cached under it
         
     Returns:
         Updated generation state with verification results
@@ -116,18 +215,43 @@ def verify_code(
     logger.info(f"NODE: verify_code - current retry count: {state.get('retry_count', 0)}")
     
     is_safe, error_message = verifier.is_safe(state["current_code"])
+    text = state.get("modified_pseudocode") or state.get("initial_pseudocode", "")
+    best_verified = state.get("best_verified")
+    cascade = get_model_cascade()
+    if cascade.enabled:
+        # Verified but low-quality code from a cheaper tier is retried on the next tier. It is
+        # kept, and returned instead of the parent if the retries end (limit, retry policy
+        # or deadline) before a higher tier verifies.
+        issue = cascade.review(state.get("retry_count", 0), state["current_code"], state["original_code"],
+                               is_safe, verifier)
+        if issue:
+            is_safe, error_message = False, issue
+            best_verified = (state["current_code"], text)
+            record_verified(*best_verified)
     error_msg_sample = error_message if error_message else None
+    if state.get("error_message"):
+        # This attempt was a retry: record whether it fixed the previous error
+        get_retry_policy().record_outcome(state.get("provider", "default"),
+                                          classify_error(state["error_message"]), is_safe)
     logger.info(f"Verification result: is_safe={is_safe}, error_message={error_msg_sample}")
+    span = current_span()
+    if span is not None:
+        span.set_attributes({"lear.outcome": "ok" if is_safe else "error",
+                             "lear.code_chars": len(state["current_code"])})
+        if not is_safe:
+            span.set_attribute("lear.error_message", error_message[:200])
     
     result = {
         **state, 
-        "error_message": None if is_safe else error_message
+        "error_message": None if is_safe else error_message,
+        "best_verified": best_verified
     }
     
     # If verification failed, increment retry count and update initial_pseudocode
     if result["error_message"]:
         logger.info(f"Verification failed with error: {error_msg_sample}, incrementing retry count")
         result["retry_count"] = state["retry_count"] + 1
+        result["failed_attempts"] = state.get("failed_attempts", []) + [(state["current_code"], error_message)]
         
         # Update initial_pseudocode with modified_pseudocode if available
         if state.get("modified_pseudocode"):
@@ -137,22 +261,51 @@ def verify_code(
             logger.info("Updating code with Error")
     else:
         logger.info("Verification successful")
+        # Returned instead of the parent if the mutation's deadline passes before it ends
+        record_verified(state["current_code"], text)
+        if state.get("use_text_evolution") and evolution_strategy is not None:
+            get_translation_cache().put(state.get("modified_pseudocode"), evolution_strategy, state["current_code"])
     
     return result
 
-def should_retry(state: GenerationState, max_attempts: int = 5) -> str:
-    logger.info(f"Checking if should retry, retry_count: {state['retry_count']}, max_attempts: {max_attempts}, error_message: {state['error_message']}")
+def should_retry(state: GenerationState, max_attempts: Optional[int] = None,
+                 policy: Optional[RetryPolicy] = None) -> str:
     """
     Determine if code generation should be retried.
-    
+
+    The decision is delegated to the RetryPolicy, which also stops early when a retry
+    for this error class and provider is unlikely to succeed within the latency budget.
+
     Args:
         state: Current generation state
-        max_attempts: Maximum number of retry attempts
-        
+        max_attempts: Maximum number of retries after the first attempt (defaults to
+                      RetryPolicy.max_attempts)
+        policy: Retry policy (defaults to the shared policy)
+
     Returns:
         "retry" if should retry, "end" otherwise
     """
-    should_retry_value = "retry" if state["error_message"] and state["retry_count"] < max_attempts else "end"
-    logger.info(f"Should retry decision: {should_retry_value}")
-    return should_retry_value
+    if state["error_message"] and expired():
+        logger.info("Should retry decision: end (mutation deadline passed)")
+        span = current_span()
+        if span is not None:
+            span.set_attribute("lear.retry_decision", "mutation deadline passed")
+        return "end"
 
+    policy = policy or get_retry_policy()
+    provider = state.get("provider", "default")
+    started_at = state.get("started_at")
+    elapsed = time.monotonic() - started_at if started_at is not None else 0.0
+    attempt_latency = get_latency_histogram(provider).percentile(50) if policy.latency_budget else None
+
+    # retry_count counts failed attempts, the first one included
+    retries = max(0, state["retry_count"] - 1)
+    retry, reason = policy.should_retry(provider, state["error_message"], retries,
+                                        elapsed=elapsed, attempt_latency=attempt_latency,
+                                        max_attempts=max_attempts)
+    should_retry_value = "retry" if retry else "end"
+    logger.info(f"Should retry decision: {should_retry_value} ({reason}), retry_count: {state['retry_count']}")
+    span = current_span()
+    if span is not None:
+        span.set_attribute("lear.retry_decision", reason)
+    return should_retry_value
@@ -2,7 +2,8 @@
 State definitions for the NetLogo code generation graph.
 """
 
-from typing import Optional, List, TypedDict
+import time
+from typing import Optional, List, Tuple, TypedDict
 
 class GenerationState(TypedDict):
     """
@@ -17,6 +18,13 @@ class GenerationState(TypedDict):
         use_text_evolution: Whether to use text-based evolution
         modified_pseudocode: Optional modified pseudocode for code generation
         initial_pseudocode: Initial pseudocode provided as input
+        skip_evolution: Whether evolve_pseudocode is skipped (an earlier stage failed to evolve)
+        provider: Name of the provider generating the code (for retry statistics)
+        started_at: time.monotonic() when the mutation started (for the latency budget)
+        failed_attempts: (code, error_message) per failed attempt, replayed by conversational retries
+        first_messages: Formatted messages of the first attempt's prompt, replayed by conversational retries
+        best_verified: (code, text) of verified code the model cascade sent to a higher tier;
+                       returned instead of the parent if no later attempt verifies
     """
     original_code: str
     current_code: str
@@ -26,4 +34,31 @@ class GenerationState(TypedDict):
     use_text_evolution: bool
     initial_pseudocode: str
     modified_pseudocode: Optional[str]
-    
+    skip_evolution: bool
+    provider: str
+    started_at: float
+    failed_attempts: List
+    first_messages: Optional[List]
+    best_verified: Optional[Tuple[str, str]]
+
+
+def initial_state(agent_info: List, initial_pseudocode: str = "", use_text_evolution: bool = False,
+                  modified_pseudocode: Optional[str] = None, skip_evolution: bool = False,
+                  provider: str = "default") -> GenerationState:
+    """State a mutation of the parent in `agent_info` starts from, before any attempt."""
+    return {
+        "original_code": agent_info[0],
+        "current_code": agent_info[0],
+        "agent_info": agent_info,
+        "error_message": None,
+        "retry_count": 0,
+        "use_text_evolution": use_text_evolution,
+        "modified_pseudocode": modified_pseudocode,
+        "skip_evolution": skip_evolution,
+        "initial_pseudocode": initial_pseudocode,
+        "provider": provider,
+        "started_at": time.monotonic(),
+        "failed_attempts": [],
+        "first_messages": None,
+        "best_verified": None
+    }
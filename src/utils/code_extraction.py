@@ -0,0 +1,171 @@
+"""
+Extraction of NetLogo code from LLM responses.
+
+Responses often hold more than one code block (a draft, then the final rule), a block
+whose closing fence was cut off, or code with no fence at all. extract_code_candidates
+collects all of these and ranks them; select_code then verifies the candidates in rank
+order and returns the first that passes, so a usable rule anywhere in the response is
+not lost to a retry round trip.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+# A language tag only counts as one when it is alone on the fence line
+FENCED_BLOCK_PATTERN = re.compile(r"```[ \t]*(?:([\w+-]+)[ \t]*\n)?(.*?)```", re.DOTALL)
+INLINE_CODE_PATTERN = re.compile(r"(?<!`)`([^`\n]+)`(?!`)")
+NETLOGO_LANGUAGE_TAGS = {"netlogo", "nlogo", "logo"}
+# First words of a line that make it look like a NetLogo command rather than prose
+CODE_LINE_STARTERS = {"fd", "forward", "rt", "right", "lt", "left", "bk", "back", "if", "ifelse", "[", "]"}
+
+# Candidate sources, best first
+SOURCE_RANKS = {"netlogo_block": 0, "block": 1, "unterminated_block": 2, "unfenced": 3, "code_lines": 4, "inline": 5}
+
+
+# Sources that come from a fenced block
+FENCED_SOURCES = {"netlogo_block", "block", "unterminated_block"}
+
+
+@dataclass
+class CodeCandidate:
+    code: str
+    source: str       # Key of SOURCE_RANKS
+    position: int     # Offset of the candidate in the response
+
+
+@dataclass
+class ExtractionResult:
+    """
+    Attributes:
+        code: Selected code, or None if the response held no candidate
+        is_safe: Whether the selected code passed verification
+        message: Verifier message for the selected code
+        candidates: All ranked candidates that were considered
+    """
+    code: Optional[str]
+    is_safe: bool = False
+    message: str = ""
+    candidates: List[CodeCandidate] = field(default_factory=list)
+
+
+def _fenced_candidates(response: str) -> List[CodeCandidate]:
+    """Complete fenced blocks plus a trailing block whose closing fence is missing."""
+    candidates = []
+    end = 0
+    for match in FENCED_BLOCK_PATTERN.finditer(response):
+        language, body = (match.group(1) or "").lower(), match.group(2).strip()
+        end = match.end()
+        if body.lower().startswith("netlogo "):
+            language, body = "netlogo", body[len("netlogo "):].strip()
+        if body:
+            source = "netlogo_block" if language in NETLOGO_LANGUAGE_TAGS else "block"
+            candidates.append(CodeCandidate(body, source, match.start()))
+
+    opening = response.find("```", end)
+    if opening != -1:
+        tail = response[opening + 3:]
+        first_line, _, rest = tail.partition("\n")
+        tag = first_line.strip().lower()
+        is_language_tag = not tag or (re.fullmatch(r"[\w+-]+", tag) and tag not in CODE_LINE_STARTERS)
+        body = rest if is_language_tag else tail
+        if body.strip():
+            candidates.append(CodeCandidate(body.strip(), "unterminated_block", opening))
+    return candidates
+
+
+def _code_line_candidates(text: str, offset: int) -> List[CodeCandidate]:
+    """Runs of consecutive lines that start like NetLogo commands."""
+    candidates = []
+    run: List[str] = []
+    run_start = 0
+    position = offset
+    for line in text.splitlines(keepends=True):
+        words = line.strip().split()
+        if words and (words[0].lower() in CODE_LINE_STARTERS or words[0].startswith("[")):
+            if not run:
+                run_start = position
+            run.append(line.strip())
+        elif run:
+            candidates.append(CodeCandidate("\n".join(run), "code_lines", run_start))
+            run = []
+        position += len(line)
+    if run:
+        candidates.append(CodeCandidate("\n".join(run), "code_lines", run_start))
+    return candidates
+
+
+def extract_code_candidates(response: str) -> List[CodeCandidate]:
+    """
+    Collect every plausible code region of a response, best first.
+
+    Blocks tagged as NetLogo rank above untagged blocks, complete blocks above a block
+    cut off mid-response, and fenced code above unfenced regions. Within a rank, later
+    blocks come first since responses tend to end with the final version.
+
+    Args:
+        response: Raw response text
+
+    Returns:
+        Ranked, de-duplicated candidates
+    """
+    if not response or not response.strip():
+        return []
+
+    candidates = _fenced_candidates(response)
+    if not candidates:
+        stripped = response.strip()
+        candidates.append(CodeCandidate(stripped, "unfenced", 0))
+        candidates.extend(c for c in _code_line_candidates(response, 0) if c.code != stripped)
+        candidates.extend(CodeCandidate(m.group(1).strip(), "inline", m.start())
+                          for m in INLINE_CODE_PATTERN.finditer(response))
+
+    candidates.sort(key=lambda c: (SOURCE_RANKS[c.source], -c.position))
+    unique, seen = [], set()
+    for candidate in candidates:
+        if candidate.code and candidate.code not in seen:
+            seen.add(candidate.code)
+            unique.append(candidate)
+    return unique
+
+
+def select_code(response: str, verifier) -> ExtractionResult:
+    """
+    Return the highest-ranked candidate that passes the verifier.
+
+    If no candidate passes, the highest-ranked one is returned with its error, so that
+    the retry prompt can report it.
+
+    Args:
+        response: Raw response text
+        verifier: NetLogoVerifier used to check the candidates
+
+    Returns:
+        ExtractionResult describing the selected code
+    """
+    candidates = extract_code_candidates(response)
+    if not candidates:
+        return ExtractionResult(code=None, message="No code found in response")
+
+    results = verifier.is_safe_batch([c.code for c in candidates], stop_at_first_safe=True)
+    for candidate, (is_safe, message) in zip(candidates, results):
+        if is_safe:
+            return ExtractionResult(candidate.code, True, message, candidates)
+    is_safe, message = results[0]
+    return ExtractionResult(candidates[0].code, is_safe, message, candidates)
+
+
+def extract_text_block(response: str) -> Optional[str]:
+    """
+    Extract free text such as pseudocode: the last fenced block, or the whole response
+    when it has no fence.
+
+    Returns:
+        The extracted text, or None if the response is empty
+    """
+    candidates = [c for c in extract_code_candidates(response) if c.source in FENCED_SOURCES]
+    if candidates:
+        return candidates[0].code
+    text = response.strip() if response else ""
+    if text.startswith("```"):
+        text = text[3:].strip()
+    return text or None
@@ -8,34 +8,40 @@ import src.generators.base
 import src.graph_providers.base
 import src.graph_providers.unified_provider
 import src.netlogo_code_generator.nodes
+import src.netlogo_code_generator.graph
+import src.mutation.daemon
+import src.mutation.jobs
+import src.mutation.memo
+import src.mutation.pipeline
+import src.utils.deadline
+from src.graph_providers.unified_provider import API_KEY_ENV_VARS
 
 def load_config():
-    """Load environment variables from .env file and GIN configuration"""
+    """
+    Load environment variables from .env file and GIN configuration.
+
+    API keys are not required here: each provider checks its own key when it is
+    used (GraphUnifiedProvider.get_api_key), so local-sim runs need none.
+
+    Returns:
+        dict: The provider API key variables and their values (None when unset)
+    """
     load_dotenv()
-    
-    # Required environment variables
-    required_vars = {
-        'GROQ_API_KEY': os.getenv('GROQ_API_KEY'),
-        'ANTHROPIC_API_KEY': os.getenv('ANTHROPIC_API_KEY'),
-        'DEEPSEEK_API_KEY': os.getenv('DEEPSEEK_API_KEY'),
-    }
-    
-    # Check for missing variables
-    missing = [key for key, value in required_vars.items() if not value]
-    if missing:
-        raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
-    
+
+    api_keys = {name: os.getenv(name) for name in API_KEY_ENV_VARS.values()}
+
     # Load configurations from gin file
     current_dir = os.path.dirname(os.path.abspath(__file__))
     config_path = os.path.join(current_dir, "..", "config", "default.gin")
     gin.parse_config_file(config_path)
-        
-    return required_vars
+
+    return api_keys
 
 # Example usage
 if __name__ == "__main__":
     try:
         config = load_config()
-        print("Environment variables loaded successfully!")
+        missing = [name for name, value in config.items() if not value]
+        print(f"Configuration loaded (API keys not set: {', '.join(missing) or 'none'})")
     except ValueError as e:
         print(f"Error: {e}")
@@ -0,0 +1,303 @@
+"""
+Token, latency and cost ledger for a simulation run.
+
+Each call to mutate_code is tracked as one mutation: token usage reported by the
+provider (split into cached and uncached input), LLM calls, verification retries,
+provider retries, prompt-cache and mutation-memo hits and wall time. Each LLM call is
+priced when its usage is recorded, at the per-provider rates (configurable through gin)
+of the provider that served it, so a mutation escalated by the model cascade, hedged to
+a secondary or failed over to a fallback provider pays each provider's own price.
+NetLogoLogger closes a generation whenever it logs one; the ledger then aggregates the
+generation's mutations, relates their cost to the change in mean fitness, and writes
+everything to cost_ledger.json next to generation_output.json.
+"""
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import gin
+
+# Per-million-token prices in USD; "cached_input" is the price of prompt-cache reads
+DEFAULT_PRICES = {
+    "claude": {"input": 3.0, "cached_input": 0.3, "output": 15.0},
+    "deepseek": {"input": 0.27, "cached_input": 0.07, "output": 1.1},
+    "groq": {"input": 0.59, "cached_input": 0.59, "output": 0.79},
+    "openai": {"input": 2.5, "cached_input": 1.25, "output": 10.0},
+    "local-sim": {"input": 0.0, "cached_input": 0.0, "output": 0.0},
+}
+
+COUNTERS = ["input_tokens", "cached_input_tokens", "uncached_input_tokens", "cache_creation_tokens",
+            "output_tokens", "llm_calls", "retries", "provider_retries", "cache_hits", "memo_hits",
+            "translation_hits", "escalations", "failures", "timeouts"]
+
+_active_mutation: contextvars.ContextVar = contextvars.ContextVar("active_mutation", default=None)
+# List collecting finished records instead of the pending generation (see CostLedger.capture)
+_record_sink: contextvars.ContextVar = contextvars.ContextVar("record_sink", default=None)
+
+
+def price_usage(prices: Dict[str, Dict[str, float]], provider: str, usage: Dict[str, int],
+                model: Optional[str] = None) -> float:
+    """
+    USD cost of one LLM call.
+
+    Args:
+        prices: Per-million-token prices per provider (see CostLedger)
+        provider: Provider that served the call
+        usage: Token counts as returned by usage.extract_usage
+        model: Model that served the call; a "provider:model" price entry takes
+               precedence over the provider's
+    """
+    rates = (prices.get(f"{provider}:{model}") if model else None) or prices.get(provider, {})
+    input_price = rates.get("input", 0.0)
+    return (usage.get("uncached_input_tokens", 0) * input_price
+            + usage.get("cached_input_tokens", 0) * rates.get("cached_input", input_price)
+            + usage.get("output_tokens", 0) * rates.get("output", 0.0)) / 1e6
+
+
+class MutationRecord:
+    """Counters for one mutation; safe to update from the threads of a hedged or multi-candidate call."""
+
+    def __init__(self, provider: str, prices: Optional[Dict[str, Dict[str, float]]] = None):
+        self.provider = provider
+        self.prices = DEFAULT_PRICES if prices is None else prices
+        self.counts = {key: 0 for key in COUNTERS}
+        self.cost = 0.0
+        self.wall_time = 0.0
+        self.outcome = "ok"
+        self.started_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def add(self, key: str, amount: float = 1) -> None:
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + amount
+
+    def add_cost(self, amount: float) -> None:
+        with self.lock:
+            self.cost += amount
+
+    def to_dict(self) -> dict:
+        return {"provider": self.provider, **self.counts, "cost": self.cost,
+                "wall_time": self.wall_time, "outcome": self.outcome}
+
+
+def summarize(records: List[dict]) -> dict:
+    """Sum the counters, cost and wall time of several mutation records."""
+    summary = {key: 0 for key in COUNTERS}
+    summary.update({"mutations": len(records), "cost": 0.0, "wall_time_total": 0.0})
+    for record in records:
+        for key in COUNTERS:
+            summary[key] += record.get(key, 0)
+        summary["cost"] += record["cost"]
+        summary["wall_time_total"] += record["wall_time"]
+    summary["wall_time_mean"] = summary["wall_time_total"] / len(records) if records else 0.0
+    summary["cost_per_mutation"] = summary["cost"] / len(records) if records else 0.0
+    return summary
+
+
+def cost_per_fitness_gain(cost: float, gain: Optional[float]) -> Optional[float]:
+    """Cost divided by fitness improvement, or None when fitness did not improve."""
+    if gain is None or gain <= 0:
+        return None
+    return cost / gain
+
+
+@gin.configurable
+class CostLedger:
+    """
+    Collects mutation records and aggregates them per generation and per run.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, Dict[str, float]]] = None,
+                 fitness_key: str = "mean fitness"):
+        """
+        Args:
+            prices: Per-provider prices in USD per million tokens, with "input",
+                    "cached_input" and "output" entries
+            fitness_key: Generation metric whose change is used for cost per fitness gain
+        """
+        self.prices = prices or DEFAULT_PRICES
+        self.fitness_key = fitness_key
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, output_path: Optional[str] = None) -> None:
+        """Start a new run, optionally writing the ledger to `output_path`."""
+        with self.lock:
+            self.output_path = output_path
+            self.pending: List[dict] = []
+            self.generations: List[dict] = []
+            self.all_records: List[dict] = []
+            self.initial_fitness = None
+
+    @contextmanager
+    def track_mutation(self, provider: str) -> Iterator[MutationRecord]:
+        """
+        Track one mutation. Token usage and events recorded while the block runs
+        (including in threads started with a copied context) are attributed to it.
+        """
+        record = self.begin_mutation(provider)
+        try:
+            with self.attribute(record):
+                yield record
+        except BaseException:
+            record.outcome = "error"
+            raise
+        finally:
+            self.end_mutation(record)
+
+    def begin_mutation(self, provider: str) -> MutationRecord:
+        """
+        Start a mutation whose stages run in different threads (see MutationPipeline).
+        Wrap each stage in attribute() and finish with end_mutation().
+        """
+        return MutationRecord(provider, self.prices)
+
+    @contextmanager
+    def attribute(self, record: MutationRecord) -> Iterator[MutationRecord]:
+        """Attribute usage and events recorded while the block runs to `record`."""
+        token = _active_mutation.set(record)
+        try:
+            yield record
+        finally:
+            _active_mutation.reset(token)
+
+    def end_mutation(self, record: MutationRecord) -> None:
+        """Finish a mutation started with begin_mutation and queue it for the current generation."""
+        record.wall_time = time.monotonic() - record.started_at
+        sink = _record_sink.get()
+        with self.lock:
+            (self.pending if sink is None else sink).append(record.to_dict())
+
+    @contextmanager
+    def capture(self) -> Iterator[List[dict]]:
+        """
+        Collect the records of mutations finished while the block runs (including in
+        threads started with a copied context) instead of queueing them for the current
+        generation. The mutation daemon uses this to send each request's records to the
+        client, whose NetLogoLogger closes the generation.
+        """
+        records: List[dict] = []
+        token = _record_sink.set(records)
+        try:
+            yield records
+        finally:
+            _record_sink.reset(token)
+
+    def capturing(self) -> bool:
+        """Whether the current context is inside capture()."""
+        return _record_sink.get() is not None
+
+    def add_records(self, records: List[dict]) -> None:
+        """
+        Queue records of mutations run elsewhere (e.g. by the daemon) for the current
+        generation, or for the enclosing capture() block.
+        """
+        sink = _record_sink.get()
+        with self.lock:
+            (self.pending if sink is None else sink).extend(records)
+
+    def close_generation(self, metrics: dict) -> dict:
+        """
+        Aggregate the mutations since the previous generation and save the ledger.
+
+        Args:
+            metrics: The generation's metrics as logged by NetLogoLogger
+                     (uses "generation" and the configured fitness key)
+
+        Returns:
+            The generation summary
+        """
+        fitness = metrics.get(self.fitness_key)
+        fitness = float(fitness) if isinstance(fitness, (int, float)) else None
+        with self.lock:
+            records, self.pending = self.pending, []
+            previous = self.generations[-1]["fitness"] if self.generations else None
+            if self.initial_fitness is None:
+                self.initial_fitness = fitness
+
+            summary = summarize(records)
+            gain = fitness - previous if fitness is not None and previous is not None else None
+            summary.update({
+                "generation": metrics.get("generation", len(self.generations)),
+                "fitness": fitness,
+                "fitness_gain": gain,
+                "cost_per_fitness_gain": cost_per_fitness_gain(summary["cost"], gain),
+                "by_provider": {provider: summarize([r for r in records if r["provider"] == provider])
+                                for provider in sorted({r["provider"] for r in records})},
+                "mutation_records": records,
+            })
+            self.generations.append(summary)
+            self.all_records.extend(records)
+        self.save()
+        return summary
+
+    def run_summary(self) -> dict:
+        """Totals over all closed generations, with cost per fitness gain since the first one."""
+        with self.lock:
+            summary = summarize(self.all_records)
+            final_fitness = self.generations[-1]["fitness"] if self.generations else None
+            gain = (final_fitness - self.initial_fitness
+                    if final_fitness is not None and self.initial_fitness is not None else None)
+            summary.update({
+                "generations": len(self.generations),
+                "fitness_gain": gain,
+                "cost_per_fitness_gain": cost_per_fitness_gain(summary["cost"], gain),
+                "by_provider": {provider: summarize([r for r in self.all_records if r["provider"] == provider])
+                                for provider in sorted({r["provider"] for r in self.all_records})},
+            })
+            return summary
+
+    def save(self) -> None:
+        if not self.output_path:
+            return
+        data = {"prices": self.prices, "run": self.run_summary(), "generations": self.generations}
+        with open(self.output_path, "w") as f:
+            json.dump(data, f, indent=4)
+
+
+_ledger: Optional[CostLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_cost_ledger() -> CostLedger:
+    """Return the process-wide ledger, creating it (from gin) on first use."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = CostLedger()
+        return _ledger
+
+
+def record_usage(usage: Dict[str, int], provider: Optional[str] = None, model: Optional[str] = None) -> None:
+    """
+    Attribute one LLM call's token usage (see usage.extract_usage) to the active mutation
+    and add its cost at the prices of the provider (and model) that served it, which
+    defaults to the mutation's provider.
+    """
+    record = _active_mutation.get()
+    if record is None:
+        return
+    record.add_cost(price_usage(record.prices, provider or record.provider, usage, model))
+    for key in ("input_tokens", "cached_input_tokens", "uncached_input_tokens",
+                "cache_creation_tokens", "output_tokens"):
+        record.add(key, usage.get(key, 0))
+    record.add("llm_calls")
+    if usage.get("cached_input_tokens"):
+        record.add("cache_hits")
+
+
+def record_event(key: str, amount: float = 1) -> None:
+    """Add to a counter (e.g. "retries", "cache_hits", "failures") of the active mutation."""
+    record = _active_mutation.get()
+    if record is not None:
+        record.add(key, amount)
+
+
+def set_outcome(outcome: str) -> None:
+    """Set the outcome (e.g. "timeout") of the active mutation."""
+    record = _active_mutation.get()
+    if record is not None:
+        record.outcome = outcome
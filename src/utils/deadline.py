@@ -0,0 +1,193 @@
+"""
+Wall-clock deadlines per mutation and per generation.
+
+`py:runresult "mutate_code(...)"` blocks NetLogo until the mutation returns, so one slow
+provider response stalls evolve-agents for the whole population. DeadlinePolicy.run
+executes a mutation in a worker thread and stops waiting once its deadline passes: the
+earlier of the per-mutation limit and what is left of the per-generation budget. The
+mutation then returns the best verified code seen so far, or the parent rule.
+
+The deadline is also published through a contextvar, so work inside the mutation can
+stop early on its own: should_retry ends the graph and the provider rate limiter stops
+retrying once it has passed. A request already in flight cannot be interrupted; its
+result is discarded.
+"""
+import contextvars
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+import gin
+
+from src.utils.cost_ledger import record_event, set_outcome
+from src.utils.logging import get_logger
+from src.utils.tracing import current_span
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("deadline", default=None)
+_progress: contextvars.ContextVar = contextvars.ContextVar("mutation_progress", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised by work that notices the deadline of its mutation has passed."""
+
+
+class MutationProgress:
+    """Best verified result of a running mutation, kept for when its deadline expires."""
+
+    def __init__(self):
+        self.best: Optional[Tuple[str, str]] = None
+        self.lock = threading.Lock()
+
+    def record(self, code: str, text: str) -> None:
+        with self.lock:
+            self.best = (code, text)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current mutation's deadline, or None without a deadline."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    """Whether the current mutation's deadline has passed."""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def record_verified(code: str, text: str) -> None:
+    """Remember verified code of the current mutation as its fallback on timeout."""
+    progress = _progress.get()
+    if progress is not None:
+        progress.record(code, text)
+
+
+@gin.configurable
+class DeadlinePolicy:
+    """
+    Deadlines for single mutations and for all mutations of a generation.
+    """
+
+    def __init__(self, mutation_seconds: Optional[float] = None,
+                 generation_seconds: Optional[float] = None):
+        """
+        Args:
+            mutation_seconds: Wall-clock limit per mutation (None for no limit)
+            generation_seconds: Wall-clock limit for all mutations of a generation, counted
+                                from its first mutation (None for no limit)
+        """
+        self.mutation_seconds = mutation_seconds
+        self.generation_seconds = generation_seconds
+        self.generation_started_at: Optional[float] = None
+        self.lock = threading.Lock()
+        self.logger = get_logger()
+        self.stats = {"mutations": 0, "timeouts": 0, "skipped": 0, "best_so_far": 0}
+
+    def start_generation(self) -> None:
+        """Start the generation budget now (otherwise it starts with the next mutation)."""
+        with self.lock:
+            self.generation_started_at = time.monotonic()
+
+    def close_generation(self) -> None:
+        """End the current generation; the next mutation starts a new budget."""
+        with self.lock:
+            self.generation_started_at = None
+
+    def deadline(self) -> Optional[float]:
+        """Absolute (time.monotonic) deadline for a mutation starting now."""
+        now = time.monotonic()
+        candidates = []
+        if self.mutation_seconds is not None:
+            candidates.append(now + self.mutation_seconds)
+        if self.generation_seconds is not None:
+            with self.lock:
+                if self.generation_started_at is None:
+                    self.generation_started_at = now
+                candidates.append(self.generation_started_at + self.generation_seconds)
+        inherited = _deadline.get()
+        if inherited is not None:
+            candidates.append(inherited)
+        return min(candidates) if candidates else None
+
+    def run(self, fn: Callable[[], Any], fallback: Any) -> Any:
+        """
+        Run one mutation within its deadline.
+
+        Args:
+            fn: The mutation, returning (rule, text)
+            fallback: Result when the deadline passes before anything was verified
+                      (normally the parent rule and its text)
+
+        Returns:
+            fn's result, or on timeout the best verified (rule, text) so far or `fallback`
+        """
+        with self.lock:
+            self.stats["mutations"] += 1
+        deadline = self.deadline()
+        if deadline is None:
+            return fn()
+        if deadline <= time.monotonic():
+            with self.lock:
+                self.stats["skipped"] += 1
+            return self._timeout("generation budget exhausted before the mutation started", None, fallback)
+
+        progress = MutationProgress()
+        context = contextvars.copy_context()
+        context.run(_deadline.set, deadline)
+        context.run(_progress.set, progress)
+        outcome = {}
+        done = threading.Event()
+
+        def target():
+            try:
+                outcome["result"] = fn()
+            except BaseException as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+
+        # A daemon thread, so an abandoned request does not keep NetLogo's Python process alive
+        threading.Thread(target=context.run, args=(target,), daemon=True).start()
+        if done.wait(max(0.0, deadline - time.monotonic())):
+            if "error" in outcome:
+                raise outcome["error"]
+            return outcome["result"]
+        return self._timeout(f"deadline of {self.describe()} exceeded", progress.best, fallback)
+
+    def _timeout(self, reason: str, best: Optional[Tuple[str, str]], fallback: Any) -> Any:
+        with self.lock:
+            self.stats["timeouts"] += 1
+            self.stats["best_so_far"] += int(best is not None)
+        record_event("timeouts")
+        set_outcome("timeout")
+        span = current_span()
+        if span is not None:
+            span.set_attributes({"lear.outcome": "timeout", "lear.timeout_reason": reason})
+        self.logger.warning(f"Mutation timed out ({reason}), returning "
+                            f"{'the best verified code so far' if best else 'the parent rule'}")
+        return best if best is not None else fallback
+
+    def describe(self) -> str:
+        limits = []
+        if self.mutation_seconds is not None:
+            limits.append(f"{self.mutation_seconds:.1f}s per mutation")
+        if self.generation_seconds is not None:
+            limits.append(f"{self.generation_seconds:.1f}s per generation")
+        return " / ".join(limits) or "the caller"
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+
+_deadline_policy: Optional[DeadlinePolicy] = None
+_deadline_policy_lock = threading.Lock()
+
+
+def get_deadline_policy() -> DeadlinePolicy:
+    """Return the process-wide deadline policy, creating it (from gin) on first use."""
+    global _deadline_policy
+    with _deadline_policy_lock:
+        if _deadline_policy is None:
+            _deadline_policy = DeadlinePolicy()
+        return _deadline_policy
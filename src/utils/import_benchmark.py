@@ -0,0 +1,105 @@
+"""
+Cold-start import benchmark for the NetLogo entry points.
+
+Every BehaviorSpace run starts a fresh Python interpreter and imports the mutation
+entry point, so its import time is paid once per run. This script imports a module in
+fresh interpreters with `-X importtime`, reports the median cumulative import time and
+the slowest imports, and fails if the median exceeds a budget.
+
+Usage:
+    python -m src.utils.import_benchmark
+    python -m src.utils.import_benchmark --module src.mutation.mutate_code --budget-ms 250 --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+DEFAULT_MODULE = "src.mutation.mutate_code"
+DEFAULT_BUDGET_MS = 250.0
+# Modules that must not be imported until a provider or graph is actually used
+DEFERRED_MODULES = ["langgraph", "langchain_anthropic", "langchain_deepseek", "langchain_groq", "langchain_openai"]
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        Mapping of module name to (self_us, cumulative_us)
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure_import(module: str) -> Tuple[Dict[str, Tuple[int, int]], List[str]]:
+    """
+    Import `module` in a fresh interpreter.
+
+    Returns:
+        Tuple of (import timings, deferred modules that were loaded anyway)
+    """
+    code = (f"import sys, {module}\n"
+            f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return parse_importtime(result.stderr), loaded
+
+
+def run_benchmark(module: str = DEFAULT_MODULE, runs: int = 5, top: int = 10) -> dict:
+    """
+    Measure the cold-start import time of `module` over several runs.
+
+    Returns:
+        Dict with the median and per-run times (ms), the slowest imports of the last
+        run, and any deferred modules that were imported eagerly
+    """
+    totals_ms = []
+    timings, loaded = {}, []
+    for _ in range(runs):
+        timings, loaded = measure_import(module)
+        totals_ms.append(timings[module][1] / 1000.0)
+    slowest = sorted(timings.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return {
+        "module": module,
+        "median_ms": statistics.median(totals_ms),
+        "runs_ms": totals_ms,
+        "slowest": [(name, cumulative / 1000.0) for name, (_, cumulative) in slowest],
+        "eager_deferred_modules": loaded,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="Module to import")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Maximum median import time")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to measure")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.module, args.runs)
+    print(f"{report['module']}: median {report['median_ms']:.1f} ms over {args.runs} runs "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print("Slowest imports (cumulative ms):")
+    for name, cumulative_ms in report["slowest"]:
+        print(f"  {cumulative_ms:8.1f}  {name}")
+
+    ok = report["median_ms"] <= args.budget_ms
+    if report["eager_deferred_modules"]:
+        print(f"Imported eagerly but should be deferred: {', '.join(report['eager_deferred_modules'])}")
+        ok = False
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,180 @@
-from typing import Callable
+from typing import Callable, Dict, Optional, Tuple
 import logging
+import threading
+import time
 import gin
 from src.verification.verify_netlogo import NetLogoVerifier
 
+# Verifier error messages mapped to error classes, checked in order
+ERROR_CLASS_PATTERNS = [
+    ("low_quality", ("low quality",)),  # Verified code rejected by the model cascade
+    ("dangerous_primitive", ("dangerous primitive",)),
+    ("length", ("exceeds maximum length",)),
+    ("no_movement", ("no movement command",)),
+    ("unbalanced_brackets", ("unclosed", "unmatched", "mismatched", "missing '['", "expected '['")),
+    ("type_error", ("expects numeric", "expects boolean", "incompatible operand", "expects arguments",
+                    "argument(s)", "invalid argument")),
+    ("value_range", ("value too",)),
+    ("unknown_token", ("unknown", "disallowed", "unexpected", "unsupported syntax")),
+    ("empty", ("empty code",)),
+]
+
+
+def classify_error(error_message: Optional[str]) -> str:
+    """Map a verifier error message to an error class such as "dangerous_primitive"."""
+    if not error_message:
+        return "none"
+    message = error_message.lower()
+    for error_class, needles in ERROR_CLASS_PATTERNS:
+        if any(needle in message for needle in needles):
+            return error_class
+    return "other"
+
+
+@gin.configurable
+class RetryPolicy:
+    """
+    Single retry policy for code generation.
+
+    A mutation makes a first attempt and up to max_attempts retries, in the graph, in
+    CodeRetryHandler and in batched retry rounds alike. A retry is allowed while fewer
+    than max_attempts retries were made and the chance
+    that one of the retries still fitting in the latency budget succeeds is at least
+    min_success_probability. The per-retry success probability is estimated per
+    (provider, error class) from observed retry outcomes, starting from a Beta prior.
+    """
+
+    def __init__(self, max_attempts: int = 5,
+                 min_success_probability: float = 0.1,
+                 min_observations: int = 10,
+                 prior_successes: float = 1.0,
+                 prior_failures: float = 1.0,
+                 latency_budget: Optional[float] = None):
+        """
+        Args:
+            max_attempts: Maximum number of retries per mutation, after its first attempt
+            min_success_probability: Stop retrying when the chance that a remaining retry
+                                     succeeds drops below this
+            min_observations: Retry outcomes needed for an error class before they are
+                              used to stop early
+            prior_successes: Beta prior pseudo-count of successful retries
+            prior_failures: Beta prior pseudo-count of failed retries
+            latency_budget: Seconds a mutation may spend in total (None for no budget)
+        """
+        self.max_attempts = max_attempts
+        self.min_success_probability = min_success_probability
+        self.min_observations = min_observations
+        self.prior_successes = prior_successes
+        self.prior_failures = prior_failures
+        self.latency_budget = latency_budget
+        self.lock = threading.Lock()
+        # (provider, error_class) -> [successful retries, retries]
+        self.outcomes: Dict[Tuple[str, str], list] = {}
+        self.stopped_early = 0
+
+    def record_outcome(self, provider: str, error_class: str, success: bool) -> None:
+        """Record whether a retry made for an error of `error_class` produced valid code."""
+        with self.lock:
+            counts = self.outcomes.setdefault((provider, error_class), [0, 0])
+            counts[0] += int(success)
+            counts[1] += 1
+
+    def success_probability(self, provider: str, error_class: str) -> Tuple[float, int]:
+        """
+        Estimated probability that one retry fixes an error of this class.
+
+        Returns:
+            Tuple of (posterior mean success probability, number of observed retries)
+        """
+        with self.lock:
+            successes, retries = self.outcomes.get((provider, error_class), (0, 0))
+        probability = (successes + self.prior_successes) / (retries + self.prior_successes + self.prior_failures)
+        return probability, retries
+
+    def should_retry(self, provider: str, error_message: Optional[str], retry_count: int,
+                     elapsed: float = 0.0, attempt_latency: Optional[float] = None,
+                     max_attempts: Optional[int] = None) -> Tuple[bool, str]:
+        """
+        Decide whether another generation attempt is worthwhile.
+
+        Args:
+            provider: Provider that generated the failing code
+            error_message: Verifier error of the last attempt (None if it passed)
+            retry_count: Retries made so far (0 when the first attempt has just failed)
+            elapsed: Seconds spent on this mutation so far
+            attempt_latency: Expected seconds per attempt, for the latency budget
+            max_attempts: Overrides self.max_attempts
+
+        Returns:
+            Tuple of (retry?, reason)
+        """
+        if not error_message:
+            return False, "code is valid"
+        max_attempts = self.max_attempts if max_attempts is None else max_attempts
+        remaining = max_attempts - retry_count
+        if remaining <= 0:
+            return False, f"retry limit of {max_attempts} reached"
+
+        if self.latency_budget is not None and attempt_latency:
+            fits = int((self.latency_budget - elapsed) // attempt_latency)
+            if fits <= 0:
+                self._count_early_stop()
+                return False, f"latency budget of {self.latency_budget:.1f}s exhausted"
+            remaining = min(remaining, fits)
+
+        error_class = classify_error(error_message)
+        probability, observed = self.success_probability(provider, error_class)
+        if observed >= self.min_observations:
+            chance = 1 - (1 - probability) ** remaining
+            if chance < self.min_success_probability:
+                self._count_early_stop()
+                return False, (f"{error_class} retries on {provider} succeed {probability:.0%} of the time, "
+                               f"{chance:.0%} chance within {remaining} remaining attempts")
+        return True, f"retrying {error_class} ({remaining} attempts left)"
+
+    def _count_early_stop(self) -> None:
+        with self.lock:
+            self.stopped_early += 1
+
+    def metrics(self) -> dict:
+        """Retry success rates per provider and error class, and how often retrying stopped early."""
+        with self.lock:
+            outcomes = {f"{provider}/{error_class}": {"successes": s, "retries": n, "success_rate": s / n if n else None}
+                        for (provider, error_class), (s, n) in self.outcomes.items()}
+            return {"outcomes": outcomes, "stopped_early": self.stopped_early}
+
+
+_retry_policy: Optional[RetryPolicy] = None
+_retry_policy_lock = threading.Lock()
+
+
+def get_retry_policy() -> RetryPolicy:
+    """Return the process-wide retry policy, creating it (from gin) on first use."""
+    global _retry_policy
+    with _retry_policy_lock:
+        if _retry_policy is None:
+            _retry_policy = RetryPolicy()
+        return _retry_policy
+
+
 @gin.configurable
 class CodeRetryHandler:
-    def __init__(self, verifier: NetLogoVerifier, max_attempts: int = 5):
+    def __init__(self, verifier: NetLogoVerifier, max_attempts: Optional[int] = None,
+                 policy: Optional[RetryPolicy] = None, provider_name: str = "default"):
         """Initialize the retry handler.
         
         Args:
             verifier: NetLogoVerifier instance for code validation
-            max_attempts: Maximum number of retry attempts before reverting
+            max_attempts: Maximum number of retries after the first attempt before reverting
+                          (defaults to RetryPolicy.max_attempts)
+            policy: Retry policy deciding whether a further attempt is worthwhile
+                    (defaults to the shared policy)
+            provider_name: Provider the retry statistics are recorded under
         """
         self.verifier = verifier
-        self.max_attempts = max_attempts
+        self.policy = policy or get_retry_policy()
+        self.max_attempts = max_attempts if max_attempts is not None else self.policy.max_attempts
+        self.provider_name = provider_name
         self.error_prompt = """
             The generated NetLogo code has an error:
             Code: {original_code}
@@ -50,8 +211,10 @@ class CodeRetryHandler:
         """
         attempts = 0
         current_code = None
+        error_message = None
+        start = time.monotonic()
 
-        while attempts < self.max_attempts:
+        while True:
             try:
                 # Generate new code if first attempt or retry with error context
                 if current_code is None:
@@ -59,24 +222,33 @@ class CodeRetryHandler:
                 else:
                     # Retry with error context
                     error_prompt = self.error_prompt.format(
-                        code=current_code,
-                        error=error_message
+                        original_code=current_code,
+                        error_message=error_message
                     )
                     current_code = generate_fn(agent_info=agent_info, use_text_evolution=use_text_evolution, error_prompt=error_prompt)
 
                 # Verify the generated/fixed code
-                is_safe, error_message = self.verifier.is_safe(current_code)
+                is_safe, new_error = self.verifier.is_safe(current_code)
+                if error_message:
+                    self.policy.record_outcome(self.provider_name, classify_error(error_message), is_safe)
                 
                 if is_safe:
                     logging.info(f"Successfully generated valid code after {attempts + 1} attempts")
                     return current_code
                 
+                error_message = new_error
                 logging.warning(f"Attempt {attempts + 1} failed: {error_message}")
-                attempts += 1
                 
             except Exception as e:
                 logging.error(f"Error during retry attempt {attempts + 1}: {str(e)}")
-                attempts += 1
+                error_message = error_message or str(e)
+            attempts += 1
 
-        logging.warning(f"Failed to generate valid code after {self.max_attempts} attempts. Reverting to original code.")
-        return original_code
+            # The first attempt is not a retry
+            retry, reason = self.policy.should_retry(self.provider_name, error_message, attempts - 1,
+                                                     elapsed=time.monotonic() - start,
+                                                     attempt_latency=(time.monotonic() - start) / attempts,
+                                                     max_attempts=self.max_attempts)
+            if not retry:
+                logging.warning(f"Stopping after {attempts} attempts ({reason}). Reverting to original code.")
+                return original_code
@@ -4,6 +4,9 @@ import logging
 import json
 from collections import ChainMap
 
+from src.utils.cost_ledger import get_cost_ledger
+from src.utils.deadline import get_deadline_policy
+
 _logger_instance = None  # Global variable to hold the logger instance
 
 def initialize_logger(experiment_name):
@@ -42,6 +45,10 @@ class NetLogoLogger:
         # Define log file path
         self.log_file = os.path.join(self.log_directory, "simulation.log")
         self.json_file = os.path.join(self.log_directory, "generation_output.json")
+        self.cost_file = os.path.join(self.log_directory, "cost_ledger.json")
+
+        # Start a fresh token/cost ledger for this run
+        get_cost_ledger().reset(self.cost_file)
 
         # Setup logger
         self.logger = logging.getLogger(f"NetLogoLogger_{timestamp}")
@@ -82,3 +89,11 @@ class NetLogoLogger:
         # Save to json file
         with open(self.json_file, "w") as f:
             json.dump(self.generation_data, f, indent=4)
+
+        # Aggregate this generation's LLM cost and save it next to the generation output
+        cost = get_cost_ledger().close_generation(master_dict)
+        # The next mutation starts a new generation time budget
+        get_deadline_policy().close_generation()
+        self.logger.info(f"Generation cost: {cost['cost']:.6f} USD, {cost['input_tokens']} input tokens "
+                         f"({cost['cached_input_tokens']} cached), {cost['output_tokens']} output tokens, "
+                         f"{cost['mutations']} mutations")
@@ -1,5 +1,9 @@
+import json
 import os
-import yaml
+import threading
+from collections.abc import Mapping
+from string import Formatter
+from typing import Dict, Iterator, Optional, Tuple
 
 """Collection of prompts used throughout the LEAR system
 
@@ -7,14 +11,75 @@ PROMPT STRUCTURE:
 - Static prompt definitions (like strategies, etc.) are loaded from YAML files in `src/utils/prompts/static_definitions/`.
 - Dynamic prompt definitions (base prompts with variations) are loaded from YAML files in `src/utils/prompts/definitions/`.
 - Each dynamic YAML file defines a base prompt and optional components (examples, comment instructions).
-- The script automatically constructs zero-shot, one-shot, two-shot, and commented variations for dynamic prompts.
+- The zero-shot, one-shot, two-shot, and commented variations of a dynamic prompt are constructed on first access.
+
+LOADING:
+- `prompts` is a lazy PromptRegistry: nothing is read until the first lookup.
+- `python -m src.utils.storeprompts --snapshot` writes the parsed definitions to a JSON snapshot,
+  which is loaded instead of the YAML files while it is newer than all of them.
 """
 
 PROMPT_DEFINITIONS_DIR = os.path.join(os.path.dirname(__file__), "prompts", "definitions")
 STATIC_PROMPT_DEFINITIONS_DIR = os.path.join(os.path.dirname(__file__), "prompts", "static_definitions")
+PROMPT_SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), "prompts", "prompts_snapshot.json")
+
+# Shot/comment variants built from a dynamic prompt's components
+VARIANT_COMPONENTS = {
+    "zero_shot_code": ("base_prompt",),
+    "one_shot_code": ("base_prompt", "one_shot_example"),
+    "two_shot_code": ("base_prompt", "one_shot_example", "two_shot_example"),
+    "zero_shot_code_wcomments": ("base_prompt", "comment_instruction"),
+    "one_shot_code_wcomments": ("base_prompt", "one_shot_example", "comment_instruction"),
+    "two_shot_code_wcomments": ("base_prompt", "one_shot_example", "two_shot_example", "comment_instruction"),
+}
+
+
+class DynamicPromptGroup(Mapping):
+    """The shot/comment variants of one dynamic prompt, each concatenated on first access."""
+
+    def __init__(self, components: dict):
+        self.components = components
+        self.variants: Dict[str, str] = {}
+
+    def __getitem__(self, variant: str) -> str:
+        if variant not in self.variants:
+            if variant not in VARIANT_COMPONENTS:
+                raise KeyError(variant)
+            self.variants[variant] = "".join(self.components.get(part, "") for part in VARIANT_COMPONENTS[variant])
+        return self.variants[variant]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(VARIANT_COMPONENTS)
+
+    def __len__(self) -> int:
+        return len(VARIANT_COMPONENTS)
+
+
+class CompiledPrompt:
+    """
+    A resolved prompt template with its placeholders parsed once.
+
+    Attributes:
+        template: The str.format template
+        fields: Placeholder names in order of first appearance
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        fields = []
+        for _, field_name, _, _ in Formatter().parse(template):
+            if field_name is not None and field_name not in fields:
+                fields.append(field_name)
+        self.fields = tuple(fields)
+
+    def format(self, **values) -> str:
+        return self.template.format(**values)
+
+
+def read_dynamic_definitions(directory: str) -> dict:
+    """Reads the components (base prompt, examples, comment instruction) of each dynamic prompt YAML file."""
+    import yaml
 
-def load_dynamic_prompts(directory: str) -> dict:
-    """Loads and constructs dynamic prompt variations from YAML files in the specified directory."""
     loaded_prompts = {}
     if not os.path.exists(directory):
         print(f"Warning: Dynamic prompt definitions directory not found: {directory}")
@@ -40,20 +105,7 @@ def load_dynamic_prompts(directory: str) -> dict:
                     print(f"Warning: Skipping invalid dynamic YAML file {filename}: Missing 'base_prompt' key for '{name}'")
                     continue
 
-                base = prompt_data["base_prompt"]
-                one_shot = prompt_data.get("one_shot_example", "")
-                two_shot = prompt_data.get("two_shot_example", "")
-                comment_instr = prompt_data.get("comment_instruction", "")
-
-                prompt_group = {
-                    "zero_shot_code": base,
-                    "one_shot_code": base + one_shot,
-                    "two_shot_code": base + one_shot + two_shot,
-                    "zero_shot_code_wcomments": base + comment_instr,
-                    "one_shot_code_wcomments": base + one_shot + comment_instr,
-                    "two_shot_code_wcomments": base + one_shot + two_shot + comment_instr,
-                }
-                loaded_prompts[name] = prompt_group
+                loaded_prompts[name] = prompt_data
 
             except yaml.YAMLError as e:
                 print(f"Error parsing YAML file {filename}: {e}")
@@ -62,8 +114,14 @@ def load_dynamic_prompts(directory: str) -> dict:
 
     return loaded_prompts
 
+def load_dynamic_prompts(directory: str) -> dict:
+    """Loads dynamic prompts from YAML files; their variations are constructed on first access."""
+    return {name: DynamicPromptGroup(components) for name, components in read_dynamic_definitions(directory).items()}
+
 def load_static_definitions(directory: str) -> dict:
     """Loads static prompt definitions from YAML files in the specified directory."""
+    import yaml
+
     loaded_prompts = {}
     if not os.path.exists(directory):
         print(f"Warning: Static prompt definitions directory not found: {directory}")
@@ -101,16 +159,117 @@ def load_static_definitions(directory: str) -> dict:
     return loaded_prompts
 
 
-# Load static definitions first
-prompts = load_static_definitions(STATIC_PROMPT_DEFINITIONS_DIR)
+def list_definition_files() -> list:
+    """Paths of all prompt YAML files, static and dynamic."""
+    paths = []
+    for directory in (STATIC_PROMPT_DEFINITIONS_DIR, PROMPT_DEFINITIONS_DIR):
+        if os.path.exists(directory):
+            paths.extend(os.path.join(directory, f) for f in sorted(os.listdir(directory))
+                         if f.endswith(".yaml") or f.endswith(".yml"))
+    return paths
+
+
+class PromptRegistry(Mapping):
+    """
+    Read-only mapping of prompt groups that loads its definitions on first lookup.
+
+    Static definitions are plain dictionaries; dynamic prompts are DynamicPromptGroups,
+    and dynamic prompts overwrite static ones if names clash. Resolved templates are
+    compiled once per (prompt_type, prompt_name, strategy).
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = PROMPT_SNAPSHOT_PATH):
+        """
+        Args:
+            snapshot_path: JSON snapshot used instead of the YAML files while it is up to date
+        """
+        self.snapshot_path = snapshot_path
+        self.groups: Optional[dict] = None
+        self.compiled_templates: Dict[Tuple[str, str, Optional[str]], Optional[CompiledPrompt]] = {}
+        self.lock = threading.Lock()
+
+    def _load(self) -> dict:
+        if self.groups is None:
+            with self.lock:
+                if self.groups is None:
+                    static, dynamic = self._read_definitions()
+                    groups = dict(static)
+                    groups.update({name: DynamicPromptGroup(components) for name, components in dynamic.items()})
+                    self.groups = groups
+        return self.groups
+
+    def _read_definitions(self) -> Tuple[dict, dict]:
+        if self.snapshot_path and self.snapshot_is_fresh():
+            with open(self.snapshot_path, "r") as f:
+                snapshot = json.load(f)
+            return snapshot["static"], snapshot["dynamic"]
+        return load_static_definitions(STATIC_PROMPT_DEFINITIONS_DIR), read_dynamic_definitions(PROMPT_DEFINITIONS_DIR)
+
+    def snapshot_is_fresh(self) -> bool:
+        """Whether the snapshot exists, covers the same files, and is newer than all of them."""
+        if not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, "r") as f:
+                sources = json.load(f).get("sources", [])
+        except (OSError, ValueError):
+            return False
+        files = list_definition_files()
+        if sorted(os.path.basename(path) for path in files) != sorted(sources):
+            return False
+        snapshot_mtime = os.path.getmtime(self.snapshot_path)
+        return all(os.path.getmtime(path) <= snapshot_mtime for path in files)
+
+    def write_snapshot(self, path: Optional[str] = None) -> str:
+        """
+        Parse the YAML definitions and save them as a JSON snapshot.
+
+        Returns:
+            Path of the written snapshot
+        """
+        path = path or self.snapshot_path
+        snapshot = {
+            "sources": [os.path.basename(p) for p in list_definition_files()],
+            "static": load_static_definitions(STATIC_PROMPT_DEFINITIONS_DIR),
+            "dynamic": read_dynamic_definitions(PROMPT_DEFINITIONS_DIR),
+        }
+        with open(path, "w") as f:
+            json.dump(snapshot, f)
+        return path
+
+    def compiled(self, prompt_type: str, prompt_name: str, strategy: Optional[str] = None) -> Optional[CompiledPrompt]:
+        """
+        Look up prompts[prompt_type][prompt_name] (and [strategy], if given) and compile it once.
+
+        Returns:
+            The cached CompiledPrompt, or None if the prompt does not exist
+        """
+        key = (prompt_type, prompt_name, strategy)
+        if key not in self.compiled_templates:
+            template = self.get(prompt_type, {}).get(prompt_name)
+            if strategy is not None and isinstance(template, Mapping):
+                template = template.get(strategy)
+            self.compiled_templates[key] = CompiledPrompt(template) if isinstance(template, str) and template else None
+        return self.compiled_templates[key]
+
+    def __getitem__(self, name: str):
+        return self._load()[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
 
-# Load dynamic prompts and merge them, potentially overwriting static ones if names clash
-dynamic_prompts = load_dynamic_prompts(PROMPT_DEFINITIONS_DIR)
-prompts.update(dynamic_prompts)
+prompts = PromptRegistry()
 
 # Example usage (optional, for testing)
 if __name__ == "__main__":
-    import json
+    import sys
+    if "--snapshot" in sys.argv:
+        print(f"Wrote prompt snapshot to {prompts.write_snapshot()}")
+        sys.exit(0)
     print(f"Loaded {len(prompts)} prompt groups.")
     # print(json.dumps(prompts, indent=2))
     if 'collection_simple' in prompts:
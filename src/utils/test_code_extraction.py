@@ -0,0 +1,54 @@
+import unittest
+
+from src.utils.code_extraction import extract_code_candidates, extract_text_block, select_code
+from src.verification.verify_netlogo import NetLogoVerifier
+
+
+class TestCodeExtraction(unittest.TestCase):
+    def setUp(self):
+        self.verifier = NetLogoVerifier()
+
+    def test_netlogo_block_ranks_first_and_later_blocks_before_earlier(self):
+        response = ("Draft:\n```\nfd 1\n```\nExplanation.\n```netlogo\nrt 90 fd 2\n```\n"
+                    "Alternative:\n```\nlt 45\n```")
+        codes = [c.code for c in extract_code_candidates(response)]
+        self.assertEqual(codes, ["rt 90 fd 2", "lt 45", "fd 1"])
+
+    def test_language_tag_on_same_line_as_code(self):
+        self.assertEqual(extract_code_candidates("```fd 1 rt 90```")[0].code, "fd 1 rt 90")
+        self.assertEqual(extract_code_candidates("```netlogo fd 1```")[0].code, "fd 1")
+
+    def test_unterminated_block(self):
+        candidates = extract_code_candidates("Here you go:\n```netlogo\nfd 1 rt 90\n")
+        self.assertEqual(candidates[0].code, "fd 1 rt 90")
+        self.assertEqual(candidates[0].source, "unterminated_block")
+
+    def test_unfenced_code_lines_inside_prose(self):
+        response = "Sure, here is the rule:\nifelse item 0 input > 1 [ fd 1 ] [ rt 90 ]\nfd 2\nThis turns away."
+        result = select_code(response, self.verifier)
+        self.assertTrue(result.is_safe)
+        self.assertEqual(result.code, "ifelse item 0 input > 1 [ fd 1 ] [ rt 90 ]\nfd 2")
+
+    def test_selects_first_candidate_that_verifies(self):
+        response = "```netlogo\nask turtles [ die ]\n```\nOr simpler:\n```\nfd 1 rt 45\n```"
+        result = select_code(response, self.verifier)
+        self.assertTrue(result.is_safe)
+        self.assertEqual(result.code, "fd 1 rt 45")
+
+    def test_returns_best_candidate_with_error_when_none_verifies(self):
+        result = select_code("```netlogo\nask turtles [ die ]\n```", self.verifier)
+        self.assertFalse(result.is_safe)
+        self.assertEqual(result.code, "ask turtles [ die ]")
+        self.assertIn("Dangerous primitive", result.message)
+
+    def test_empty_response(self):
+        self.assertIsNone(select_code("", self.verifier).code)
+
+    def test_extract_text_block(self):
+        self.assertEqual(extract_text_block("Plan:\n```\nMove forward\nTurn left\n```"), "Move forward\nTurn left")
+        self.assertEqual(extract_text_block("Move forward, then turn left"), "Move forward, then turn left")
+        self.assertIsNone(extract_text_block("  "))
+
+
+if __name__ == "__main__":
+    unittest.main()
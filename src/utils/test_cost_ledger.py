@@ -0,0 +1,77 @@
+import contextvars
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.cost_ledger import CostLedger, record_event, record_usage
+
+PRICES = {"groq": {"input": 1.0, "cached_input": 0.5, "output": 2.0}}
+
+
+def usage(input_tokens, output_tokens, cached=0):
+    return {"input_tokens": input_tokens, "cached_input_tokens": cached,
+            "uncached_input_tokens": input_tokens - cached, "cache_creation_tokens": 0,
+            "output_tokens": output_tokens}
+
+
+class TestCostLedger(unittest.TestCase):
+    def setUp(self):
+        self.output_path = os.path.join(tempfile.mkdtemp(), "cost_ledger.json")
+        self.ledger = CostLedger(prices=PRICES)
+        self.ledger.reset(self.output_path)
+
+    def test_usage_is_attributed_to_the_active_mutation(self):
+        record_usage(usage(1000, 1000))  # Outside any mutation: ignored
+        with self.ledger.track_mutation("groq") as record:
+            record_usage(usage(1_000_000, 500_000, cached=400_000))
+            record_event("retries", 2)
+        self.assertEqual(record.counts["llm_calls"], 1)
+        self.assertEqual(record.counts["cache_hits"], 1)
+        self.assertEqual(record.counts["retries"], 2)
+        self.assertAlmostEqual(record.cost, 0.6 * 1.0 + 0.4 * 0.5 + 0.5 * 2.0)
+
+    def test_each_call_is_priced_at_its_provider(self):
+        prices = dict(PRICES, claude={"input": 10.0, "output": 20.0}, **{"groq:large": {"input": 4.0}})
+        ledger = CostLedger(prices=prices)
+        with ledger.track_mutation("groq") as record:
+            record_usage(usage(1_000_000, 0))
+            record_usage(usage(1_000_000, 0), "claude")
+            record_usage(usage(1_000_000, 0), "groq", "large")
+        self.assertAlmostEqual(record.cost, 1.0 + 10.0 + 4.0)
+
+    def test_usage_from_worker_threads_with_copied_context(self):
+        with self.ledger.track_mutation("groq") as record:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                for _ in range(2):
+                    executor.submit(contextvars.copy_context().run, record_usage, usage(10, 5)).result()
+        self.assertEqual(record.counts["llm_calls"], 2)
+        self.assertEqual(record.counts["input_tokens"], 20)
+
+    def test_generation_and_run_summaries(self):
+        self.ledger.close_generation({"generation": 0, "mean fitness": 10})
+        for _ in range(2):
+            with self.ledger.track_mutation("groq"):
+                record_usage(usage(1_000_000, 0))
+        generation = self.ledger.close_generation({"generation": 1, "mean fitness": 14})
+
+        self.assertEqual(generation["mutations"], 2)
+        self.assertAlmostEqual(generation["cost"], 2.0)
+        self.assertAlmostEqual(generation["fitness_gain"], 4.0)
+        self.assertAlmostEqual(generation["cost_per_fitness_gain"], 0.5)
+        self.assertEqual(generation["by_provider"]["groq"]["mutations"], 2)
+
+        with open(self.output_path) as f:
+            saved = json.load(f)
+        self.assertEqual(len(saved["generations"]), 2)
+        self.assertAlmostEqual(saved["run"]["cost_per_fitness_gain"], 0.5)
+
+    def test_no_fitness_gain_has_no_cost_ratio(self):
+        self.ledger.close_generation({"generation": 0, "mean fitness": 10})
+        generation = self.ledger.close_generation({"generation": 1, "mean fitness": 8})
+        self.assertIsNone(generation["cost_per_fitness_gain"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import time
+import unittest
+
+from src.graph_providers.rate_limiter import ProviderRateLimiter
+from src.utils.cost_ledger import CostLedger
+from src.utils.deadline import DeadlineExceeded, DeadlinePolicy, expired, record_verified, remaining
+
+PARENT = ("fd 1", "parent text")
+
+
+class TestDeadlinePolicy(unittest.TestCase):
+    def test_fast_mutation_returns_its_result(self):
+        policy = DeadlinePolicy(mutation_seconds=1.0)
+        self.assertEqual(policy.run(lambda: ("rt 5", "text"), PARENT), ("rt 5", "text"))
+        self.assertEqual(policy.metrics()["timeouts"], 0)
+
+    def test_no_deadline_runs_inline(self):
+        self.assertEqual(DeadlinePolicy().run(lambda: remaining(), PARENT), None)
+
+    def test_slow_mutation_returns_parent_and_records_timeout(self):
+        ledger = CostLedger()
+        policy = DeadlinePolicy(mutation_seconds=0.05)
+        start = time.monotonic()
+        with ledger.track_mutation("groq") as record:
+            result = policy.run(lambda: time.sleep(1.0), PARENT)
+        self.assertEqual(result, PARENT)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(record.counts["timeouts"], 1)
+        self.assertEqual(record.outcome, "timeout")
+
+    def test_timeout_returns_best_verified_code_so_far(self):
+        def mutation():
+            record_verified("lt 3", "verified text")
+            time.sleep(1.0)
+
+        self.assertEqual(DeadlinePolicy(mutation_seconds=0.05).run(mutation, PARENT), ("lt 3", "verified text"))
+
+    def test_deadline_is_visible_inside_the_mutation(self):
+        self.assertFalse(DeadlinePolicy(mutation_seconds=1.0).run(lambda: expired(), PARENT))
+        self.assertGreater(DeadlinePolicy(mutation_seconds=1.0).run(lambda: remaining(), PARENT), 0.5)
+
+    def test_generation_budget_is_shared(self):
+        policy = DeadlinePolicy(generation_seconds=0.1)
+        policy.run(lambda: time.sleep(0.15), PARENT)
+        self.assertEqual(policy.run(lambda: ("rt 5", "text"), PARENT), PARENT)
+        self.assertEqual(policy.metrics()["skipped"], 1)
+        policy.close_generation()
+        self.assertEqual(policy.run(lambda: ("rt 5", "text"), PARENT), ("rt 5", "text"))
+
+    def test_errors_propagate(self):
+        def mutation():
+            raise ValueError("boom")
+
+        with self.assertRaises(ValueError):
+            DeadlinePolicy(mutation_seconds=1.0).run(mutation, PARENT)
+
+    def test_rate_limiter_sends_nothing_after_deadline(self):
+        limiter = ProviderRateLimiter("test")
+        sent = []
+
+        def mutation():
+            time.sleep(0.1)
+            try:
+                limiter.call(lambda: sent.append(True))
+            except DeadlineExceeded:
+                sent.append(False)
+
+        DeadlinePolicy(mutation_seconds=0.05).run(mutation, PARENT)
+        time.sleep(0.15)
+        self.assertEqual(sent, [False])
+
+
+if __name__ == "__main__":
+    unittest.main()
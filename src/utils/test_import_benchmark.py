@@ -0,0 +1,20 @@
+import unittest
+
+from src.utils.import_benchmark import measure_import, parse_importtime
+
+
+class TestImportBenchmark(unittest.TestCase):
+    def test_parse_importtime(self):
+        stderr = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |   yaml.error\n"
+                  "import time:       300 |        420 | yaml\n")
+        self.assertEqual(parse_importtime(stderr), {"yaml.error": (120, 120), "yaml": (300, 420)})
+
+    def test_mutate_code_import_defers_heavy_modules(self):
+        timings, loaded = measure_import("src.mutation.mutate_code")
+        self.assertIn("src.mutation.mutate_code", timings)
+        self.assertEqual(loaded, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
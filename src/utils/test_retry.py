@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import patch
+
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.netlogo_code_generator.graph import NetLogoCodeGenerator
+from src.utils.retry import CodeRetryHandler, RetryPolicy, classify_error
+from src.verification.verify_netlogo import NetLogoVerifier
+
+
+class TestClassifyError(unittest.TestCase):
+    def test_verifier_messages(self):
+        verifier = NetLogoVerifier()
+        cases = {
+            "fd 1 ask turtles [ die ]": "dangerous_primitive",
+            "ifelse item 0 input > 1 [ fd 1": "unbalanced_brackets",
+            "stop": "no_movement",
+            "fd 1 #": "unknown_token",
+        }
+        for code, error_class in cases.items():
+            is_safe, message = verifier.is_safe(code)
+            self.assertFalse(is_safe)
+            self.assertEqual(classify_error(message), error_class, message)
+        self.assertEqual(classify_error(None), "none")
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_respects_max_attempts(self):
+        policy = RetryPolicy(max_attempts=2)
+        self.assertTrue(policy.should_retry("groq", "Dangerous primitive found: ask", 1)[0])
+        self.assertFalse(policy.should_retry("groq", "Dangerous primitive found: ask", 2)[0])
+        self.assertFalse(policy.should_retry("groq", None, 0)[0])
+
+    def test_stops_early_for_hopeless_error_class(self):
+        policy = RetryPolicy(max_attempts=3, min_success_probability=0.2, min_observations=10)
+        for _ in range(30):
+            policy.record_outcome("groq", "type_error", False)
+        retry, reason = policy.should_retry("groq", "Operator '+' expects numeric operands", 0)
+        self.assertFalse(retry)
+        self.assertIn("type_error", reason)
+        # Other providers and error classes are unaffected
+        self.assertTrue(policy.should_retry("claude", "Operator '+' expects numeric operands", 0)[0])
+        self.assertTrue(policy.should_retry("groq", "Dangerous primitive found: ask", 0)[0])
+        self.assertEqual(policy.metrics()["stopped_early"], 1)
+
+    def test_latency_budget(self):
+        policy = RetryPolicy(max_attempts=5, latency_budget=10.0)
+        self.assertFalse(policy.should_retry("groq", "Unknown token: '#'", 0, elapsed=9.0, attempt_latency=2.0)[0])
+        self.assertTrue(policy.should_retry("groq", "Unknown token: '#'", 0, elapsed=5.0, attempt_latency=2.0)[0])
+
+
+class TestCodeRetryHandler(unittest.TestCase):
+    def test_retries_until_valid_and_records_outcome(self):
+        policy = RetryPolicy(max_attempts=3)
+        handler = CodeRetryHandler(NetLogoVerifier(), policy=policy, provider_name="groq")
+        responses = iter(["fd 1 #", "fd 1 rt 90"])
+        code = handler.execute_with_retry("fd 1", lambda **kwargs: next(responses))
+        self.assertEqual(code, "fd 1 rt 90")
+        self.assertEqual(policy.success_probability("groq", "unknown_token")[1], 1)
+
+    def test_reverts_after_max_attempts(self):
+        handler = CodeRetryHandler(NetLogoVerifier(), max_attempts=1, policy=RetryPolicy())
+        calls = []
+        code = handler.execute_with_retry("fd 1", lambda **kwargs: calls.append(1) or "stop")
+        self.assertEqual(code, "fd 1")
+        self.assertEqual(len(calls), 2)
+
+
+class TestSameAttemptsAcrossEngines(unittest.TestCase):
+    def test_graph_and_handler_make_the_same_calls(self):
+        for max_attempts in (0, 1, 2):
+            policy = RetryPolicy(max_attempts=max_attempts)
+            handler_calls, graph_calls = [], []
+            handler = CodeRetryHandler(NetLogoVerifier(), policy=policy)
+            handler.execute_with_retry("fd 1", lambda **kwargs: handler_calls.append(1) or "fd 1 ]")
+
+            provider = GraphUnifiedProvider("local-sim", NetLogoVerifier())
+            generator = NetLogoCodeGenerator(provider, NetLogoVerifier())
+            with patch("src.netlogo_code_generator.nodes.get_retry_policy", return_value=policy), \
+                    patch.object(provider, "generate_code_from_state",
+                                 side_effect=lambda state: graph_calls.append(1) or "fd 1 ]"):
+                self.assertEqual(generator.generate_code(["fd 1", []], "move")[0], "fd 1")
+            self.assertEqual(len(handler_calls), 1 + max_attempts)
+            self.assertEqual(len(graph_calls), 1 + max_attempts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from src.utils.storeprompts import CompiledPrompt, DynamicPromptGroup, PromptRegistry
+
+
+class TestPromptRegistry(unittest.TestCase):
+    def setUp(self):
+        self.snapshot_path = os.path.join(tempfile.mkdtemp(), "prompts_snapshot.json")
+
+    def test_nothing_is_loaded_before_first_lookup(self):
+        registry = PromptRegistry(snapshot_path=None)
+        self.assertIsNone(registry.groups)
+        self.assertIn("retry_prompts", registry)
+        self.assertIsNotNone(registry.groups)
+
+    def test_dynamic_variants_are_built_on_access(self):
+        group = DynamicPromptGroup({"base_prompt": "A", "one_shot_example": "B", "comment_instruction": "C"})
+        self.assertEqual(group.variants, {})
+        self.assertEqual(group["one_shot_code_wcomments"], "ABC")
+        self.assertEqual(group["two_shot_code"], "AB")
+        self.assertEqual(len(group), 6)
+        with self.assertRaises(KeyError):
+            group["missing"]
+
+    def test_compiled_template_is_cached(self):
+        registry = PromptRegistry(snapshot_path=None)
+        compiled = registry.compiled("retry_prompts", "generate_code_with_error")
+        self.assertIs(compiled, registry.compiled("retry_prompts", "generate_code_with_error"))
+        self.assertIn("original_code", compiled.fields)
+        self.assertIsNone(registry.compiled("retry_prompts", "does_not_exist"))
+
+    def test_compiled_prompt_formats_like_str_format(self):
+        compiled = CompiledPrompt("{a} and {b} and {a} {{literal}}")
+        self.assertEqual(compiled.fields, ("a", "b"))
+        self.assertEqual(compiled.format(a=1, b=2), "1 and 2 and 1 {literal}")
+
+    def test_snapshot_round_trip(self):
+        registry = PromptRegistry(snapshot_path=self.snapshot_path)
+        self.assertFalse(registry.snapshot_is_fresh())
+        registry.write_snapshot()
+        self.assertTrue(registry.snapshot_is_fresh())
+
+        from_yaml = PromptRegistry(snapshot_path=None)
+        from_snapshot = PromptRegistry(snapshot_path=self.snapshot_path)
+        self.assertEqual(sorted(from_yaml), sorted(from_snapshot))
+        for name in from_yaml:
+            self.assertEqual(dict(from_yaml[name]), dict(from_snapshot[name]))
+
+
+if __name__ == "__main__":
+    unittest.main()
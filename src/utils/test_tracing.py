@@ -0,0 +1,66 @@
+import contextvars
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.tracing import NO_OP_SPAN, STATUS_ERROR, Tracer, current_span
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.output_path = os.path.join(tempfile.mkdtemp(), "spans.jsonl")
+
+    def read_spans(self):
+        with open(self.output_path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(enabled=False, output_path=self.output_path)
+        with tracer.span("mutation") as span:
+            self.assertIs(span, NO_OP_SPAN)
+        self.assertFalse(os.path.exists(self.output_path))
+
+    def test_nested_spans_share_trace_and_link_parent(self):
+        tracer = Tracer(enabled=True, output_path=self.output_path)
+        with tracer.span("mutation") as root:
+            with tracer.span("node.generate_code", **{"lear.retry_index": 1}) as child:
+                self.assertIs(current_span(), child)
+            self.assertIs(current_span(), root)
+        self.assertIsNone(current_span())
+
+        child_span, root_span = self.read_spans()
+        self.assertEqual(child_span["traceId"], root_span["traceId"])
+        self.assertEqual(child_span["parentSpanId"], root_span["spanId"])
+        self.assertEqual(root_span["parentSpanId"], "")
+        self.assertEqual(child_span["attributes"]["lear.retry_index"], 1)
+        self.assertLessEqual(root_span["startTimeUnixNano"], child_span["startTimeUnixNano"])
+        self.assertGreaterEqual(root_span["endTimeUnixNano"], child_span["endTimeUnixNano"])
+
+    def test_exception_marks_span_as_error(self):
+        tracer = Tracer(enabled=True, output_path=self.output_path)
+        with self.assertRaises(ValueError):
+            with tracer.span("llm.invoke"):
+                raise ValueError("boom")
+        span, = self.read_spans()
+        self.assertEqual(span["status"]["code"], STATUS_ERROR)
+        self.assertIn("boom", span["status"]["message"])
+
+    def test_copied_context_keeps_parent_in_worker_thread(self):
+        tracer = Tracer(enabled=True, output_path=self.output_path)
+
+        def work():
+            with tracer.span("llm.invoke"):
+                pass
+
+        with tracer.span("node.generate_candidates"):
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(contextvars.copy_context().run, work).result()
+
+        worker_span, parent_span = self.read_spans()
+        self.assertEqual(worker_span["parentSpanId"], parent_span["spanId"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+"""
+Opt-in tracing of the mutation pipeline.
+
+Spans are recorded around each mutation, each LangGraph node and each provider call,
+and appended to a JSONL file, one finished span per line, in an OpenTelemetry-shaped
+layout (traceId, spanId, parentSpanId, name, kind, start/end time in Unix nanoseconds,
+attributes, status, resource). The current span is tracked with contextvars, so nested
+spans get the right parent; work handed to a thread pool should be submitted through
+`contextvars.copy_context().run` to stay inside the trace.
+
+Tracing is disabled by default; enable it with `Tracer.enabled = True` in gin.
+"""
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import gin
+
+from src.utils.logging import get_logger
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+SPAN_KIND_INTERNAL = "SPAN_KIND_INTERNAL"
+SPAN_KIND_CLIENT = "SPAN_KIND_CLIENT"
+STATUS_OK = "STATUS_CODE_OK"
+STATUS_ERROR = "STATUS_CODE_ERROR"
+
+
+class Span:
+    """One timed operation; attributes and status can be set until it ends."""
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str],
+                 kind: str = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.status_code = STATUS_OK
+        self.status_message = ""
+        self.start_time = time.time_ns()
+        self.end_time = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def set_error(self, message: str) -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = message
+
+    def end(self) -> None:
+        self.end_time = time.time_ns()
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds (up to now if the span has not ended)."""
+        return ((self.end_time or time.time_ns()) - self.start_time) / 1e9
+
+    def to_dict(self, resource: Dict[str, Any]) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": self.start_time,
+            "endTimeUnixNano": self.end_time,
+            "attributes": self.attributes,
+            "status": {"code": self.status_code, "message": self.status_message},
+            "resource": resource,
+        }
+
+
+class _NoOpSpan:
+    """Stand-in returned while tracing is disabled, so call sites need no checks."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def set_error(self, message: str) -> None:
+        pass
+
+
+NO_OP_SPAN = _NoOpSpan()
+
+
+@gin.configurable
+class Tracer:
+    """
+    Records spans and exports them to a JSONL file.
+    """
+
+    def __init__(self, enabled: bool = False,
+                 output_path: str = "traces/spans.jsonl",
+                 service_name: str = "lear"):
+        """
+        Args:
+            enabled: Whether spans are recorded at all
+            output_path: JSONL file the finished spans are appended to
+            service_name: Value of the service.name resource attribute
+        """
+        self.enabled = enabled
+        self.output_path = output_path
+        self.resource = {"service.name": service_name, "process.pid": os.getpid()}
+        self.lock = threading.Lock()
+        self.logger = get_logger()
+
+    @contextmanager
+    def span(self, name: str, kind: str = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Any]:
+        """
+        Record a span around the enclosed block, as a child of the current span.
+
+        An exception escaping the block marks the span as an error and is re-raised.
+
+        Args:
+            name: Span name, e.g. "node.generate_code" or "llm.invoke"
+            kind: SPAN_KIND_INTERNAL, or SPAN_KIND_CLIENT for calls to a provider
+            **attributes: Initial span attributes
+        """
+        if not self.enabled:
+            yield NO_OP_SPAN
+            return
+
+        parent = _current_span.get()
+        span = Span(name, parent.trace_id if parent else secrets.token_hex(16),
+                    parent.span_id if parent else None, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {str(e)[:200]}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self.export(span)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(self.resource), default=str)
+        try:
+            with self.lock:
+                directory = os.path.dirname(self.output_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.output_path, "a") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            self.logger.warning(f"Could not export span {span.name}: {str(e)}")
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer, creating it (from gin) on first use."""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+def current_span() -> Optional[Span]:
+    """The innermost active span in this context, if any."""
+    return _current_span.get()
+
+
+def traced_node(name: str, node: Callable[[dict], dict]) -> Callable[[dict], dict]:
+    """
+    Wrap a LangGraph node so every execution is recorded as a span.
+
+    The span carries the retry index and, on retries, the error that caused it.
+    Nodes can add their own attributes through current_span().
+
+    Args:
+        name: Node name as registered in the graph
+        node: Node function taking and returning the generation state
+
+    Returns:
+        The wrapped node
+    """
+    def wrapped(state: dict) -> dict:
+        with get_tracer().span(f"node.{name}", **{"lear.node": name,
+                                                   "lear.retry_index": state.get("retry_count", 0)}) as span:
+            if state.get("error_message"):
+                span.set_attribute("lear.retry_reason", state["error_message"][:200])
+            return node(state)
+    return wrapped
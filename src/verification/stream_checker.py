@@ -0,0 +1,180 @@
+"""
+Incremental checks for streamed LLM responses.
+
+IncrementalCodeChecker is fed response chunks as they arrive and reports an error as
+soon as the fenced code block is provably invalid: a dangerous primitive has been
+emitted, a closing bracket has no matching opener, or the code exceeds the verifier's
+length limit. Only fenced code is checked, since prose around the code legitimately
+contains words such as "of", "with" or "go".
+
+Code extraction (select_code) uses the first block of a response that verifies, so a
+response can recover from an invalid block with a later valid one. With
+`later_block_chars` set, an invalid block therefore does not stop the stream: checking
+moves on to the next block, and the stream is only aborted once an invalid block has
+closed, no block so far was valid, and no new block opened within `later_block_chars`
+characters.
+"""
+
+from typing import List, Optional, Tuple
+
+from src.verification.verify_netlogo import NetLogoVerifier, Token, TokenType
+
+FENCE = "```"
+# Characters after which an identifier can no longer grow
+TOKEN_BOUNDARIES = " \t\n[]()"
+IDENTIFIER_TYPES = {TokenType.COMMAND, TokenType.REPORTER, TokenType.IDENTIFIER}
+BRACKET_PAIRS = {TokenType.RPAREN: TokenType.LPAREN, TokenType.RBRACKET: TokenType.LBRACKET}
+
+
+class IncrementalCodeChecker:
+    """
+    Streaming counterpart of the structural checks in NetLogoVerifier.validate.
+
+    Attributes:
+        response: Full response text received so far
+        error: First error found, in the verifier's message format, or None
+    """
+
+    def __init__(self, verifier: NetLogoVerifier, max_code_length: Optional[int] = None,
+                 later_block_chars: Optional[int] = None):
+        """
+        Args:
+            verifier: Verifier whose primitive lists and tokenizer are reused
+            max_code_length: Abort once the code block grows past this many characters
+                             (defaults to the verifier's max_code_length)
+            later_block_chars: Characters after a closed invalid block within which another
+                               block may still open before the stream is aborted; None
+                               aborts on the first invalid block, mid-block
+        """
+        self.verifier = verifier
+        self.max_code_length = max_code_length or verifier.max_code_length
+        self.later_block_chars = later_block_chars
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget everything seen so far (used when a streamed request is retried)."""
+        self.response = ""
+        self.error = None
+        self.block_errors: List[str] = []  # Error of each closed invalid block
+        self.valid_block_seen = False      # A closed block passed every check
+        self.failed_block_end = None       # Offset after the closing fence of the last invalid block
+        self.last_code = ""                # Code of the last closed block
+        self.search_from = 0               # Offset from which the next opening fence is searched
+        self._reset_block()
+
+    def _reset_block(self) -> None:
+        self.code_start = None   # Offset in response where the fenced code begins
+        self.code_end = None     # Offset of the closing fence, once seen
+        self.checked_upto = 0    # Offset in the code up to which complete lines were checked
+        self.bracket_stack: List[Token] = []
+        self.block_error = None  # First error found in the current block
+
+    @property
+    def code(self) -> str:
+        """The (possibly partial) fenced code block received so far, or the last closed one."""
+        if self.code_start is None:
+            return self.last_code
+        end = self.code_end if self.code_end is not None else len(self.response)
+        return self.response[self.code_start:end].strip()
+
+    @property
+    def aborted(self) -> bool:
+        return self.error is not None
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Add a chunk of the response and check any newly completed code.
+
+        Returns:
+            Error message if the output is now provably invalid, otherwise None
+        """
+        if self.error:
+            return self.error
+        self.response += chunk
+        if self.later_block_chars is None:
+            return self._feed_first_block()
+
+        while not self.valid_block_seen:
+            if self.code_start is None and not self._find_code_start():
+                # Between blocks: give up once an invalid block is followed by enough text
+                if (self.failed_block_end is not None
+                        and len(self.response) - self.failed_block_end > self.later_block_chars):
+                    self.error = self.block_errors[-1]
+                return self.error
+            if self.code_end is None:
+                closing = self.response.find(FENCE, self.code_start)
+                if closing != -1:
+                    self.code_end = closing
+            if self.block_error is None:
+                self.block_error = self._check_code()
+            if self.code_end is None:
+                return None
+            # The block is complete: remember its outcome and look for the next one
+            if self.block_error:
+                self.block_errors.append(self.block_error)
+                self.failed_block_end = self.code_end + len(FENCE)
+            else:
+                self.valid_block_seen = True
+            self.last_code = self.code
+            self.search_from = self.code_end + len(FENCE)
+            self._reset_block()
+        return None
+
+    def _feed_first_block(self) -> Optional[str]:
+        if self.code_start is None and not self._find_code_start():
+            return None
+        if self.code_end is None:
+            closing = self.response.find(FENCE, self.code_start)
+            if closing != -1:
+                self.code_end = closing
+        self.error = self._check_code()
+        return self.error
+
+    def _find_code_start(self) -> bool:
+        opening = self.response.find(FENCE, self.search_from)
+        if opening == -1:
+            return False
+        # Wait for the end of the fence line so a language tag is not mistaken for code
+        newline = self.response.find("\n", opening + len(FENCE))
+        if newline == -1:
+            return False
+        self.code_start = newline + 1
+        return True
+
+    def _check_code(self) -> Optional[str]:
+        end = self.code_end if self.code_end is not None else len(self.response)
+        code = self.response[self.code_start:end]
+        if len(code.strip()) > self.max_code_length:
+            return f"Code exceeds maximum length of {self.max_code_length} characters"
+
+        # Complete lines are checked once and their bracket state is kept
+        last_newline = code.rfind("\n")
+        if last_newline >= self.checked_upto:
+            error, self.bracket_stack = self._check_segment(code[self.checked_upto:last_newline + 1], self.bracket_stack)
+            self.checked_upto = last_newline + 1
+            if error:
+                return error
+
+        # The trailing partial line is checked up to its last token boundary
+        partial = code[self.checked_upto:]
+        if self.code_end is None:
+            boundary = max(partial.rfind(c) for c in TOKEN_BOUNDARIES)
+            partial = partial[:boundary + 1]
+        if partial.count('"') % 2:
+            return None  # Inside a string literal
+        error, _ = self._check_segment(partial, list(self.bracket_stack))
+        return error
+
+    def _check_segment(self, segment: str, stack: List[Token]) -> Tuple[Optional[str], List[Token]]:
+        for token in self.verifier._tokenize(segment):
+            if token.type in IDENTIFIER_TYPES and token.value.lower() in self.verifier.dangerous_primitives:
+                return f"Dangerous primitive found: {token.value}", stack
+            if token.type in (TokenType.LPAREN, TokenType.LBRACKET):
+                stack.append(token)
+            elif token.type in BRACKET_PAIRS:
+                if not stack:
+                    return f"Unmatched closing bracket/parenthesis: '{token.value}'", stack
+                opening = stack.pop()
+                if opening.type != BRACKET_PAIRS[token.type]:
+                    return f"Mismatched bracket/parenthesis: Expected closing for '{opening.value}' but found '{token.value}'", stack
+        return None, stack
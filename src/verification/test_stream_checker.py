@@ -0,0 +1,96 @@
+import unittest
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from src.graph_providers.unified_provider import GraphUnifiedProvider
+from src.netlogo_code_generator.state import initial_state
+from src.verification.stream_checker import IncrementalCodeChecker
+from src.verification.verify_netlogo import NetLogoVerifier
+
+
+def feed_words(checker, response):
+    """Feed a response one word at a time, returning the number of chunks consumed."""
+    chunks = response.split(" ")
+    for i, chunk in enumerate(chunks):
+        if checker.feed(chunk + (" " if i < len(chunks) - 1 else "")):
+            return i + 1
+    return len(chunks)
+
+
+class TestIncrementalCodeChecker(unittest.TestCase):
+
+    def setUp(self):
+        self.checker = IncrementalCodeChecker(NetLogoVerifier())
+
+    def test_valid_code_passes(self):
+        response = "Here is the rule:\n```netlogo\nifelse item 0 input > 0 [ fd 1 ] [ rt random 30 fd 2 ]\n```"
+        feed_words(self.checker, response)
+        self.assertFalse(self.checker.aborted)
+        self.assertEqual(self.checker.code, "ifelse item 0 input > 0 [ fd 1 ] [ rt random 30 fd 2 ]")
+
+    def test_prose_is_not_checked(self):
+        feed_words(self.checker, "Ask the turtle to go with the flow ] of food\n```\nfd 1\n```")
+        self.assertFalse(self.checker.aborted)
+
+    def test_dangerous_primitive_aborts_early(self):
+        response = "```netlogo\nfd 1 ask turtles [ die ] rt 90 fd 2 lt 45 fd 3\n```"
+        consumed = feed_words(self.checker, response)
+        self.assertIn("Dangerous primitive found: ask", self.checker.error)
+        self.assertLess(consumed, len(response.split(" ")))
+        self.assertEqual(self.checker.code, "fd 1 ask")
+
+    def test_partial_identifier_is_not_flagged(self):
+        self.checker.feed("```\nfd 1 di")
+        self.assertFalse(self.checker.aborted)
+        self.checker.feed("stance-ok ")
+        self.assertFalse(self.checker.aborted)
+
+    def test_unmatched_closing_bracket_aborts(self):
+        feed_words(self.checker, "```\nif item 0 input > 0 [ fd 1 ] ] rt 90 fd 2\n```")
+        self.assertIn("Unmatched closing bracket", self.checker.error)
+
+    def test_brackets_across_lines(self):
+        feed_words(self.checker, "```\nifelse item 0 input > 0 [\n  fd 1\n] [\n  rt 90\n]\n```")
+        self.assertFalse(self.checker.aborted)
+
+    def test_oversize_code_aborts(self):
+        checker = IncrementalCodeChecker(NetLogoVerifier(), max_code_length=20)
+        feed_words(checker, "```\nfd 1 rt 2 fd 3 lt 4 fd 5 rt 6 fd 7\n```")
+        self.assertIn("exceeds maximum length", checker.error)
+
+
+RECOVERED = "```netlogo\nfd 1 ] rt 2\n```\nThat bracket is wrong, here is the fix:\n```netlogo\nrt 5 fd 2\n```"
+
+
+class TestLaterBlocks(unittest.TestCase):
+
+    def setUp(self):
+        self.checker = IncrementalCodeChecker(NetLogoVerifier(), later_block_chars=100)
+
+    def test_later_valid_block_is_not_cut_off(self):
+        consumed = feed_words(self.checker, RECOVERED)
+        self.assertFalse(self.checker.aborted)
+        self.assertEqual(consumed, len(RECOVERED.split(" ")))
+        self.assertEqual(self.checker.block_errors[0], "Unmatched closing bracket/parenthesis: ']'")
+
+    def test_invalid_block_followed_by_prose_aborts(self):
+        response = "```\nfd 1 ]\n```\n" + "This rule moves forward. " * 20
+        consumed = feed_words(self.checker, response)
+        self.assertIn("Unmatched closing bracket", self.checker.error)
+        self.assertLess(consumed, len(response.split(" ")))
+        self.assertEqual(self.checker.code, "fd 1 ]")
+
+    def test_valid_block_is_never_aborted(self):
+        feed_words(self.checker, "```\nfd 1\n```\nOr more boldly:\n```\nask turtles [ die ]\n```" + " x" * 200)
+        self.assertFalse(self.checker.aborted)
+
+    def test_streamed_generation_uses_the_later_block(self):
+        provider = GraphUnifiedProvider("local-sim", NetLogoVerifier(), stream_generation=True,
+                                        structured_output=False)
+        provider.model = FakeListChatModel(responses=[RECOVERED])
+        state = initial_state(["fd 1", []], provider="local-sim")
+        self.assertEqual(provider.generate_code_from_state(state), "rt 5 fd 2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -299,6 +299,28 @@ class NetLogoVerifier:
             return False, "\n".join(str(error) for error in result.errors)
         return True, "Code appears safe"
 
+    def is_safe_batch(self, codes: List[str], stop_at_first_safe: bool = False) -> List[Tuple[bool, str]]:
+        """
+        Run is_safe over several candidate codes, validating duplicates only once.
+
+        Args:
+            codes: Candidate codes, in order of preference
+            stop_at_first_safe: Stop after the first safe candidate; the result list then
+                                ends with that candidate
+
+        Returns:
+            (is_safe, message) for each checked candidate, in input order
+        """
+        seen = {}
+        results = []
+        for code in codes:
+            if code not in seen:
+                seen[code] = self.is_safe(code)
+            results.append(seen[code])
+            if stop_at_first_safe and seen[code][0]:
+                break
+        return results
+
     def validate(self, code: str) -> ValidationResult:
         """
         Comprehensive validation of NetLogo code with detailed error reporting.